@@ -1,10 +1,20 @@
 #!/usr/bin/env python3
-import time
+import argparse
+import asyncio
+import json
 import os
+import signal
 import logging
-import requests
-from utils.network_tests import run_network_test
-from utils.config_loader import load_config, validate_config
+import time
+from pathlib import Path
+from utils.config_loader import load_config, validate_config, reload_config, config_files_changed
+from utils.sample_store import PROBES, open_sample_store, summarize_samples
+from utils.adaptive import AdaptivePlanner, LinkMonitor
+from utils.scheduler import IntervalScheduler
+from utils.self_metrics import agent_metrics, serve_metrics
+
+# aiohttp и модули проб импортируются в AgentRuntime.run(), чтобы
+# служебные команды (--dump-samples) запускались без них
 
 
 logging.basicConfig(
@@ -13,32 +23,275 @@ logging.basicConfig(
 )
 logger = logging.getLogger("InternetMonitorAgent")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Internet Quality Monitoring Agent")
+    parser.add_argument("--config", help="Путь к файлу конфигурации")
+    parser.add_argument(
+        "--dump-samples",
+        action="store_true",
+        help="Вывести сырые сэмплы из локального хранилища и выйти"
+    )
+    parser.add_argument("--since", type=float, help="Начало интервала (unix time)")
+    parser.add_argument("--until", type=float, help="Конец интервала (unix time)")
+    parser.add_argument("--probe", choices=sorted(PROBES), help="Фильтр по типу пробы")
+    parser.add_argument("--summary", action="store_true", help="Вывести только сводку")
+    return parser.parse_args()
+
+def dump_samples(store, args) -> None:
+    """Выдача детальных сэмплов по запросу (для расследований)"""
+    samples = store.query(args.since, args.until, args.probe)
+    output = summarize_samples(samples) if args.summary else samples
+    print(json.dumps(output, indent=2))
+
+class AgentRuntime:
+    """
+    Долгоживущий runtime агента: один event loop, общая сессия aiohttp
+    с пулом соединений, планировщик по монотонным часам и корректное
+    завершение по SIGTERM с отправкой накопленных результатов
+    """
+
+    def __init__(self, config, sample_store):
+        self.config = config
+        self.sample_store = sample_store
+        self.scheduler = IntervalScheduler(
+            config.test_interval,
+            agent_id=config.agent_id,
+            jitter=config.schedule_jitter
+        )
+        self.link_monitor = LinkMonitor()
+        self.planner = AdaptivePlanner(config)
+        self.sender = None
+        self.target_prober = None
+        self.remote_poller = None
+        self._stop_event = None
+        self._stop_deadline = None
+
+    def stop(self) -> None:
+        logger.info("Shutdown requested")
+        if self._stop_deadline is None:
+            # Один бюджет shutdown_timeout на завершение цикла, проб и отправку
+            self._stop_deadline = time.monotonic() + self.config.shutdown_timeout
+        if self._stop_event:
+            self._stop_event.set()
+
+    def _shutdown_remaining(self) -> float:
+        if self._stop_deadline is None:
+            self._stop_deadline = time.monotonic() + self.config.shutdown_timeout
+        return max(0.0, self._stop_deadline - time.monotonic())
+
+    def reload(self, force: bool = False) -> None:
+        """Применение новой конфигурации (SIGHUP или изменение файла)"""
+        config = reload_config(self.config, force)
+        if config is self.config:
+            return
+        if config.connection_pool_size != self.config.connection_pool_size:
+            logger.warning("connection_pool_size change requires a restart")
+        self.config = config
+        logger.setLevel(config.log_level)
+        self.scheduler.jitter = config.schedule_jitter
+        # Оценки канала сохраняются, интервал начинается с нового базового
+        self.planner.config = config
+        self.planner.interval = float(config.test_interval)
+        self.scheduler.set_interval(config.test_interval)
+        if self.sender:
+            self.sender.config = config
+        if self.remote_poller:
+            self.remote_poller.config = config
+        if self.target_prober:
+            self.target_prober.update_targets(config.targets, config.test_interval)
+
+    async def watch_config(self) -> None:
+        """Периодическая проверка mtime файлов конфигурации"""
+        while True:
+            await asyncio.sleep(self.config.config_watch_interval)
+            if config_files_changed():
+                logger.info("Config file change detected")
+                self.reload()
+
+    async def run_cycle(self, session) -> None:
+        from utils.network_tests import run_network_test
+        from utils.sender import build_payload
+
+        logger.info("Starting network measurement cycle")
+        started = time.perf_counter()
+        if self.config.adaptive_scheduling:
+            plan = self.planner.plan_throughput(self.link_monitor.background_mbps())
+        else:
+            plan = {"download_mb": 10, "upload_mb": 5, "throughput": "full", "utilization": None}
+        results = await run_network_test(
+            self.config.test_server,
+            sample_store=self.sample_store,
+            detailed=self.config.enable_detailed_metrics,
+            session=session,
+            dns_hostname=self.config.dns_test_hostname,
+            mtu_host=self.config.mtu_test_host,
+            download_mb=plan["download_mb"],
+            upload_mb=plan["upload_mb"],
+            link_monitor=self.link_monitor,
+            path_thresholds=(
+                (self.config.path_latency_threshold, self.config.path_loss_threshold)
+                if self.config.path_probe_enabled else None
+            ),
+            path_max_hops=self.config.path_max_hops
+        )
+        if self.config.adaptive_scheduling:
+            results["adaptive"] = {
+                "throughput": plan["throughput"],
+                "link_utilization": plan["utilization"],
+                "interval": self.planner.observe(results, plan)
+            }
+            self.scheduler.set_interval(self.planner.interval)
+        if self.target_prober:
+            # Результаты по целям с прошлого цикла уходят одной пачкой
+            results["targets"] = self.target_prober.drain()
+        logger.debug(f"Test results: {results}")
+        for probe, seconds in results.pop("probe_durations", {}).items():
+            agent_metrics.observe_probe(probe, seconds)
+        agent_metrics.observe_cycle(time.perf_counter() - started)
+
+        self.sender.enqueue(build_payload(self.config, results))
+        sent = await self.sender.flush()
+        logger.info(f"Measurement completed, sent {sent}, pending {len(self.sender.outbox)}")
+        if self.config.metrics_textfile:
+            agent_metrics.write_textfile(self.config.metrics_textfile)
+
+    async def run(self) -> None:
+        import aiohttp
+        from utils.sender import MeasurementSender
+        from utils.targets import TargetProber
+        from utils.remote_config import RemoteConfigPoller
+
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+        loop.add_signal_handler(signal.SIGHUP, lambda: self.reload(force=True))
+        watcher = asyncio.create_task(self.watch_config())
+
+        connector = aiohttp.TCPConnector(
+            limit=max(self.config.connection_pool_size, self.config.max_concurrent_probes),
+            ttl_dns_cache=300
+        )
+        metrics_runner = None
+        if self.config.metrics_port:
+            try:
+                metrics_runner = await serve_metrics(
+                    agent_metrics, self.config.metrics_host, self.config.metrics_port
+                )
+            except OSError as e:
+                logger.error(f"Failed to start metrics endpoint: {e}")
+
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self.sender = MeasurementSender(
+                self.config,
+                session,
+                outbox_path=Path(self.config.data_dir) / "outbox.json"
+            )
+            self.sender.load_outbox()
+
+            # Цели опрашиваются постоянно, даже если сейчас список пуст:
+            # он может появиться после перезагрузки конфигурации
+            self.target_prober = TargetProber(
+                self.config.targets,
+                session,
+                default_interval=self.config.test_interval,
+                max_concurrency=self.config.max_concurrent_probes,
+                timeout=self.config.test_timeout
+            )
+            prober_task = asyncio.create_task(
+                self.target_prober.run_forever(self._stop_event)
+            )
+            monitor_task = asyncio.create_task(
+                self.link_monitor.run_forever(self._stop_event)
+            )
+            remote_task = None
+            if self.config.remote_config:
+                self.remote_poller = RemoteConfigPoller(self.config, session, self.reload)
+                remote_task = asyncio.create_task(
+                    self.remote_poller.run_forever(self._stop_event)
+                )
+
+            while await self.scheduler.wait_next(self._stop_event):
+                cycle = asyncio.create_task(self.run_cycle(session))
+                stop_wait = asyncio.create_task(self._stop_event.wait())
+                await asyncio.wait({cycle, stop_wait}, return_when=asyncio.FIRST_COMPLETED)
+                stop_wait.cancel()
+
+                if not cycle.done():
+                    # Остановка во время цикла: цикл завершается (его результаты
+                    # попадают в очередь отправки), но не дольше shutdown_timeout
+                    logger.info("Waiting for the running measurement cycle to finish")
+                    await asyncio.wait({cycle}, timeout=self._shutdown_remaining())
+                    if not cycle.done():
+                        logger.warning("Measurement cycle did not finish in time, cancelled")
+                        cycle.cancel()
+                        await asyncio.gather(cycle, return_exceptions=True)
+                        break
+                if cycle.exception():
+                    logger.error(
+                        f"Critical error: {str(cycle.exception())}",
+                        exc_info=cycle.exception()
+                    )
+
+            watcher.cancel()
+            prober_task.cancel()
+            monitor_task.cancel()
+            if remote_task:
+                remote_task.cancel()
+            await self.shutdown()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+    async def shutdown(self) -> None:
+        """Отправка накопленных результатов (включая опросы целей) перед выходом"""
+        if self.target_prober:
+            # Половина оставшегося времени - на идущие пробы, остальное - на отправку
+            await self.target_prober.finish(self._shutdown_remaining() / 2)
+            targets = self.target_prober.drain()
+            if targets and self.sender:
+                from utils.sender import build_payload
+
+                # Результаты целей после последнего цикла - отдельным измерением
+                self.sender.enqueue(build_payload(self.config, {"targets": targets, "targets_only": True}))
+            self.target_prober.close()
+        if self.sender and self.sender.outbox:
+            try:
+                await asyncio.wait_for(
+                    self.sender.flush(), timeout=self._shutdown_remaining()
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out flushing pending measurements")
+            self.sender.save_outbox()
+        self.sample_store.close()
+        logger.info("Agent stopped")
+
 def main():
-    config = load_config()
+    args = parse_args()
+    config = load_config(args.config)
 
     # Валидация
     if not validate_config(config):
         logger.error("Invalid configuration")
         return
-        
+
     # Использование конфигурации
     logger.setLevel(config.log_level)
-        
-    
-    while True:
-        try:
-            logger.info("Starting network measurement cycle")
-            results = run_network_test(config)
-            logger.debug(f"Test results: {results}")
-            
-            requests.post(f"{config.API_URL}/measurements", json=results)
-            
-            logger.info(f"Measurement completed. Sleeping for {config.MEASUREMENT_INTERVAL} seconds")
-            time.sleep(config.MEASUREMENT_INTERVAL)
-            
-        except Exception as e:
-            logger.error(f"Critical error: {str(e)}", exc_info=True)
-            time.sleep(60)  # Пауза перед повтором
+
+    # Локальное хранилище сырых сэмплов
+    sample_store = open_sample_store(config)
+    if args.dump_samples:
+        dump_samples(sample_store, args)
+        sample_store.close()
+        return
+
+    # Последняя конфигурация с сервера - до первого ответа сервера
+    if config.remote_config:
+        from utils.remote_config import load_cached
+        if load_cached(Path(config.data_dir) / "remote_config.json") is not None:
+            config = reload_config(config)
+            logger.setLevel(config.log_level)
+
+    asyncio.run(AgentRuntime(config, sample_store).run())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,89 @@
+# agent/benchmarks/link_server.py
+"""
+Локальный тестовый сервер с эмуляцией канала: задержка, джиттер,
+потери и ограничение полосы. Реализует те же пути, что httpbin
+(/get, /bytes/N, /post), которые использует NetworkTester.
+"""
+import asyncio
+import random
+from dataclasses import dataclass
+from aiohttp import web
+
+@dataclass
+class LinkProfile:
+    delay_ms: float = 20.0       # Базовая задержка ответа
+    jitter_ms: float = 2.0       # Стандартное отклонение задержки
+    loss: float = 0.0            # Доля запросов, на которые сервер не отвечает
+    bandwidth_mbps: float = 50.0 # Ограничение полосы в обе стороны
+    chunk_size: int = 16384
+
+class LinkEmulator:
+    def __init__(self, profile: LinkProfile, seed: int = 1):
+        self.profile = profile
+        self.rng = random.Random(seed)
+
+    async def delay(self) -> None:
+        delay = max(0.0, self.rng.gauss(self.profile.delay_ms, self.profile.jitter_ms))
+        await asyncio.sleep(delay / 1000)
+
+    async def maybe_drop(self, request: web.Request) -> None:
+        """Потерянный запрос: соединение закрывается без ответа"""
+        if self.rng.random() < self.profile.loss:
+            request.transport.close()
+            raise asyncio.CancelledError()
+
+    def chunk_delay(self, size: int) -> float:
+        return size * 8 / (self.profile.bandwidth_mbps * 1_000_000)
+
+    async def handle_get(self, request: web.Request) -> web.Response:
+        await self.maybe_drop(request)
+        await self.delay()
+        return web.json_response({"url": str(request.url)})
+
+    async def handle_bytes(self, request: web.Request) -> web.StreamResponse:
+        await self.maybe_drop(request)
+        await self.delay()
+        total = int(request.match_info["size"])
+        response = web.StreamResponse()
+        response.content_length = total
+        await response.prepare(request)
+
+        chunk = b"\0" * self.profile.chunk_size
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        sent = 0
+        while sent < total:
+            part = chunk[:min(len(chunk), total - sent)]
+            await response.write(part)
+            sent += len(part)
+            # Выравнивание по полосе: к этому моменту должно пройти sent*8/bw секунд
+            wait = started + self.chunk_delay(sent) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        await response.write_eof()
+        return response
+
+    async def handle_post(self, request: web.Request) -> web.Response:
+        await self.maybe_drop(request)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        received = 0
+        async for data in request.content.iter_chunked(self.profile.chunk_size):
+            received += len(data)
+            wait = started + self.chunk_delay(received) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        await self.delay()
+        return web.json_response({"received": received})
+
+def build_app(profile: LinkProfile) -> web.Application:
+    emulator = LinkEmulator(profile)
+    app = web.Application(client_max_size=1024 ** 3)
+    app.router.add_get("/get", emulator.handle_get)
+    app.router.add_get("/bytes/{size}", emulator.handle_bytes)
+    app.router.add_post("/post", emulator.handle_post)
+    return app
+
+def serve(profile: LinkProfile, port: int) -> None:
+    """Запуск сервера (в отдельном процессе, чтобы не искажать замеры агента)"""
+    web.run_app(build_app(profile), host="127.0.0.1", port=port, print=None)
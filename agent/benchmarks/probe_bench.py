@@ -0,0 +1,161 @@
+# agent/benchmarks/probe_bench.py
+"""
+Оценка точности и стоимости проб NetworkTester на эмулированном канале
+
+    cd agent
+    python -m benchmarks.probe_bench --delay 30 --jitter 5 --loss 0.05 --bandwidth 20
+
+Тестовый сервер запускается в отдельном процессе, поэтому CPU/RSS
+относятся только к агенту. Для каждой пробы выводится измеренное
+значение, эталон канала, ошибка, а также wall time, CPU time и RSS.
+
+ICMP-проба потерь (ping3) идет на 127.0.0.1 мимо эмулятора, ее эталон - 0%.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+import psutil
+
+from benchmarks.link_server import LinkProfile, serve
+from utils.network_tests import NetworkTester
+
+def _probes(args) -> Dict[str, Callable]:
+    return {
+        "latency": lambda t: t.test_latency(),
+        "jitter": lambda t: t.test_jitter(),
+        "download": lambda t: t.test_download_speed(args.download_mb),
+        "upload": lambda t: t.test_upload_speed(args.upload_mb),
+        "packet_loss": lambda t: t.test_packet_loss(),
+        "dns": lambda t: t.test_dns_resolution(),
+    }
+
+def _ground_truth(profile: LinkProfile) -> Dict[str, Dict]:
+    """Эталон: ключ результата пробы -> ожидаемое значение"""
+    return {
+        "latency": {"latency_median": profile.delay_ms},
+        "jitter": {"jitter": profile.jitter_ms},
+        "download": {"download_speed": profile.bandwidth_mbps},
+        "upload": {"upload_speed": profile.bandwidth_mbps},
+        "packet_loss": {"packet_loss": 0.0},
+        "dns": {},
+    }
+
+def _loss_from_latency(result: Dict) -> Optional[float]:
+    sent = result.get("packets_sent")
+    if not sent:
+        return None
+    return (sent - result.get("packets_received", 0)) / sent * 100
+
+async def measure_probe(name: str, probe: Callable, server_url: str, session) -> Dict:
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+
+    async with NetworkTester(server_url, session=session) as tester:
+        result = await probe(tester)
+
+    return {
+        "probe": name,
+        "result": result,
+        "wall_s": time.perf_counter() - wall_before,
+        "cpu_s": time.process_time() - cpu_before,
+        "rss_delta_kb": (process.memory_info().rss - rss_before) // 1024,
+    }
+
+def _summarize(runs: List[Dict], truth: Dict, profile: LinkProfile) -> Dict:
+    summary = {
+        "probe": runs[0]["probe"],
+        "wall_s": round(statistics.median(r["wall_s"] for r in runs), 3),
+        "cpu_s": round(statistics.median(r["cpu_s"] for r in runs), 4),
+        "rss_delta_kb": max(r["rss_delta_kb"] for r in runs),
+    }
+    for key, expected in truth.items():
+        values = [r["result"].get(key) for r in runs if r["result"].get(key) is not None]
+        if not values:
+            summary[key] = None
+            continue
+        measured = statistics.median(values)
+        summary[key] = round(measured, 2)
+        summary[f"{key}_expected"] = expected
+        summary[f"{key}_error"] = round(measured - expected, 2)
+        if expected:
+            summary[f"{key}_error_pct"] = round((measured - expected) / expected * 100, 1)
+
+    if summary["probe"] == "latency":
+        losses = [_loss_from_latency(r["result"]) for r in runs]
+        losses = [loss for loss in losses if loss is not None]
+        if losses:
+            summary["http_loss"] = round(statistics.mean(losses), 2)
+            summary["http_loss_expected"] = profile.loss * 100
+    return summary
+
+async def run_bench(args, profile: LinkProfile) -> List[Dict]:
+    server_url = f"http://127.0.0.1:{args.port}"
+    truth = _ground_truth(profile)
+    summaries = []
+
+    async with aiohttp.ClientSession() as session:
+        for name, probe in _probes(args).items():
+            if args.probes and name not in args.probes:
+                continue
+            runs = [
+                await measure_probe(name, probe, server_url, session)
+                for _ in range(args.repeat)
+            ]
+            summaries.append(_summarize(runs, truth[name], profile))
+
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for summary in summaries:
+        summary["peak_rss_kb"] = peak_rss_kb
+    return summaries
+
+async def _wait_for_server(port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Link emulator did not start")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NetworkTester accuracy/overhead benchmark")
+    parser.add_argument("--delay", type=float, default=20.0, help="Задержка, мс")
+    parser.add_argument("--jitter", type=float, default=2.0, help="Джиттер (σ), мс")
+    parser.add_argument("--loss", type=float, default=0.0, help="Доля потерянных запросов")
+    parser.add_argument("--bandwidth", type=float, default=50.0, help="Полоса, Мбит/с")
+    parser.add_argument("--download-mb", type=int, default=10)
+    parser.add_argument("--upload-mb", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--probes", nargs="*", help="Запустить только указанные пробы")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    profile = LinkProfile(args.delay, args.jitter, args.loss, args.bandwidth)
+    server = multiprocessing.Process(target=serve, args=(profile, args.port), daemon=True)
+    server.start()
+    try:
+        asyncio.run(_wait_for_server(args.port))
+        summaries = asyncio.run(run_bench(args, profile))
+    finally:
+        server.terminate()
+        server.join()
+
+    print(json.dumps(summaries, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"profile": profile.__dict__, "results": summaries}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# tests/test_adaptive.py
+import types
+from utils.adaptive import AdaptivePlanner
+
+NO_THROUGHPUT_PLAN = {"download_mb": 0, "upload_mb": 0, "throughput": "not_due"}
+
+def make_planner() -> AdaptivePlanner:
+    config = types.SimpleNamespace(
+        test_interval=300,
+        adaptive_min_interval=60,
+        adaptive_max_factor=1.4,
+        degradation_latency_factor=1.5,
+        degradation_loss=2.0,
+        boost_duration=900,
+    )
+    return AdaptivePlanner(config)
+
+def observe(planner, now, latency, loss=0.0):
+    return planner.observe({"latency_avg": latency, "packet_loss": loss}, NO_THROUGHPUT_PLAN, now=now)
+
+def test_missing_latency_is_not_degradation():
+    planner = make_planner()
+    observe(planner, 0, 20.0)
+    assert observe(planner, 300, None) == 300
+    assert planner.boost_until == 0.0
+    assert planner.latency_baseline == 20.0
+
+def test_missing_latency_with_loss_is_degradation():
+    planner = make_planner()
+    observe(planner, 0, 20.0)
+    assert observe(planner, 300, None, loss=50.0) == 75
+
+def test_latency_spike_boosts_then_recovers():
+    planner = make_planner()
+    observe(planner, 0, 20.0)
+    assert observe(planner, 300, 60.0) == 75
+    # После boost_duration без деградации - обычный интервал
+    assert observe(planner, 1300, 20.0) == 300
+
+def test_sustained_latency_becomes_new_baseline():
+    planner = make_planner()
+    observe(planner, 0, 20.0)
+    now = 0
+    for _ in range(200):
+        now += planner.interval
+        observe(planner, now, 40.0)
+    # Базовая линия догнала новый уровень: учащенные измерения закончились,
+    # и после STABLE_CYCLES нормальных циклов интервал вырос до максимума
+    assert planner.latency_baseline * planner.config.degradation_latency_factor > 40.0
+    assert planner.stable_cycles >= planner.STABLE_CYCLES
+    assert observe(planner, now + 1000, 40.0) == 420
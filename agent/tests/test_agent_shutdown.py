@@ -0,0 +1,80 @@
+# tests/test_agent_shutdown.py
+import asyncio
+import types
+from agent import AgentRuntime
+
+class FakeSender:
+    def __init__(self):
+        self.outbox = []
+        self.saved = False
+
+    def enqueue(self, payload):
+        self.outbox.append(payload)
+
+    async def flush(self):
+        sent, self.outbox = len(self.outbox), []
+        return sent
+
+    def save_outbox(self):
+        self.saved = True
+
+class FakeProber:
+    def __init__(self):
+        self.pending = [{"target": "saas", "probe": "http", "rtt_avg": 10.0}]
+        self.finished_with = None
+        self.closed = False
+
+    async def finish(self, timeout):
+        self.finished_with = timeout
+
+    def drain(self):
+        results, self.pending = self.pending, []
+        return results
+
+    def close(self):
+        self.closed = True
+
+class FakeStore:
+    def close(self):
+        pass
+
+def make_runtime():
+    config = types.SimpleNamespace(
+        agent_id="agent-1",
+        test_interval=300,
+        schedule_jitter=0,
+        shutdown_timeout=20,
+    )
+    runtime = AgentRuntime(config, FakeStore())
+    runtime.sender = FakeSender()
+    runtime.target_prober = FakeProber()
+    return runtime
+
+def test_shutdown_sends_pending_target_results():
+    runtime = make_runtime()
+    sent = []
+
+    async def flush():
+        sent.extend(runtime.sender.outbox)
+        runtime.sender.outbox = []
+        return len(sent)
+
+    runtime.sender.flush = flush
+    runtime.stop()
+    asyncio.run(runtime.shutdown())
+
+    assert runtime.target_prober.closed
+    assert 0 < runtime.target_prober.finished_with <= 10
+    assert len(sent) == 1
+    assert sent[0]["agent_id"] == "agent-1"
+    assert sent[0]["latency"] is None
+    assert sent[0]["metainfo"]["targets_only"] is True
+    assert sent[0]["metainfo"]["targets"][0]["target"] == "saas"
+
+def test_shutdown_without_target_results():
+    runtime = make_runtime()
+    runtime.target_prober.pending = []
+    runtime.stop()
+    asyncio.run(runtime.shutdown())
+    assert runtime.sender.outbox == []
+    assert not runtime.sender.saved
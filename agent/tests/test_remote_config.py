@@ -0,0 +1,67 @@
+# tests/test_remote_config.py
+import asyncio
+import types
+from utils import remote_config
+from utils.remote_config import RemoteConfigPoller
+
+class FakeResponse:
+    def __init__(self, status: int, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeSession:
+    """Сервер отвечает через duration секунд (по фальшивым часам)"""
+
+    def __init__(self, clock, status: int, duration: float, headers=None):
+        self.clock = clock
+        self.status = status
+        self.duration = duration
+        self.headers = headers
+
+    def get(self, url, params, headers, timeout):
+        self.clock.now += self.duration
+        return FakeResponse(self.status, self.headers)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+def make_poller(tmp_path, monkeypatch, status, duration, headers=None, wait=120):
+    clock = FakeClock()
+    monkeypatch.setattr(remote_config, "time", clock)
+    config = types.SimpleNamespace(
+        api_url="http://server/api/v1",
+        api_key="key",
+        data_dir=str(tmp_path),
+        remote_config_wait=wait,
+        config_watch_interval=30,
+        test_timeout=5,
+        retry_delay=1,
+        retry_max_delay=120,
+    )
+    return RemoteConfigPoller(config, FakeSession(clock, status, duration, headers), lambda: None)
+
+def test_held_long_poll_repeats_immediately(tmp_path, monkeypatch):
+    poller = make_poller(tmp_path, monkeypatch, 304, duration=120)
+    assert asyncio.run(poller.poll()) is None
+
+def test_early_not_modified_is_delayed(tmp_path, monkeypatch):
+    poller = make_poller(tmp_path, monkeypatch, 304, duration=0.01)
+    assert asyncio.run(poller.poll()) == 30
+
+def test_without_long_poll_uses_watch_interval(tmp_path, monkeypatch):
+    poller = make_poller(tmp_path, monkeypatch, 304, duration=0.01, wait=0)
+    assert asyncio.run(poller.poll()) == 30
+
+def test_busy_server_retry_after(tmp_path, monkeypatch):
+    poller = make_poller(tmp_path, monkeypatch, 503, duration=0.01, headers={"Retry-After": "30"})
+    assert 30 <= asyncio.run(poller.poll()) <= 45
@@ -0,0 +1,104 @@
+# tests/test_sample_store.py
+import time
+import pytest
+from utils.sample_store import HEADER_SIZE, SampleStore, capacity_for, summarize_samples
+
+def test_append_and_query(tmp_path):
+    store = SampleStore(tmp_path / "samples.ring", capacity=10)
+    now = time.time()
+    store.append("latency", 12.5, timestamp=now - 2)
+    store.append("download", 95.0, timestamp=now - 1)
+    samples = store.query()
+    assert [s["probe"] for s in samples] == ["latency", "download"]
+    assert samples[0]["value"] == 12.5
+    assert samples[0]["ok"] is True
+    store.close()
+
+def test_failed_sample_has_no_value(tmp_path):
+    store = SampleStore(tmp_path / "samples.ring", capacity=10)
+    store.append("latency", None)
+    store.append("latency", 5.0, ok=False)
+    assert [(s["value"], s["ok"]) for s in store.query()] == [(None, False), (None, False)]
+    store.close()
+
+def test_wraparound_keeps_newest(tmp_path):
+    store = SampleStore(tmp_path / "samples.ring", capacity=4)
+    now = time.time()
+    for i in range(10):
+        store.append("latency", float(i), timestamp=now - 10 + i)
+    values = [s["value"] for s in store.query()]
+    assert values == [6.0, 7.0, 8.0, 9.0]
+    store.close()
+
+def test_reopen_restores_head_and_count(tmp_path):
+    path = tmp_path / "samples.ring"
+    store = SampleStore(path, capacity=4)
+    now = time.time()
+    for i in range(6):
+        store.append("latency", float(i), timestamp=now - 10 + i)
+    store.close()
+
+    store = SampleStore(path, capacity=4)
+    store.append("latency", 6.0, timestamp=now)
+    assert [s["value"] for s in store.query()] == [3.0, 4.0, 5.0, 6.0]
+    store.close()
+
+def test_reopen_with_other_capacity_recreates(tmp_path):
+    path = tmp_path / "samples.ring"
+    store = SampleStore(path, capacity=4)
+    store.append("latency", 1.0)
+    store.close()
+
+    store = SampleStore(path, capacity=8)
+    assert store.query() == []
+    assert path.stat().st_size == HEADER_SIZE + 8 * 16
+    store.close()
+
+def test_reopen_with_bad_header_recreates(tmp_path):
+    path = tmp_path / "samples.ring"
+    store = SampleStore(path, capacity=4)
+    store.append("latency", 1.0)
+    store.close()
+
+    with open(path, "r+b") as f:
+        f.write(b"XXXX")
+    store = SampleStore(path, capacity=4)
+    assert store.query() == []
+    store.close()
+
+def test_query_time_and_probe_filters(tmp_path):
+    store = SampleStore(tmp_path / "samples.ring", capacity=20)
+    now = time.time()
+    for i in range(10):
+        store.append("latency" if i % 2 else "jitter", float(i), timestamp=now - 100 + i * 10)
+
+    window = store.query(start=now - 70, end=now - 40)
+    assert [s["value"] for s in window] == [3.0, 4.0, 5.0, 6.0]
+    latency = store.query(start=now - 70, end=now - 40, probe="latency")
+    assert [s["value"] for s in latency] == [3.0, 5.0]
+    store.close()
+
+def test_query_unknown_probe(tmp_path):
+    store = SampleStore(tmp_path / "samples.ring", capacity=20)
+    with pytest.raises(ValueError, match="Unknown probe 'latncy'"):
+        store.query(probe="latncy")
+    store.close()
+
+def test_query_respects_retention(tmp_path):
+    store = SampleStore(tmp_path / "samples.ring", capacity=10, retention_days=1)
+    now = time.time()
+    store.append("latency", 1.0, timestamp=now - 2 * 86400)
+    store.append("latency", 2.0, timestamp=now - 60)
+    # Даже явный start не возвращает данные старше срока хранения
+    assert [s["value"] for s in store.query(start=now - 3 * 86400)] == [2.0]
+    store.close()
+
+def test_capacity_for_covers_retention():
+    assert capacity_for(1, 300, samples_per_cycle=10) == (86400 // 300 + 1) * 10
+
+def test_summarize_samples():
+    samples = [{"probe": "latency", "value": v} for v in (10.0, 20.0, 30.0, None)]
+    summary = summarize_samples(samples)["latency"]
+    assert summary["count"] == 4
+    assert summary["ok"] == 3
+    assert (summary["min"], summary["avg"], summary["p50"], summary["max"]) == (10.0, 20.0, 20.0, 30.0)
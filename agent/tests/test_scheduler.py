@@ -0,0 +1,141 @@
+# tests/test_scheduler.py
+import asyncio
+import types
+import uuid
+import pytest
+from utils import scheduler as scheduler_module
+from utils.scheduler import IntervalScheduler
+from utils.sender import build_payload
+
+class FakeClock:
+    """Монотонные и системные часы, которые двигает только тест"""
+
+    def __init__(self, wall: float, monotonic: float = 5000.0):
+        self.wall = wall
+        self.monotonic = monotonic
+        self.delays = []
+
+    def time(self) -> float:
+        return self.monotonic
+
+    def advance(self, seconds: float) -> None:
+        self.monotonic += seconds
+        self.wall += seconds
+
+    async def sleep(self, delay: float) -> None:
+        self.delays.append(delay)
+        self.advance(delay)
+
+    async def wait_for(self, awaitable, timeout: float):
+        awaitable.close()
+        self.delays.append(timeout)
+        self.advance(timeout)
+        raise asyncio.TimeoutError
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(wall=1_000_000.0)
+    fake_asyncio = types.SimpleNamespace(
+        get_running_loop=lambda: clock,
+        sleep=clock.sleep,
+        wait_for=clock.wait_for,
+        TimeoutError=asyncio.TimeoutError,
+    )
+    monkeypatch.setattr(scheduler_module, "asyncio", fake_asyncio)
+    monkeypatch.setattr(scheduler_module, "time", types.SimpleNamespace(time=lambda: clock.wall))
+    return clock
+
+def wait(scheduler, stop_event=None):
+    return asyncio.run(scheduler.wait_next(stop_event))
+
+def test_first_slot_is_aligned_to_interval(clock):
+    clock.wall = 1_000_050.0
+    scheduler = IntervalScheduler(300, jitter=0)
+    assert wait(scheduler)
+    assert clock.delays == [150.0]
+    assert clock.wall % 300 == 0
+
+def test_offset_is_stable_per_agent():
+    first = IntervalScheduler(300, agent_id="agent-1")
+    second = IntervalScheduler(300, agent_id="agent-1")
+    other = IntervalScheduler(300, agent_id="agent-2")
+    assert first.offset == second.offset
+    assert 0 <= first.offset < 300 * 0.2
+    assert first.offset != other.offset
+    assert IntervalScheduler(300, agent_id="agent-1", jitter=0).offset == 0
+
+def test_cycle_duration_does_not_drift(clock):
+    scheduler = IntervalScheduler(300, jitter=0)
+    wait(scheduler)
+    start = clock.wall
+    for cycle in range(1, 11):
+        clock.advance(7.3)   # длительность цикла измерений
+        wait(scheduler)
+        assert clock.wall == pytest.approx(start + cycle * 300)
+    assert clock.delays[1:] == pytest.approx([292.7] * 10)
+
+def test_long_cycle_runs_next_immediately(clock):
+    scheduler = IntervalScheduler(300, jitter=0)
+    wait(scheduler)
+    start = clock.wall
+    clock.advance(350)
+    wait(scheduler)
+    assert clock.delays[-1] == 0
+    wait(scheduler)
+    assert clock.wall == pytest.approx(start + 600)
+
+def test_missed_slots_are_skipped(clock):
+    scheduler = IntervalScheduler(300, jitter=0)
+    wait(scheduler)
+    start = clock.wall
+    clock.advance(750)   # пропущены слоты +300 и +600
+    wait(scheduler)
+    assert clock.delays[-1] == 0
+    wait(scheduler)
+    # Следующий цикл - в очередном слоте, без серии догоняющих запусков
+    assert clock.delays[-1] == pytest.approx(150)
+    assert clock.wall == pytest.approx(start + 900)
+
+def test_wall_clock_jump_does_not_move_schedule(clock):
+    scheduler = IntervalScheduler(300, jitter=0)
+    wait(scheduler)
+    clock.wall += 3600   # NTP-коррекция системных часов
+    wait(scheduler)
+    assert clock.delays[-1] == pytest.approx(300)
+
+def test_set_interval_rebuilds_schedule(clock):
+    scheduler = IntervalScheduler(300, jitter=0)
+    wait(scheduler)
+    clock.advance(10)
+    scheduler.set_interval(60)
+    wait(scheduler)
+    assert clock.wall % 60 == 0
+    assert clock.delays[-1] == pytest.approx(50)
+
+def test_stop_event_interrupts_wait():
+    async def run():
+        stop_event = asyncio.Event()
+        stop_event.set()
+        return await IntervalScheduler(300, jitter=0).wait_next(stop_event)
+
+    assert asyncio.run(run()) is False
+
+def test_build_payload_splits_main_fields():
+    config = types.SimpleNamespace(agent_id="agent-1")
+    payload = build_payload(config, {
+        "test_timestamp": 1_700_000_000.0,
+        "latency_avg": 12.5,
+        "download_speed": 95.0,
+        "packet_loss": 0.0,
+        "external_ip": "203.0.113.7",
+    })
+    assert uuid.UUID(payload["id"]).version == 7
+    assert payload["timestamp"] == "2023-11-14T22:13:20+00:00"
+    assert payload["agent_id"] == "agent-1"
+    assert (payload["latency"], payload["download"], payload["packet_loss"]) == (12.5, 95.0, 0.0)
+    assert payload["upload"] is None
+    assert payload["metainfo"] == {"test_timestamp": 1_700_000_000.0, "external_ip": "203.0.113.7"}
+
+def test_build_payload_ids_are_unique():
+    config = types.SimpleNamespace(agent_id="agent-1")
+    assert build_payload(config, {})["id"] != build_payload(config, {})["id"]
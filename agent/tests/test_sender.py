@@ -0,0 +1,111 @@
+# tests/test_sender.py
+import asyncio
+import types
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from utils import sender as sender_module
+from utils.sender import MeasurementSender, backoff_delay, retry_after
+
+class FakeResponse:
+    def __init__(self, status: int, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+    async def text(self) -> str:
+        return ""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeSession:
+    """Сервер, отвечающий по содержимому пачки"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.batches = []
+
+    def post(self, url, json, headers, timeout):
+        self.batches.append([item["id"] for item in json])
+        return FakeResponse(self.respond(json))
+
+def make_sender(respond):
+    config = types.SimpleNamespace(
+        api_url="http://server/api/v1",
+        api_key="key",
+        test_timeout=5,
+        max_retries=1,
+        retry_delay=0,
+        retry_max_delay=120,
+    )
+    sender = MeasurementSender(config, FakeSession(respond), batch_size=100)
+    for i in range(8):
+        sender.enqueue({"id": str(i)})
+    return sender
+
+def test_bad_item_is_isolated_by_splitting():
+    sender = make_sender(lambda batch: 422 if any(item["id"] == "5" for item in batch) else 201)
+    assert asyncio.run(sender.flush()) == 8
+    accepted = [ids for ids in sender.session.batches if "5" not in ids]
+    assert sorted(i for ids in accepted for i in ids) == ["0", "1", "2", "3", "4", "6", "7"]
+    assert ["5"] in sender.session.batches
+    assert not sender.outbox
+
+def test_too_large_batch_is_split():
+    sender = make_sender(lambda batch: 413 if len(batch) > 2 else 201)
+    assert asyncio.run(sender.flush()) == 8
+    accepted = [i for ids in sender.session.batches if len(ids) <= 2 for i in ids]
+    assert sorted(accepted) == [str(i) for i in range(8)]
+    assert not sender.outbox
+
+def test_auth_failure_keeps_outbox():
+    sender = make_sender(lambda batch: 401)
+    assert asyncio.run(sender.flush()) == 0
+    assert len(sender.outbox) == 8
+    assert sender.session.batches == [[str(i) for i in range(8)]]
+    # До истечения паузы повторной отправки не будет
+    assert asyncio.run(sender.flush()) == 0
+    assert len(sender.session.batches) == 1
+
+def test_other_client_error_drops_batch():
+    sender = make_sender(lambda batch: 404)
+    assert asyncio.run(sender.flush()) == 8
+    assert not sender.outbox
+
+def test_server_error_keeps_outbox():
+    sender = make_sender(lambda batch: 500)
+    assert asyncio.run(sender.flush()) == 0
+    assert len(sender.outbox) == 8
+
+def test_retry_after_seconds():
+    assert retry_after(FakeResponse(503, {"Retry-After": "7"})) == 7.0
+    assert retry_after(FakeResponse(503, {"Retry-After": "1.5"})) == 1.5
+    assert retry_after(FakeResponse(503, {"Retry-After": "-3"})) == 0.0
+
+def test_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = retry_after(FakeResponse(503, {"Retry-After": format_datetime(when, usegmt=True)}))
+    # HTTP-дата с точностью до секунды
+    assert 28 <= delay <= 30
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert retry_after(FakeResponse(503, {"Retry-After": format_datetime(past, usegmt=True)})) == 0.0
+
+def test_retry_after_missing_or_invalid():
+    assert retry_after(FakeResponse(503)) is None
+    assert retry_after(FakeResponse(503, {"Retry-After": "soon"})) is None
+
+def test_backoff_delay_bounds(monkeypatch):
+    monkeypatch.setattr(sender_module.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt, 2, 30) for attempt in range(1, 6)] == [2, 4, 8, 16, 30]
+    monkeypatch.setattr(sender_module.random, "uniform", lambda low, high: low)
+    assert backoff_delay(3, 2, 30) == 0
+
+def test_backoff_delay_respects_server_delay(monkeypatch):
+    # Не раньше Retry-After и не позже чем на 50% позже
+    monkeypatch.setattr(sender_module.random, "uniform", lambda low, high: low)
+    assert backoff_delay(5, 2, 30, server_delay=10) == 10.0
+    monkeypatch.setattr(sender_module.random, "uniform", lambda low, high: high)
+    assert backoff_delay(1, 2, 30, server_delay=10) == 15.0
+    assert backoff_delay(1, 2, 30, server_delay=0) == 0.0
@@ -0,0 +1,53 @@
+# tests/test_targets.py
+import asyncio
+import types
+from utils.targets import TargetProber
+
+class FakeProber(TargetProber):
+    """Пробы без сети: slow ждет сигнала, fast завершается сразу"""
+
+    def __init__(self, targets):
+        super().__init__(targets, session=None, default_interval=300, max_concurrency=4, timeout=1)
+        self.release = asyncio.Event()
+        self.calls = {"slow": 0, "fast": 0}
+
+    async def probe_slow(self, target):
+        self.calls["slow"] += 1
+        await self.release.wait()
+        return {"rtt_avg": 1000.0}
+
+    async def probe_fast(self, target):
+        self.calls["fast"] += 1
+        return {"rtt_avg": 1.0}
+
+def target(name: str, probe: str):
+    return types.SimpleNamespace(name=name, probes=[probe], interval=0.01)
+
+def test_slow_target_does_not_delay_others():
+    async def scenario():
+        prober = FakeProber([target("slow", "slow"), target("fast", "fast")])
+        for _ in range(3):
+            prober.run_due()
+            await asyncio.sleep(0.02)
+        # Медленная цель не перезапускается, пока идет ее опрос
+        assert prober.calls == {"slow": 1, "fast": 3}
+        assert [r["target"] for r in prober.drain()] == ["fast", "fast", "fast"]
+
+        prober.release.set()
+        await asyncio.wait(list(prober._in_flight.values()))
+        assert [r["target"] for r in prober.drain()] == ["slow"]
+        prober.close()
+
+    asyncio.run(scenario())
+
+def test_finish_waits_then_cancels():
+    async def scenario():
+        prober = FakeProber([target("slow", "slow"), target("fast", "fast")])
+        prober.run_due()
+        await prober.finish(timeout=0.05)
+        assert not prober._in_flight
+        # Завершенный опрос сохранен, незавершенный отменен
+        assert [r["target"] for r in prober.drain()] == ["fast"]
+        prober.close()
+
+    asyncio.run(scenario())
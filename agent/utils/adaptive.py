@@ -0,0 +1,218 @@
+# app/utils/adaptive.py
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Полный набор тестов пропускной способности (МБ)
+FULL_DOWNLOAD_MB = 10
+FULL_UPLOAD_MB = 5
+# Уменьшенный набор при занятом канале
+REDUCED_DOWNLOAD_MB = 2
+REDUCED_UPLOAD_MB = 1
+
+class LinkMonitor:
+    """
+    Фоновая загрузка канала по счетчикам интерфейсов (psutil.net_io_counters).
+
+    Интервалы, в которые агент сам гонял тесты пропускной способности,
+    в расчет не входят: считается только чужой (пользовательский) трафик.
+    """
+
+    def __init__(self, sample_interval: float = 5.0, window: float = 60.0):
+        self.sample_interval = sample_interval
+        self.window = window
+        # (время, принято байт, отправлено байт, был ли трафик агента с прошлого сэмпла)
+        self._samples: Deque[Tuple[float, int, int, bool]] = deque()
+        self._own_active = 0
+        self._own_since_sample = False
+        self._psutil = None
+
+    def available(self) -> bool:
+        if self._psutil is None:
+            try:
+                import psutil
+                self._psutil = psutil
+            except ImportError:
+                logger.warning("psutil is not installed, link utilization is unknown")
+                self._psutil = False
+        return bool(self._psutil)
+
+    def sample(self) -> None:
+        if not self.available():
+            return
+        counters = self._psutil.net_io_counters()
+        now = time.monotonic()
+        self._samples.append((now, counters.bytes_recv, counters.bytes_sent, self._own_since_sample))
+        self._own_since_sample = self._own_active > 0
+        while self._samples and self._samples[0][0] < now - self.window - self.sample_interval:
+            self._samples.popleft()
+
+    @contextmanager
+    def own_traffic(self):
+        """Участок с собственным трафиком агента (тесты пропускной способности)"""
+        self.sample()
+        self._own_active += 1
+        self._own_since_sample = True
+        try:
+            yield
+        finally:
+            self._own_active -= 1
+            self.sample()
+
+    def background_mbps(self) -> Optional[Tuple[float, float]]:
+        """Средний чужой трафик за окно (вход, выход), Мбит/с; None - нет данных"""
+        clean_time = 0.0
+        received = sent = 0
+        samples = list(self._samples)
+        for previous, current in zip(samples, samples[1:]):
+            if current[3]:
+                continue
+            clean_time += current[0] - previous[0]
+            received += current[1] - previous[1]
+            sent += current[2] - previous[2]
+        if clean_time < self.sample_interval:
+            return None
+        return received * 8 / clean_time / 1e6, sent * 8 / clean_time / 1e6
+
+    async def run_forever(self, stop_event: asyncio.Event) -> None:
+        if not self.available():
+            return
+        while not stop_event.is_set():
+            self.sample()
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.sample_interval)
+            except asyncio.TimeoutError:
+                pass
+
+class AdaptivePlanner:
+    """
+    Адаптация цикла измерений к состоянию канала:
+    - при занятом чужим трафиком канале тесты пропускной способности
+      уменьшаются или откладываются (но не дольше max_throughput_defer);
+    - при ухудшении задержки/потерь интервал временно сокращается,
+      короткие циклы идут без тестов пропускной способности;
+    - в стабильный период интервал растет до test_interval * adaptive_max_factor
+
+    Цикл без задержки (ping не выполнился) - неизвестное состояние, а не
+    деградация, если только потери не превысили порог. Базовая линия
+    задержки медленно следует и за деградированными циклами: устойчиво
+    выросшая задержка (другой маршрут, провайдер) со временем становится
+    новой нормой, и учащенные измерения не продлеваются бесконечно.
+    """
+
+    # Сколько стабильных циклов подряд нужно для увеличения интервала
+    STABLE_CYCLES = 6
+    EWMA_ALPHA = 0.2
+    # Сглаживание базовой линии задержки по деградированным циклам
+    SLOW_EWMA_ALPHA = 0.02
+
+    def __init__(self, config):
+        self.config = config
+        self.interval = float(config.test_interval)
+        self.capacity: Dict[str, float] = {}       # оценка пропускной способности, Мбит/с
+        self.latency_baseline: Optional[float] = None
+        self.boost_until = 0.0
+        self.stable_cycles = 0
+        self.last_throughput = 0.0
+        self.deferred_since: Optional[float] = None
+
+    def _ewma(self, current: Optional[float], value: float, alpha: Optional[float] = None) -> float:
+        if current is None:
+            return value
+        return current + (alpha if alpha is not None else self.EWMA_ALPHA) * (value - current)
+
+    def utilization(self, background: Optional[Tuple[float, float]]) -> Optional[float]:
+        """Доля пропускной способности, занятая чужим трафиком (максимум по направлениям)"""
+        if background is None or not self.capacity:
+            return None
+        shares = []
+        if self.capacity.get("download"):
+            shares.append(background[0] / self.capacity["download"])
+        if self.capacity.get("upload"):
+            shares.append(background[1] / self.capacity["upload"])
+        return max(shares) if shares else None
+
+    def plan_throughput(self, background: Optional[Tuple[float, float]], now: Optional[float] = None) -> Dict:
+        """Размер тестов пропускной способности для текущего цикла (0 - пропустить)"""
+        now = now if now is not None else time.monotonic()
+        utilization = self.utilization(background)
+        plan = {
+            "utilization": round(utilization, 3) if utilization is not None else None,
+            "download_mb": FULL_DOWNLOAD_MB,
+            "upload_mb": FULL_UPLOAD_MB,
+            "throughput": "full",
+        }
+
+        # Короткие циклы при ухудшении - без тестов пропускной способности
+        if self.last_throughput and now - self.last_throughput < self.config.test_interval * 0.9:
+            plan.update(download_mb=0, upload_mb=0, throughput="not_due")
+            return plan
+
+        if utilization is None or utilization < self.config.link_busy_threshold:
+            self.deferred_since = None
+            return plan
+
+        deferred_for = now - self.deferred_since if self.deferred_since is not None else 0.0
+        if (
+            utilization >= self.config.link_defer_threshold
+            and deferred_for < self.config.max_throughput_defer
+        ):
+            if self.deferred_since is None:
+                self.deferred_since = now
+            plan.update(download_mb=0, upload_mb=0, throughput="deferred")
+            return plan
+
+        # Занятый канал или отложено слишком долго - уменьшенный тест
+        self.deferred_since = None
+        plan.update(download_mb=REDUCED_DOWNLOAD_MB, upload_mb=REDUCED_UPLOAD_MB, throughput="reduced")
+        return plan
+
+    def observe(self, results: Dict, plan: Dict, now: Optional[float] = None) -> float:
+        """Учет результатов цикла; возвращает интервал до следующего цикла"""
+        now = now if now is not None else time.monotonic()
+        base = float(self.config.test_interval)
+
+        if plan["download_mb"]:
+            self.last_throughput = now
+        # Пропускную способность оценивают только полные тесты: на уменьшенных
+        # сильнее сказывается разгон TCP
+        if plan["throughput"] == "full":
+            for metric, key in (("download", "download_speed"), ("upload", "upload_speed")):
+                if results.get(key):
+                    self.capacity[metric] = self._ewma(self.capacity.get(metric), results[key])
+
+        latency = results.get("latency_avg")
+        packet_loss = results.get("packet_loss") or 0.0
+        degraded = packet_loss >= self.config.degradation_loss or (
+            latency is not None
+            and self.latency_baseline is not None
+            and latency > self.latency_baseline * self.config.degradation_latency_factor
+        )
+
+        if degraded:
+            if now >= self.boost_until:
+                logger.info(f"Link degraded (latency {latency}, loss {packet_loss}%), probing more often")
+            self.boost_until = now + self.config.boost_duration
+            self.stable_cycles = 0
+            if latency is not None:
+                self.latency_baseline = self._ewma(self.latency_baseline, latency, self.SLOW_EWMA_ALPHA)
+        elif latency is not None:
+            self.latency_baseline = self._ewma(self.latency_baseline, latency)
+            self.stable_cycles += 1
+
+        if now < self.boost_until:
+            interval = max(self.config.adaptive_min_interval, base / 4)
+        elif self.stable_cycles >= self.STABLE_CYCLES:
+            interval = base * self.config.adaptive_max_factor
+        else:
+            interval = base
+
+        if interval != self.interval:
+            logger.info(f"Measurement interval {self.interval:.0f}s -> {interval:.0f}s")
+            self.interval = interval
+        return interval
@@ -1,16 +1,34 @@
 # app/utils/config_loader.py
 import os
 import json
-import yaml
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
-from pydantic import BaseSettings, Field, validator
+from typing import Dict, Any, List, Optional, Tuple, Union
+from pydantic import BaseModel, BaseSettings, Field, validator
 from pydantic.env_settings import SettingsSourceCallable
-import toml
 
 logger = logging.getLogger(__name__)
 
+PROBE_TYPES = ('http', 'ping', 'tcp', 'dns')
+
+class TargetConfig(BaseModel):
+    """Цель мониторинга с собственным набором проб и интервалом"""
+    
+    name: str
+    host: str                             # hostname или URL
+    probes: List[str] = ['http']
+    interval: Optional[int] = Field(None, ge=10)  # секунды, по умолчанию test_interval
+    count: int = Field(3, ge=1, le=20)    # попыток на пробу
+    port: Optional[int] = None            # для tcp
+    dns_server: Optional[str] = None      # для dns: опрашиваемый сервер
+    query: Optional[str] = None           # для dns: имя для разрешения
+    
+    @validator('probes', each_item=True)
+    def validate_probe(cls, v):
+        if v not in PROBE_TYPES:
+            raise ValueError(f"Probe must be one of {PROBE_TYPES}")
+        return v
+
 class AgentConfig(BaseSettings):
     """Модель конфигурации агента"""
     
@@ -23,6 +41,32 @@ class AgentConfig(BaseSettings):
     test_interval: int = Field(300, env="TEST_INTERVAL", ge=60)  # секунды, минимум 60
     test_server: str = Field("https://httpbin.org", env="TEST_SERVER")
     test_timeout: int = Field(30, env="TEST_TIMEOUT")
+    schedule_jitter: float = Field(0.2, env="SCHEDULE_JITTER", ge=0, le=1)  # доля интервала
+    dns_test_hostname: str = Field("google.com", env="DNS_TEST_HOSTNAME")
+    mtu_test_host: str = Field("8.8.8.8", env="MTU_TEST_HOST")
+    
+    # Адаптивное расписание: тесты пропускной способности подстраиваются под
+    # фоновую загрузку канала, интервал - под стабильность задержки/потерь
+    adaptive_scheduling: bool = Field(True, env="ADAPTIVE_SCHEDULING")
+    link_busy_threshold: float = Field(0.3, env="LINK_BUSY_THRESHOLD", ge=0, le=1)    # уменьшенный тест
+    link_defer_threshold: float = Field(0.6, env="LINK_DEFER_THRESHOLD", ge=0, le=1)  # тест откладывается
+    max_throughput_defer: int = Field(3600, env="MAX_THROUGHPUT_DEFER")  # секунды
+    adaptive_min_interval: int = Field(60, env="ADAPTIVE_MIN_INTERVAL", ge=10)
+    # Не больше LIVENESS_STALE_FACTOR сервера (1.5), иначе агент будет считаться пропавшим
+    adaptive_max_factor: float = Field(1.4, env="ADAPTIVE_MAX_FACTOR", ge=1)
+    degradation_latency_factor: float = Field(1.5, env="DEGRADATION_LATENCY_FACTOR", gt=1)
+    degradation_loss: float = Field(2.0, env="DEGRADATION_LOSS")  # %
+    boost_duration: int = Field(900, env="BOOST_DURATION")  # секунды учащенных измерений
+    
+    # Трассировка пути до тестового сервера - только при превышении порогов
+    path_probe_enabled: bool = Field(True, env="PATH_PROBE_ENABLED")
+    path_latency_threshold: float = Field(150.0, env="PATH_LATENCY_THRESHOLD")  # мс
+    path_loss_threshold: float = Field(2.0, env="PATH_LOSS_THRESHOLD")  # %
+    path_max_hops: int = Field(30, env="PATH_MAX_HOPS", ge=1, le=64)
+    
+    # Дополнительные цели мониторинга
+    targets: List[TargetConfig] = Field(default_factory=list, env="TARGETS")
+    max_concurrent_probes: int = Field(20, env="MAX_CONCURRENT_PROBES", ge=1)
     
     # Настройки логирования
     log_level: str = Field("INFO", env="LOG_LEVEL")
@@ -32,10 +76,24 @@ class AgentConfig(BaseSettings):
     # Настройки сети
     max_retries: int = Field(3, env="MAX_RETRIES")
     retry_delay: int = Field(5, env="RETRY_DELAY")
+    retry_max_delay: int = Field(120, env="RETRY_MAX_DELAY")  # предел паузы между повторами
+    connection_pool_size: int = Field(10, env="CONNECTION_POOL_SIZE")
+    shutdown_timeout: int = Field(20, env="SHUTDOWN_TIMEOUT")  # секунды на отправку при остановке
+    config_watch_interval: int = Field(30, env="CONFIG_WATCH_INTERVAL")  # проверка изменений файлов
+    
+    # Централизованная конфигурация: опрос GET /agents/config (ETag, long-poll)
+    remote_config: bool = Field(True, env="REMOTE_CONFIG")
+    remote_config_wait: int = Field(120, env="REMOTE_CONFIG_WAIT", ge=0)  # long-poll, сек
+    
+    # Собственные метрики агента (формат Prometheus)
+    metrics_port: Optional[int] = Field(None, env="METRICS_PORT")  # HTTP /metrics; None - отключен
+    metrics_host: str = Field("127.0.0.1", env="METRICS_HOST")
+    metrics_textfile: Optional[str] = Field(None, env="METRICS_TEXTFILE")  # для textfile collector node_exporter
     
     # Дополнительные настройки
     enable_detailed_metrics: bool = Field(False, env="ENABLE_DETAILED_METRICS")
     data_retention_days: int = Field(7, env="DATA_RETENTION_DAYS")
+    data_dir: str = Field("/var/lib/internet-monitor", env="DATA_DIR")
     
     class Config:
         env_file = ".env"
@@ -51,6 +109,7 @@ class AgentConfig(BaseSettings):
         ):
             return (
                 init_settings,
+                remote_config_settings,
                 env_settings,
                 config_file_settings,
                 file_secret_settings,
@@ -69,8 +128,17 @@ class AgentConfig(BaseSettings):
             raise ValueError("API URL must start with http:// or https://")
         return v.rstrip('/')
 
-def config_file_settings(settings: BaseSettings) -> Dict[str, Any]:
-    """Загрузка конфигурации из файлов"""
+# Явно указанный файл конфигурации (load_config(config_path))
+_explicit_config_path: Optional[Path] = None
+
+# Кэш разобранных файлов: сигнатура (путь, mtime, размер) -> данные
+_config_cache: Dict[str, Any] = {"signature": None, "data": {}}
+
+def _candidate_files() -> List[Path]:
+    """Существующие файлы конфигурации в порядке применения"""
+    if _explicit_config_path is not None:
+        return [_explicit_config_path] if _explicit_config_path.exists() else []
+
     config_dirs = [
         Path.cwd() / "config",
         Path.home() / ".config" / "internet-monitor",
@@ -84,26 +152,65 @@ def config_file_settings(settings: BaseSettings) -> Dict[str, Any]:
                 config_file = config_dir / f"config{ext}"
                 if config_file.exists():
                     config_files.append(config_file)
+    return config_files
+
+def _files_signature(config_files: List[Path]) -> Tuple:
+    signature = []
+    for config_file in config_files:
+        try:
+            stat = config_file.stat()
+            signature.append((str(config_file), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            continue
+    return tuple(signature)
+
+def _read_config_file(config_file: Path) -> Dict[str, Any]:
+    """Разбор одного файла; парсеры YAML/TOML импортируются только при необходимости"""
+    with open(config_file, 'r') as f:
+        if config_file.suffix == '.json':
+            return json.load(f) or {}
+        if config_file.suffix in ['.yaml', '.yml']:
+            import yaml
+            return yaml.safe_load(f) or {}
+        if config_file.suffix == '.toml':
+            import toml
+            return toml.load(f) or {}
+    return {}
+
+def config_file_settings(settings: BaseSettings) -> Dict[str, Any]:
+    """Загрузка конфигурации из файлов (с кэшем по mtime)"""
+    config_files = _candidate_files()
+    signature = _files_signature(config_files)
+    if signature == _config_cache["signature"]:
+        return dict(_config_cache["data"])
     
     config_data = {}
     for config_file in config_files:
         try:
-            if config_file.suffix == '.json':
-                with open(config_file, 'r') as f:
-                    config_data.update(json.load(f))
-            elif config_file.suffix in ['.yaml', '.yml']:
-                with open(config_file, 'r') as f:
-                    config_data.update(yaml.safe_load(f))
-            elif config_file.suffix == '.toml':
-                with open(config_file, 'r') as f:
-                    config_data.update(toml.load(f))
-            
+            config_data.update(_read_config_file(config_file))
             logger.info(f"Loaded config from {config_file}")
             
         except Exception as e:
             logger.warning(f"Failed to load config from {config_file}: {e}")
     
-    return config_data
+    _config_cache["signature"] = signature
+    _config_cache["data"] = config_data
+    return dict(config_data)
+
+# Параметры с сервера (utils/remote_config.py): переопределяют файлы и
+# переменные окружения; сервер отдает только управляемые централизованно поля
+_remote_settings: Dict[str, Any] = {}
+
+def set_remote_settings(values: Dict[str, Any]) -> None:
+    _remote_settings.clear()
+    _remote_settings.update(values)
+
+def remote_config_settings(settings: BaseSettings) -> Dict[str, Any]:
+    return dict(_remote_settings)
+
+def config_files_changed() -> bool:
+    """Изменились ли файлы конфигурации с момента последней загрузки"""
+    return _files_signature(_candidate_files()) != _config_cache["signature"]
 
 def load_config(config_path: Optional[Union[str, Path]] = None) -> AgentConfig:
     """
@@ -111,48 +218,44 @@ def load_config(config_path: Optional[Union[str, Path]] = None) -> AgentConfig:
     
     Приоритет источников (от высшего к низшему):
     1. Аргументы командной строки
-    2. Переменные окружения
-    3. Файлы конфигурации
-    4. Значения по умолчанию
+    2. Конфигурация с сервера (remote_config)
+    3. Переменные окружения
+    4. Файлы конфигурации
+    5. Значения по умолчанию
     """
+    global _explicit_config_path
     try:
         # Если указан путь к конфигурационному файлу
         if config_path:
             config_path = Path(config_path)
             if config_path.exists():
-                global config_file_settings
-                original_settings = config_file_settings
-                
-                def custom_config_settings(settings: BaseSettings) -> Dict[str, Any]:
-                    config_data = {}
-                    try:
-                        if config_path.suffix == '.json':
-                            with open(config_path, 'r') as f:
-                                config_data.update(json.load(f))
-                        elif config_path.suffix in ['.yaml', '.yml']:
-                            with open(config_path, 'r') as f:
-                                config_data.update(yaml.safe_load(f))
-                        elif config_path.suffix == '.toml':
-                            with open(config_path, 'r') as f:
-                                config_data.update(toml.load(f))
-                        logger.info(f"Loaded config from {config_path}")
-                    except Exception as e:
-                        logger.error(f"Failed to load config from {config_path}: {e}")
-                    return config_data
-                
-                # Временно заменяем функцию для загрузки из указанного файла
-                config_file_settings = custom_config_settings
-                config = AgentConfig()
-                config_file_settings = original_settings
-                return config
+                _explicit_config_path = config_path
         
-        # Стандартная загрузка
         return AgentConfig()
         
     except Exception as e:
         logger.error(f"Failed to load configuration: {e}")
         raise
 
+def reload_config(current: AgentConfig, force: bool = False) -> AgentConfig:
+    """
+    Перечитывание конфигурации без перезапуска процесса.
+    force=True перечитывает файлы даже без изменения mtime.
+    При ошибке возвращается текущая конфигурация.
+    """
+    if force:
+        _config_cache["signature"] = None
+    try:
+        config = AgentConfig()
+    except Exception as e:
+        logger.error(f"Config reload failed, keeping current configuration: {e}")
+        return current
+    if not validate_config(config):
+        logger.error("Reloaded configuration is invalid, keeping current configuration")
+        return current
+    logger.info("Configuration reloaded")
+    return config
+
 def save_config(config: AgentConfig, config_path: Union[str, Path]) -> bool:
     """Сохранение конфигурации в файл"""
     try:
@@ -165,9 +268,11 @@ def save_config(config: AgentConfig, config_path: Union[str, Path]) -> bool:
             with open(config_path, 'w') as f:
                 json.dump(config_dict, f, indent=2)
         elif config_path.suffix in ['.yaml', '.yml']:
+            import yaml
             with open(config_path, 'w') as f:
                 yaml.dump(config_dict, f, default_flow_style=False)
         elif config_path.suffix == '.toml':
+            import toml
             with open(config_path, 'w') as f:
                 toml.dump(config_dict, f)
         else:
@@ -189,13 +294,37 @@ def generate_config_template(output_path: Union[str, Path]) -> bool:
         "test_interval": 300,
         "test_server": "https://httpbin.org",
         "test_timeout": 30,
+        "schedule_jitter": 0.2,
+        "adaptive_scheduling": True,
+        "link_busy_threshold": 0.3,
+        "link_defer_threshold": 0.6,
+        "path_probe_enabled": True,
+        "path_latency_threshold": 150.0,
+        "path_loss_threshold": 2.0,
+        "dns_test_hostname": "google.com",
+        "mtu_test_host": "8.8.8.8",
+        "targets": [
+            {"name": "office-gw", "host": "10.0.0.1", "probes": ["ping"], "interval": 60},
+            {"name": "crm", "host": "https://crm.example.com", "probes": ["http", "tcp"]},
+            {"name": "dns-primary", "host": "example.com", "probes": ["dns"], "dns_server": "1.1.1.1"}
+        ],
+        "max_concurrent_probes": 20,
         "log_level": "INFO",
         "log_file": None,
         "log_rotation": True,
         "max_retries": 3,
         "retry_delay": 5,
+        "retry_max_delay": 120,
+        "connection_pool_size": 10,
+        "shutdown_timeout": 20,
+        "config_watch_interval": 30,
+        "remote_config": True,
+        "remote_config_wait": 120,
+        "metrics_port": None,
+        "metrics_textfile": None,
         "enable_detailed_metrics": False,
-        "data_retention_days": 7
+        "data_retention_days": 7,
+        "data_dir": "/var/lib/internet-monitor"
     }
     
     try:
@@ -206,9 +335,11 @@ def generate_config_template(output_path: Union[str, Path]) -> bool:
             with open(output_path, 'w') as f:
                 json.dump(template, f, indent=2)
         elif output_path.suffix in ['.yaml', '.yml']:
+            import yaml
             with open(output_path, 'w') as f:
                 yaml.dump(template, f, default_flow_style=False)
         elif output_path.suffix == '.toml':
+            import toml
             with open(output_path, 'w') as f:
                 toml.dump(template, f)
         else:
@@ -1,47 +1,119 @@
 # app/utils/network_tests.py
 import asyncio
 import aiohttp
+import contextlib
 import socket
 import time
-import subprocess
-import platform
 import statistics
 from typing import Dict, List, Optional, Tuple
-import psutil
-from ping3 import ping
-import dns.resolver
+from utils.sample_store import summarize_samples
+
+# psutil, ping3, dnspython и subprocess импортируются внутри проб,
+# которые их используют: запуск агента не платит за неиспользуемые модули
 
 class NetworkTester:
-    def __init__(self, test_server: str = "https://httpbin.org"):
+    def __init__(
+        self,
+        test_server: str = "https://httpbin.org",
+        sample_store=None,
+        session: Optional[aiohttp.ClientSession] = None,
+        dns_hostname: str = "google.com",
+        mtu_host: str = "8.8.8.8"
+    ):
         self.test_server = test_server
-        self.session: Optional[aiohttp.ClientSession] = None
+        self.dns_hostname = dns_hostname
+        self.mtu_host = mtu_host
+        self.session: Optional[aiohttp.ClientSession] = session
+        # Внешняя сессия (общий пул соединений) не закрывается тестером
+        self._owns_session = session is None
+        self.sample_store = sample_store
+        self.samples: List[Dict] = []  # Сырые сэмплы текущего цикла
+        self.durations: Dict[str, float] = {}  # Длительность проб текущего цикла, сек
+
+    async def _timed(self, probe: str, coro) -> Dict:
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.durations[probe] = time.perf_counter() - started
+
+    def _record(self, probe: str, value: Optional[float]) -> None:
+        """Сохранение сырого сэмпла пробы"""
+        timestamp = time.time()
+        self.samples.append({
+            "timestamp": timestamp,
+            "probe": probe,
+            "value": round(value, 3) if value is not None else None,
+            "ok": value is not None,
+        })
+        if self.sample_store is not None:
+            self.sample_store.append(probe, value, timestamp=timestamp)
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self._owns_session:
+            self.session = aiohttp.ClientSession()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
+        if self.session and self._owns_session:
             await self.session.close()
 
-    async def run_all_tests(self) -> Dict:
-        """Запуск всех сетевых тестов"""
+    async def run_all_tests(
+        self,
+        download_mb: int = 10,
+        upload_mb: int = 5,
+        link_monitor=None,
+        path_thresholds: Optional[Tuple[float, float]] = None,
+        path_max_hops: int = 30
+    ) -> Dict:
+        """
+        Запуск всех сетевых тестов. download_mb/upload_mb = 0 - тест
+        пропускной способности в этом цикле пропускается; path_thresholds -
+        пороги (задержка мс, потери %), выше которых трассируется путь
+        """
         results = {}
         
         # Основные тесты
-        results.update(await self.test_latency())
-        results.update(await self.test_download_speed())
-        results.update(await self.test_upload_speed())
-        results.update(await self.test_packet_loss())
-        results.update(await self.test_jitter())
+        results.update(await self._timed("latency", self.test_latency()))
+        if download_mb or upload_mb:
+            # Трафик тестов не должен считаться фоновой загрузкой канала
+            with link_monitor.own_traffic() if link_monitor else contextlib.nullcontext():
+                if download_mb:
+                    results.update(await self._timed("download", self.test_download_speed(download_mb)))
+                if upload_mb:
+                    results.update(await self._timed("upload", self.test_upload_speed(upload_mb)))
+        if not download_mb:
+            results.update({"download_speed": None, "download_skipped": True})
+        if not upload_mb:
+            results.update({"upload_speed": None, "upload_skipped": True})
+        results.update(await self._timed("packet_loss", self.test_packet_loss()))
+        results.update(await self._timed("jitter", self.test_jitter()))
         
         # Дополнительные тесты
-        results.update(self.test_dns_resolution())
-        results.update(await self.get_network_info())
-        results.update(self.test_mtu())
+        results.update(await self._timed("dns", self.test_dns_resolution()))
+        results.update(await self._timed("network_info", self.get_network_info()))
+        results.update(await self._timed("mtu", self.test_mtu()))
+
+        if path_thresholds and self.path_degraded(results, *path_thresholds):
+            results["path"] = await self._timed("path", self.test_path(path_max_hops))
         
         return results
 
+    @staticmethod
+    def path_degraded(results: Dict, latency_threshold: float, loss_threshold: float) -> bool:
+        latency = results.get("latency_avg")
+        return (
+            latency is None
+            or latency >= latency_threshold
+            or (results.get("packet_loss") or 0) >= loss_threshold
+        )
+
+    async def test_path(self, max_hops: int = 30) -> Dict:
+        """Путь до тестового сервера: адрес, RTT и потери по хопам"""
+        from utils.path_probe import probe_path
+        host = self.test_server.split("//")[-1].split("/")[0].split(":")[0]
+        return await probe_path(host, max_hops=max_hops)
+
     async def test_latency(self, count: int = 10) -> Dict:
         """Измерение задержки (ping)"""
         latencies = []
@@ -56,6 +128,7 @@ class NetworkTester:
                 latencies.append(latency)
             except (aiohttp.ClientError, asyncio.TimeoutError):
                 latencies.append(None)
+            self._record("latency", latencies[-1])
             await asyncio.sleep(0.1)
         
         # Фильтруем неудачные попытки
@@ -85,6 +158,7 @@ class NetworkTester:
             end_time = time.time()
             duration = end_time - start_time
             speed_mbps = (total_bytes * 8) / (duration * 1000000)  # Mbps
+            self._record("download", speed_mbps)
             
             return {
                 "download_speed": round(speed_mbps, 2),
@@ -92,6 +166,7 @@ class NetworkTester:
                 "download_time": round(duration, 2)
             }
         except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._record("download", None)
             return {"download_speed": None, "download_error": True}
 
     async def test_upload_speed(self, file_size_mb: int = 5) -> Dict:
@@ -111,6 +186,7 @@ class NetworkTester:
             end_time = time.time()
             duration = end_time - start_time
             speed_mbps = (len(test_data) * 8) / (duration * 1000000)  # Mbps
+            self._record("upload", speed_mbps)
             
             return {
                 "upload_speed": round(speed_mbps, 2),
@@ -118,20 +194,26 @@ class NetworkTester:
                 "upload_time": round(duration, 2)
             }
         except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._record("upload", None)
             return {"upload_speed": None, "upload_error": True}
 
     async def test_packet_loss(self, count: int = 20) -> Dict:
         """Тест потери пакетов"""
+        from ping3 import ping
         successful = 0
         host = self.test_server.split("//")[-1].split("/")[0]
+        loop = asyncio.get_running_loop()
         
         for _ in range(count):
+            result = None
             try:
-                result = ping(host, timeout=2)
+                # ping3 блокирующий - не держим им event loop
+                result = await loop.run_in_executor(None, ping, host, 2)
                 if result is not None:
                     successful += 1
             except Exception:
                 pass
+            self._record("packet_loss", result * 1000 if result else None)
             await asyncio.sleep(0.2)
         
         packet_loss = ((count - successful) / count) * 100
@@ -155,8 +237,9 @@ class NetworkTester:
                 end_time = time.time()
                 latency = (end_time - start_time) * 1000
                 latencies.append(latency)
+                self._record("jitter", latency)
             except Exception:
-                pass
+                self._record("jitter", None)
             await asyncio.sleep(0.1)
         
         if len(latencies) > 1:
@@ -169,24 +252,35 @@ class NetworkTester:
             "jitter_samples": len(latencies)
         }
 
-    def test_dns_resolution(self, hostname: str = "google.com") -> Dict:
-        """Тест скорости DNS разрешения"""
+    async def test_dns_resolution(self, hostname: Optional[str] = None) -> Dict:
+        """
+        Тест скорости DNS разрешения. Резолвер блокирующий - выполняется
+        в отдельном потоке, чтобы не задерживать параллельные пробы целей
+        """
+        hostname = hostname or self.dns_hostname
+
+        def resolve():
+            import dns.resolver
+            start_time = time.perf_counter()
+            answers = dns.resolver.Resolver().resolve(hostname)
+            return (time.perf_counter() - start_time) * 1000, [str(answer) for answer in answers]
+
         try:
-            start_time = time.time()
-            resolver = dns.resolver.Resolver()
-            answers = resolver.resolve(hostname)
-            end_time = time.time()
+            elapsed, addresses = await asyncio.to_thread(resolve)
+            self._record("dns", elapsed)
             
             return {
-                "dns_resolution_time": round((end_time - start_time) * 1000, 2),
-                "dns_resolved_ips": [str(answer) for answer in answers]
+                "dns_resolution_time": round(elapsed, 2),
+                "dns_resolved_ips": addresses
             }
         except Exception:
+            self._record("dns", None)
             return {"dns_resolution_time": None, "dns_error": True}
 
     async def get_network_info(self) -> Dict:
         """Получение информации о сетевом подключении"""
         try:
+            import psutil
             # Внешний IP
             async with self.session.get("https://api.ipify.org", timeout=5) as response:
                 external_ip = await response.text()
@@ -207,21 +301,31 @@ class NetworkTester:
         except Exception:
             return {"network_info_error": True}
 
-    def test_mtu(self, host: str = "8.8.8.8") -> Dict:
+    async def test_mtu(self, host: Optional[str] = None) -> Dict:
         """Определение MTU (Maximum Transmission Unit)"""
+        host = host or self.mtu_host
         try:
+            import platform
             if platform.system() == "Windows":
-                result = subprocess.run(
-                    ["ping", "-f", "-l", "1500", host, "-n", "1"],
-                    capture_output=True, text=True, timeout=10
-                )
+                command = ["ping", "-f", "-l", "1500", host, "-n", "1"]
             else:
-                result = subprocess.run(
-                    ["ping", "-c", "1", "-M", "do", "-s", "1500", host],
-                    capture_output=True, text=True, timeout=10
-                )
+                command = ["ping", "-c", "1", "-M", "do", "-s", "1500", host]
+            # Асинхронный подпроцесс: ожидание ping не блокирует event loop
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=10)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise
+            stdout = stdout.decode(errors="replace")
+            stderr = stderr.decode(errors="replace")
             
-            if "Packet needs to be fragmented" in result.stdout or "message too long" in result.stderr:
+            if "Packet needs to be fragmented" in stdout or "message too long" in stderr:
                 return {"mtu": 1500, "mtu_detection": "needs_fragmentation"}
             else:
                 return {"mtu": 1500, "mtu_detection": "success"}
@@ -230,14 +334,39 @@ class NetworkTester:
             return {"mtu": None, "mtu_error": True}
 
 # Утилитарные функции
-async def run_network_test(test_server: Optional[str] = None) -> Dict:
-    """Основная функция для запуска тестов"""
+async def run_network_test(
+    test_server: Optional[str] = None,
+    sample_store=None,
+    detailed: bool = False,
+    session: Optional[aiohttp.ClientSession] = None,
+    dns_hostname: str = "google.com",
+    mtu_host: str = "8.8.8.8",
+    download_mb: int = 10,
+    upload_mb: int = 5,
+    link_monitor=None,
+    path_thresholds: Optional[Tuple[float, float]] = None,
+    path_max_hops: int = 30
+) -> Dict:
+    """
+    Основная функция для запуска тестов
+    
+    Сырые сэмплы сохраняются локально в sample_store; в результат
+    попадает только сводка, а сами сэмплы - при detailed=True
+    """
     server = test_server or "https://httpbin.org"
     
-    async with NetworkTester(server) as tester:
-        results = await tester.run_all_tests()
+    async with NetworkTester(server, sample_store, session, dns_hostname, mtu_host) as tester:
+        results = await tester.run_all_tests(
+            download_mb, upload_mb, link_monitor, path_thresholds, path_max_hops
+        )
         results["test_timestamp"] = time.time()
         results["test_server"] = server
+        results["samples_summary"] = summarize_samples(tester.samples)
+        results["probe_durations"] = {probe: round(d, 3) for probe, d in tester.durations.items()}
+        if detailed:
+            results["samples"] = tester.samples
+        if sample_store is not None:
+            sample_store.flush()
         
         return results
 
@@ -0,0 +1,216 @@
+# app/utils/path_probe.py
+import asyncio
+import logging
+import os
+import socket
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REPLY = 0
+ICMP_DEST_UNREACHABLE = 3
+ICMP_ECHO_REQUEST = 8
+ICMP_TIME_EXCEEDED = 11
+
+# Linux: ошибки ICMP для непривилегированного ping-сокета
+IP_RECVERR = getattr(socket, "IP_RECVERR", 11)
+MSG_ERRQUEUE = getattr(socket, "MSG_ERRQUEUE", 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+
+# Номер пробы в seq: попытка * 256 + TTL
+SEQ_TTL_BITS = 8
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+def build_echo(identifier: int, seq: int) -> bytes:
+    """
+    ICMP echo request с постоянной контрольной суммой (Paris traceroute):
+    первое слово данных компенсирует seq, поэтому у всех проб одинаковы
+    и поля, по которым балансировщики выбирают путь (id, checksum)
+    """
+    compensation = (0xFFFF - seq) & 0xFFFF
+    payload = struct.pack("!H", compensation) + b"iqms-path"
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, identifier, seq) + payload
+
+class PathProbe:
+    """
+    Быстрый traceroute: эхо-запросы со всеми TTL отправляются сразу,
+    ответы (time exceeded от маршрутизаторов, echo reply от цели)
+    собираются за одно окно ожидания вместо последовательного опроса.
+
+    Используется raw ICMP-сокет (root/CAP_NET_RAW), иначе на Linux -
+    непривилегированный ping-сокет с IP_RECVERR (net.ipv4.ping_group_range).
+    """
+
+    def __init__(self, host: str, max_hops: int = 30, attempts: int = 3, timeout: float = 2.0):
+        self.host = host
+        self.max_hops = max_hops
+        self.attempts = attempts
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._raw = False
+        self._identifier = os.getpid() & 0xFFFF
+        self._sent: Dict[int, float] = {}
+        # ttl -> [(адрес, rtt мс)]
+        self._replies: Dict[int, List[Tuple[str, float]]] = {}
+        self._destination_ttl: Optional[int] = None
+        self._done: Optional[asyncio.Event] = None
+
+    def _open(self) -> socket.socket:
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self._raw = True
+        except PermissionError:
+            if not sys.platform.startswith("linux"):
+                raise
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+            self._raw = False
+        sock.setblocking(False)
+        return sock
+
+    def _on_reply(self, seq: int, address: str, reached: bool) -> None:
+        sent_at = self._sent.pop(seq, None)
+        if sent_at is None:
+            return
+        ttl = seq & ((1 << SEQ_TTL_BITS) - 1)
+        self._replies.setdefault(ttl, []).append((address, (time.perf_counter() - sent_at) * 1000))
+        if reached and (self._destination_ttl is None or ttl < self._destination_ttl):
+            self._destination_ttl = ttl
+        if self._complete():
+            self._done.set()
+
+    def _complete(self) -> bool:
+        """Все пробы до цели получили ответ - дальше ждать нечего"""
+        if self._destination_ttl is None:
+            return False
+        return all(
+            len(self._replies.get(ttl, [])) >= self.attempts
+            for ttl in range(1, self._destination_ttl + 1)
+        )
+
+    def _read_raw(self) -> None:
+        while True:
+            try:
+                packet, (address, _) = self._sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            header_length = (packet[0] & 0x0F) * 4
+            icmp = packet[header_length:]
+            if len(icmp) < 8:
+                continue
+            icmp_type = icmp[0]
+            if icmp_type == ICMP_ECHO_REPLY:
+                identifier, seq = struct.unpack("!HH", icmp[4:8])
+                if identifier == self._identifier:
+                    self._on_reply(seq, address, reached=True)
+            elif icmp_type in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+                # Внутри - заголовок исходного IP-пакета и начало нашего эхо-запроса
+                inner = icmp[8:]
+                if len(inner) < 20:
+                    continue
+                inner_length = (inner[0] & 0x0F) * 4
+                quoted = inner[inner_length:inner_length + 8]
+                if len(quoted) < 8 or quoted[0] != ICMP_ECHO_REQUEST:
+                    continue
+                identifier, seq = struct.unpack("!HH", quoted[4:8])
+                if identifier == self._identifier:
+                    self._on_reply(seq, address, reached=icmp_type == ICMP_DEST_UNREACHABLE)
+
+    def _read_dgram(self) -> None:
+        # Ошибки ICMP (time exceeded) - из очереди ошибок, адрес - в ancillary data
+        while True:
+            try:
+                data, ancdata, _, _ = self._sock.recvmsg(512, 512, MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                break
+            for level, kind, payload in ancdata:
+                if level != socket.IPPROTO_IP or kind != IP_RECVERR or len(payload) < 24:
+                    continue
+                _, origin, icmp_type, _, _, _, _ = struct.unpack("=IBBBBII", payload[:16])
+                if origin != SO_EE_ORIGIN_ICMP or len(data) < 8:
+                    continue
+                address = socket.inet_ntoa(payload[20:24])
+                seq = struct.unpack("!H", data[6:8])[0]
+                self._on_reply(seq, address, reached=icmp_type == ICMP_DEST_UNREACHABLE)
+        # Ответы цели (echo reply) - обычным чтением, без IP-заголовка
+        while True:
+            try:
+                packet, (address, _) = self._sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            if len(packet) >= 8 and packet[0] == ICMP_ECHO_REPLY:
+                self._on_reply(struct.unpack("!H", packet[6:8])[0], address, reached=True)
+
+    async def run(self) -> Dict:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            infos = await loop.getaddrinfo(self.host, None, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+            target = infos[0][4][0]
+            self._sock = self._open()
+        except (OSError, IndexError) as e:
+            return {"path_error": str(e)}
+
+        self._done = asyncio.Event()
+        loop.add_reader(self._sock.fileno(), self._read_raw if self._raw else self._read_dgram)
+        try:
+            for attempt in range(self.attempts):
+                for ttl in range(1, self.max_hops + 1):
+                    if self._destination_ttl is not None and ttl > self._destination_ttl:
+                        break
+                    seq = (attempt << SEQ_TTL_BITS) | ttl
+                    self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                    self._sent[seq] = time.perf_counter()
+                    try:
+                        self._sock.sendto(build_echo(self._identifier, seq), (target, 0))
+                    except OSError as e:
+                        self._sent.pop(seq, None)
+                        logger.debug(f"Path probe send ttl={ttl} failed: {e}")
+                # Пауза между попытками - чтобы не упираться в ограничение
+                # частоты ICMP на маршрутизаторах
+                await asyncio.sleep(0.05)
+            try:
+                await asyncio.wait_for(self._done.wait(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+
+        return self._summary(target, time.perf_counter() - started)
+
+    def _summary(self, target: str, duration: float) -> Dict:
+        """Компактный результат: параллельные списки по номеру хопа"""
+        last = self._destination_ttl or max(self._replies, default=0)
+        hops, rtts, losses = [], [], []
+        for ttl in range(1, last + 1):
+            replies = self._replies.get(ttl, [])
+            addresses = [address for address, _ in replies]
+            # При балансировке на хопе может ответить несколько адресов - берем частый
+            hops.append(max(set(addresses), key=addresses.count) if addresses else None)
+            rtts.append(round(min(rtt for _, rtt in replies), 2) if replies else None)
+            losses.append(round((self.attempts - len(replies)) / self.attempts * 100, 1))
+        return {
+            "target": target,
+            "reached": self._destination_ttl is not None,
+            "hops": hops,
+            "rtt": rtts,
+            "loss": losses,
+            "duration_ms": round(duration * 1000),
+        }
+
+async def probe_path(host: str, max_hops: int = 30, attempts: int = 3, timeout: float = 2.0) -> Dict:
+    """Путь до host с RTT и потерями по хопам"""
+    return await PathProbe(host, max_hops, attempts, timeout).run()
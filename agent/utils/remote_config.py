@@ -0,0 +1,107 @@
+# app/utils/remote_config.py
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import aiohttp
+from utils.config_loader import set_remote_settings
+from utils.sender import RETRY_LATER_STATUSES, backoff_delay, retry_after
+
+logger = logging.getLogger(__name__)
+
+# Сервер без /agents/config (старая версия) - редкая повторная проверка
+UNSUPPORTED_RECHECK = 3600
+# 304 на long-poll раньше этой доли wait - сервер не держал запрос
+# (перегружен или ограничивает wait); следующий опрос не сразу
+EARLY_RESPONSE_FRACTION = 0.5
+
+def load_cached(path: Path) -> Optional[str]:
+    """
+    Последняя полученная конфигурация с диска: агент стартует с ней,
+    даже если сервер недоступен. Возвращает ее ETag
+    """
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read cached remote config {path}: {e}")
+        return None
+    set_remote_settings(data.get("settings") or {})
+    return data.get("etag")
+
+class RemoteConfigPoller:
+    """
+    Опрос централизованной конфигурации: условный GET с If-None-Match
+    и long-poll (wait), так что в обычном режиме сервер держит запрос
+    и отвечает 304 без тела. Новая конфигурация сохраняется на диск
+    и применяется через on_change без перезапуска агента
+    """
+
+    def __init__(self, config, session: aiohttp.ClientSession, on_change: Callable[[], None]):
+        self.config = config
+        self.session = session
+        self.on_change = on_change
+        self.path = Path(config.data_dir) / "remote_config.json"
+        self.etag: Optional[str] = load_cached(self.path)
+
+    def _save(self, settings: Dict) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps({"etag": self.etag, "settings": settings}))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save remote config: {e}")
+
+    async def poll(self) -> Optional[float]:
+        """Один запрос; возвращает паузу перед следующим (None - сразу)"""
+        headers = {"X-API-KEY": self.config.api_key}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        wait = self.config.remote_config_wait
+        started = time.monotonic()
+        async with self.session.get(
+            f"{self.config.api_url}/agents/config/",
+            params={"wait": wait},
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=wait + self.config.test_timeout)
+        ) as response:
+            if response.status == 304:
+                if wait and time.monotonic() - started >= wait * EARLY_RESPONSE_FRACTION:
+                    return None
+                return self.config.config_watch_interval
+            if response.status == 404:
+                logger.info("Server does not provide agent config, using local configuration")
+                return UNSUPPORTED_RECHECK
+            if response.status in RETRY_LATER_STATUSES:
+                return backoff_delay(1, self.config.retry_delay, self.config.retry_max_delay, retry_after(response))
+            response.raise_for_status()
+            data = await response.json()
+
+        settings = data.get("settings") or {}
+        self.etag = response.headers.get("ETag")
+        set_remote_settings(settings)
+        self._save(settings)
+        logger.info(f"Remote config updated: {sorted(settings)}")
+        self.on_change()
+        return None if wait else self.config.config_watch_interval
+
+    async def run_forever(self, stop_event: asyncio.Event) -> None:
+        attempt = 0
+        while not stop_event.is_set():
+            try:
+                delay = await self.poll()
+                attempt = 0
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                attempt += 1
+                delay = backoff_delay(attempt, self.config.retry_delay, self.config.retry_max_delay)
+                logger.warning(f"Remote config poll failed: {e}, retrying in {delay:.0f}s")
+            if delay:
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
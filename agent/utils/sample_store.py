@@ -0,0 +1,194 @@
+# app/utils/sample_store.py
+import mmap
+import struct
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Коды проб в записи
+PROBES = {
+    "latency": 1,
+    "jitter": 2,
+    "packet_loss": 3,
+    "download": 4,
+    "upload": 5,
+    "dns": 6,
+}
+PROBE_NAMES = {code: name for name, code in PROBES.items()}
+
+MAGIC = b"IQMS"
+VERSION = 1
+# magic, version, record size, capacity, head (следующий индекс записи), count
+HEADER = struct.Struct("<4sHHIQQ")
+HEADER_SIZE = 32
+# timestamp, код пробы, успех, значение
+RECORD = struct.Struct("<dBBxxf")
+
+def capacity_for(
+    retention_days: int,
+    test_interval: int,
+    samples_per_cycle: int = 64
+) -> int:
+    """Количество записей, достаточное для хранения данных за retention_days"""
+    cycles = (retention_days * 86400) // max(test_interval, 1) + 1
+    return int(cycles * samples_per_cycle)
+
+class SampleStore:
+    """
+    Кольцевой буфер сырых сэмплов проб в memory-mapped файле.
+    Записи фиксированного размера, старые данные перезаписываются.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        capacity: int,
+        retention_days: int = 7
+    ):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.retention_seconds = retention_days * 86400
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._head = 0
+        self._count = 0
+        self._open()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = HEADER_SIZE + self.capacity * RECORD.size
+
+        fresh = True
+        if self.path.exists() and self.path.stat().st_size == size:
+            with open(self.path, "rb") as f:
+                magic, version, record_size, capacity, head, count = HEADER.unpack(
+                    f.read(HEADER.size)
+                )
+            if (magic, version, record_size, capacity) == (MAGIC, VERSION, RECORD.size, self.capacity):
+                self._head, self._count = head, count
+                fresh = False
+            else:
+                logger.warning(f"Sample store {self.path} has incompatible layout, recreating")
+        elif self.path.exists():
+            logger.info(f"Sample store {self.path} capacity changed, recreating")
+
+        if fresh:
+            with open(self.path, "wb") as f:
+                f.truncate(size)
+
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        if fresh:
+            self._write_header()
+
+    def _write_header(self) -> None:
+        self._mm[:HEADER.size] = HEADER.pack(
+            MAGIC, VERSION, RECORD.size, self.capacity, self._head, self._count
+        )
+
+    def append(
+        self,
+        probe: str,
+        value: Optional[float],
+        ok: bool = True,
+        timestamp: Optional[float] = None
+    ) -> None:
+        """Добавление одного сэмпла"""
+        offset = HEADER_SIZE + (self._head % self.capacity) * RECORD.size
+        RECORD.pack_into(
+            self._mm,
+            offset,
+            timestamp or time.time(),
+            PROBES[probe],
+            1 if ok and value is not None else 0,
+            value if value is not None else 0.0
+        )
+        self._head += 1
+        self._count = min(self._count + 1, self.capacity)
+        self._write_header()
+
+    def _records(self) -> Iterator[tuple]:
+        """Записи от самой старой к самой новой"""
+        start = self._head - self._count
+        for index in range(start, self._head):
+            offset = HEADER_SIZE + (index % self.capacity) * RECORD.size
+            yield RECORD.unpack_from(self._mm, offset)
+
+    def query(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        probe: Optional[str] = None
+    ) -> List[Dict]:
+        """Сырые сэмплы за интервал (в пределах срока хранения)"""
+        cutoff = time.time() - self.retention_seconds
+        start = max(start or cutoff, cutoff)
+        if probe and probe not in PROBES:
+            raise ValueError(f"Unknown probe {probe!r}, expected one of: {', '.join(sorted(PROBES))}")
+        code = PROBES[probe] if probe else None
+
+        samples = []
+        for timestamp, probe_code, ok, value in self._records():
+            if timestamp < start or (end is not None and timestamp > end):
+                continue
+            if code is not None and probe_code != code:
+                continue
+            samples.append({
+                "timestamp": timestamp,
+                "probe": PROBE_NAMES.get(probe_code, str(probe_code)),
+                "value": round(value, 3) if ok else None,
+                "ok": bool(ok),
+            })
+        return samples
+
+    def flush(self) -> None:
+        if self._mm:
+            self._mm.flush()
+
+    def close(self) -> None:
+        if self._mm:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def summarize_samples(samples: List[Dict]) -> Dict:
+    """Сводка по сырым сэмплам: количество, успешные, min/avg/p50/p95/max"""
+    grouped: Dict[str, List[Optional[float]]] = {}
+    for sample in samples:
+        grouped.setdefault(sample["probe"], []).append(sample["value"])
+
+    summary = {}
+    for probe, values in grouped.items():
+        ok_values = sorted(v for v in values if v is not None)
+        entry = {"count": len(values), "ok": len(ok_values)}
+        if ok_values:
+            entry.update({
+                "min": ok_values[0],
+                "avg": round(sum(ok_values) / len(ok_values), 3),
+                "p50": _percentile(ok_values, 50),
+                "p95": _percentile(ok_values, 95),
+                "max": ok_values[-1],
+            })
+        summary[probe] = entry
+    return summary
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    index = (len(sorted_values) - 1) * percent / 100
+    lower = int(index)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = index - lower
+    return round(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction, 3)
+
+def open_sample_store(config) -> SampleStore:
+    """Открытие хранилища сэмплов по настройкам агента"""
+    return SampleStore(
+        Path(config.data_dir) / "samples.ring",
+        capacity=capacity_for(config.data_retention_days, config.test_interval),
+        retention_days=config.data_retention_days
+    )
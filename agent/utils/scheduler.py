@@ -0,0 +1,76 @@
+# app/utils/scheduler.py
+import asyncio
+import math
+import time
+import zlib
+from typing import Optional
+
+class IntervalScheduler:
+    """
+    Планировщик циклов измерений без накопления дрейфа.
+
+    Слоты выровнены по границам test_interval (например, каждые 5 минут
+    от начала часа) и сдвинуты на постоянный для агента offset, чтобы
+    агенты парка не приходили на сервер одновременно. Ожидание считается
+    по монотонным часам, поэтому длительность цикла не сдвигает расписание.
+    """
+
+    def __init__(self, interval: float, agent_id: str = "", jitter: float = 0.2):
+        self.interval = interval
+        self.jitter = jitter
+        self.agent_id = agent_id
+        self._deadline: Optional[float] = None
+
+    @property
+    def offset(self) -> float:
+        """Постоянный для агента сдвиг в пределах jitter * interval"""
+        spread = self.interval * self.jitter
+        if spread <= 0:
+            return 0.0
+        return (zlib.crc32(self.agent_id.encode()) % 10000) / 10000 * spread
+
+    def _first_deadline(self, now: float) -> float:
+        wall = time.time()
+        next_slot = math.floor(wall / self.interval) * self.interval + self.offset
+        if next_slot <= wall:
+            next_slot += self.interval
+        return now + (next_slot - wall)
+
+    def set_interval(self, interval: float) -> None:
+        """Смена интервала; расписание перестраивается со следующего слота"""
+        if interval != self.interval:
+            self.interval = interval
+            self._deadline = None
+
+    def run_now(self) -> None:
+        """Запустить следующий цикл немедленно"""
+        self._deadline = asyncio.get_running_loop().time()
+
+    async def wait_next(self, stop_event: Optional[asyncio.Event] = None) -> bool:
+        """
+        Ожидание следующего слота
+
+        Returns:
+            False, если ожидание прервано stop_event
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        if self._deadline is None:
+            self._deadline = self._first_deadline(now)
+        elif self._deadline <= now - self.interval:
+            # Цикл длился дольше интервала - пропускаем опоздавшие слоты
+            missed = math.floor((now - self._deadline) / self.interval)
+            self._deadline += missed * self.interval
+
+        delay = max(0.0, self._deadline - now)
+        self._deadline += self.interval
+
+        if stop_event is None:
+            await asyncio.sleep(delay)
+            return True
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            return False
+        except asyncio.TimeoutError:
+            return True
@@ -0,0 +1,178 @@
+# app/utils/self_metrics.py
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class Summary:
+    """Число и сумма наблюдений плюс последнее значение (секунды)"""
+    __slots__ = ("count", "total", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.last = value
+
+class AgentMetrics:
+    """
+    Собственные метрики агента: ресурсы процесса (CPU, RSS, сокеты),
+    длительность проб и отправки, глубина очереди. Отдаются в формате
+    Prometheus (HTTP или textfile для node_exporter) и краткой сводкой
+    на сервер вместе с каждой пачкой измерений
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.probes: Dict[str, Summary] = {}
+        self.upload = Summary()
+        self.uploads: Dict[str, int] = {"ok": 0, "error": 0, "throttled": 0}
+        self.cycle = Summary()
+        self.outbox_depth = 0
+        self._process = None
+        self._cpu_mark = None
+
+    def observe_probe(self, probe: str, seconds: float) -> None:
+        self.probes.setdefault(probe, Summary()).observe(seconds)
+
+    def observe_upload(self, seconds: float, result: str) -> None:
+        self.upload.observe(seconds)
+        self.uploads[result] = self.uploads.get(result, 0) + 1
+
+    def observe_cycle(self, seconds: float) -> None:
+        self.cycle.observe(seconds)
+
+    def process_stats(self) -> Dict:
+        """CPU, память и сокеты процесса (psutil; без него - пусто)"""
+        if self._process is None:
+            try:
+                import psutil
+                self._process = psutil.Process()
+            except ImportError:
+                self._process = False
+        if not self._process:
+            return {}
+        process = self._process
+        with process.oneshot():
+            cpu = process.cpu_times()
+            stats = {
+                "cpu_seconds": cpu.user + cpu.system,
+                "rss_bytes": process.memory_info().rss,
+                "threads": process.num_threads(),
+            }
+            try:
+                stats["open_sockets"] = len(process.connections(kind="inet"))
+            except Exception:
+                pass
+            if hasattr(process, "num_fds"):
+                stats["open_fds"] = process.num_fds()
+        return stats
+
+    def summary(self) -> Dict:
+        """Краткая сводка для сервера (заголовок X-Agent-Metrics)"""
+        stats = self.process_stats()
+        now = time.monotonic()
+        cpu_percent = None
+        if "cpu_seconds" in stats:
+            if self._cpu_mark is not None and now > self._cpu_mark[0]:
+                cpu_percent = (stats["cpu_seconds"] - self._cpu_mark[1]) / (now - self._cpu_mark[0]) * 100
+            self._cpu_mark = (now, stats["cpu_seconds"])
+
+        summary = {
+            "cpu_s": round(stats["cpu_seconds"], 2) if "cpu_seconds" in stats else None,
+            "cpu_pct": round(cpu_percent, 1) if cpu_percent is not None else None,
+            "rss_mb": round(stats["rss_bytes"] / 1048576, 1) if "rss_bytes" in stats else None,
+            "sockets": stats.get("open_sockets"),
+            "outbox": self.outbox_depth,
+            "upload_ms": round(self.upload.last * 1000) if self.upload.count else None,
+            "cycle_ms": round(self.cycle.last * 1000) if self.cycle.count else None,
+            "probe_ms": {name: round(s.last * 1000) for name, s in self.probes.items()},
+        }
+        return {key: value for key, value in summary.items() if value is not None}
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+        def summary(name: str, help_text: str, values: Dict[str, Summary], label: Optional[str] = None) -> None:
+            samples = []
+            for key, s in values.items():
+                labels = {label: key} if label else {}
+                samples += [("_sum", labels, round(s.total, 6)), ("_count", labels, s.count)]
+            metric(name, "summary", help_text, samples)
+
+        stats = self.process_stats()
+        if "cpu_seconds" in stats:
+            metric("agent_process_cpu_seconds_total", "counter", "CPU time of the agent process",
+                   [("", {}, round(stats["cpu_seconds"], 3))])
+            metric("agent_process_resident_memory_bytes", "gauge", "Resident memory of the agent process",
+                   [("", {}, stats["rss_bytes"])])
+            metric("agent_process_threads", "gauge", "Threads of the agent process",
+                   [("", {}, stats["threads"])])
+        if "open_sockets" in stats:
+            metric("agent_open_sockets", "gauge", "Open inet sockets of the agent process",
+                   [("", {}, stats["open_sockets"])])
+        if "open_fds" in stats:
+            metric("agent_open_fds", "gauge", "Open file descriptors of the agent process",
+                   [("", {}, stats["open_fds"])])
+        metric("agent_start_time_seconds", "gauge", "Agent start time (unix)", [("", {}, round(self.started))])
+        metric("agent_outbox_depth", "gauge", "Measurements waiting to be sent", [("", {}, self.outbox_depth)])
+
+        summary("agent_probe_duration_seconds", "Duration of measurement probes", self.probes, "probe")
+        metric("agent_probe_last_duration_seconds", "gauge", "Duration of the last run of each probe",
+               [("", {"probe": name}, round(s.last, 6)) for name, s in self.probes.items()])
+        summary("agent_cycle_duration_seconds", "Duration of measurement cycles", {"": self.cycle})
+        summary("agent_upload_duration_seconds", "Duration of measurement uploads", {"": self.upload})
+        metric("agent_uploads_total", "counter", "Measurement uploads by result",
+               [("", {"result": result}, count) for result, count in self.uploads.items()])
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Запись для textfile collector node_exporter (атомарно, через rename)"""
+        target = Path(path)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(self.render_prometheus())
+            os.replace(tmp, target)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics textfile {path}: {e}")
+
+    def header(self) -> str:
+        return json.dumps(self.summary(), separators=(",", ":"))
+
+async def serve_metrics(metrics: AgentMetrics, host: str, port: int):
+    """Локальный HTTP endpoint /metrics; возвращает runner для остановки"""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(
+            text=metrics.render_prometheus(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Agent metrics on http://{host}:{port}/metrics")
+    return runner
+
+# Общий экземпляр для процесса агента
+agent_metrics = AgentMetrics()
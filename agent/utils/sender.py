@@ -0,0 +1,234 @@
+# app/utils/sender.py
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional
+import aiohttp
+from utils.ids import uuid7
+from utils.self_metrics import agent_metrics
+
+logger = logging.getLogger(__name__)
+
+# Поля результата, которые идут в основные колонки измерения
+MAIN_FIELDS = {
+    "latency": "latency_avg",
+    "download": "download_speed",
+    "upload": "upload_speed",
+    "packet_loss": "packet_loss",
+    "jitter": "jitter",
+}
+
+def build_payload(config, results: Dict) -> Dict:
+    """
+    Преобразование результатов тестов в MeasurementCreate для backend.
+    ID (UUIDv7) и время присваиваются в момент измерения, поэтому
+    повторная отправка того же измерения не создает дубликат
+    """
+    measured_at = datetime.fromtimestamp(results.get("test_timestamp") or time.time(), timezone.utc)
+    payload = {
+        "id": str(uuid7()),
+        "timestamp": measured_at.isoformat(),
+        "agent_id": config.agent_id,
+    }
+    for field, result_key in MAIN_FIELDS.items():
+        payload[field] = results.get(result_key)
+    payload["metainfo"] = {
+        key: value for key, value in results.items()
+        if key not in MAIN_FIELDS.values()
+    }
+    return payload
+
+# Ответы перегруженного сервера: повтор позже, с учетом Retry-After
+RETRY_LATER_STATUSES = (429, 503)
+# Ключ агента отклонен (смена ключа, деактивация): измерения остаются в очереди
+AUTH_FAILED_STATUSES = (401, 403)
+# Пачка слишком велика или в ней есть некорректное измерение: пачка делится
+SPLIT_STATUSES = (400, 413, 422)
+
+# Результаты отправки пачки
+POST_SENT = "sent"
+POST_RETRY = "retry"        # оставить в очереди
+POST_SPLIT = "split"        # отправить частями
+POST_REJECTED = "rejected"  # отброшена сервером, повтор не поможет
+
+def retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+    """Значение Retry-After в секундах (число или HTTP-дата)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float, server_delay: Optional[float] = None) -> float:
+    """
+    Пауза перед повтором. Без подсказки сервера - экспоненциальная с
+    полным jitter; с Retry-After - не раньше указанного срока плюс до
+    50% случайной добавки, чтобы агенты не вернулись одновременно
+    """
+    if server_delay is not None:
+        return server_delay * random.uniform(1.0, 1.5)
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+class MeasurementSender:
+    """
+    Отправка измерений на сервер через общую сессию aiohttp.
+    Неотправленные измерения остаются в очереди (outbox) и
+    сохраняются на диск при остановке агента.
+    """
+
+    def __init__(
+        self,
+        config,
+        session: aiohttp.ClientSession,
+        outbox_path: Optional[Path] = None,
+        max_outbox: int = 1000,
+        batch_size: int = 100
+    ):
+        self.config = config
+        self.session = session
+        self.outbox_path = outbox_path
+        self.outbox: deque = deque(maxlen=max_outbox)
+        self.batch_size = batch_size
+        # Сервер попросил не отправлять до этого момента (time.monotonic)
+        self.not_before = 0.0
+
+    @property
+    def headers(self) -> Dict:
+        # Сводка ресурсов агента уходит с каждой пачкой
+        return {"X-API-KEY": self.config.api_key, "X-Agent-Metrics": agent_metrics.header()}
+
+    def enqueue(self, payload: Dict) -> None:
+        if len(self.outbox) == self.outbox.maxlen:
+            logger.warning("Outbox is full, dropping the oldest measurement")
+        self.outbox.append(payload)
+        agent_metrics.outbox_depth = len(self.outbox)
+
+    async def _post(self, batch: List[Dict]) -> str:
+        for attempt in range(1, self.config.max_retries + 1):
+            server_delay = None
+            started = time.perf_counter()
+            try:
+                # Пачка целиком идемпотентна: сервер пропускает уже сохраненные ID
+                async with self.session.post(
+                    f"{self.config.api_url}/measurements/batch",
+                    json=batch,
+                    headers=self.headers,
+                    timeout=aiohttp.ClientTimeout(total=self.config.test_timeout)
+                ) as response:
+                    result = "ok" if response.status < 400 else (
+                        "throttled" if response.status in RETRY_LATER_STATUSES else "error"
+                    )
+                    agent_metrics.observe_upload(time.perf_counter() - started, result)
+                    if response.status < 400:
+                        return POST_SENT
+                    if response.status in AUTH_FAILED_STATUSES:
+                        logger.error(
+                            f"API key rejected ({response.status}), "
+                            f"{len(self.outbox)} measurements stay queued"
+                        )
+                        self.not_before = time.monotonic() + self.config.retry_max_delay
+                        return POST_RETRY
+                    if response.status in SPLIT_STATUSES:
+                        logger.warning(
+                            f"Batch of {len(batch)} measurements rejected: "
+                            f"{response.status} {await response.text()}"
+                        )
+                        return POST_SPLIT
+                    if response.status in RETRY_LATER_STATUSES:
+                        server_delay = retry_after(response)
+                        logger.warning(
+                            f"Server is overloaded ({response.status}), "
+                            f"retry after {server_delay}s (attempt {attempt})"
+                        )
+                    elif response.status < 500:
+                        # Ошибка в данных - повтор не поможет
+                        logger.error(
+                            f"Measurement rejected: {response.status} {await response.text()}"
+                        )
+                        return POST_REJECTED
+                    else:
+                        logger.warning(f"Server error {response.status} (attempt {attempt})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                agent_metrics.observe_upload(time.perf_counter() - started, "error")
+                logger.warning(f"Failed to send measurement (attempt {attempt}): {e}")
+
+            delay = backoff_delay(
+                attempt, self.config.retry_delay, self.config.retry_max_delay, server_delay
+            )
+            if attempt == self.config.max_retries or delay > self.config.retry_max_delay:
+                # Дальше не ждем: очередь уйдет в следующем цикле, не раньше срока
+                if server_delay is not None:
+                    self.not_before = time.monotonic() + delay
+                return POST_RETRY
+            await asyncio.sleep(delay)
+        return POST_RETRY
+
+    async def _deliver(self, batch: List[Dict]) -> bool:
+        """
+        Отправка пачки; отклоненная из-за данных пачка делится пополам,
+        пока некорректное измерение не останется одно - отбрасывается только
+        оно. False - пачку нужно повторить позже (уже доставленные части
+        при повторе пропускаются сервером по ID)
+        """
+        result = await self._post(batch)
+        if result == POST_SPLIT:
+            if len(batch) == 1:
+                logger.error(f"Measurement {batch[0].get('id')} rejected by server, dropping it")
+                return True
+            middle = len(batch) // 2
+            return await self._deliver(batch[:middle]) and await self._deliver(batch[middle:])
+        return result != POST_RETRY
+
+    async def flush(self) -> int:
+        """Отправка очереди пачками по порядку; возвращает число отправленных"""
+        sent = 0
+        if time.monotonic() < self.not_before:
+            logger.info("Server asked to back off, measurements stay queued")
+            return sent
+        while self.outbox:
+            batch = list(islice(self.outbox, self.batch_size))
+            if not await self._deliver(batch):
+                break
+            for _ in batch:
+                self.outbox.popleft()
+            sent += len(batch)
+            agent_metrics.outbox_depth = len(self.outbox)
+        return sent
+
+    def load_outbox(self) -> None:
+        """Восстановление неотправленных измерений после перезапуска"""
+        if not self.outbox_path or not self.outbox_path.exists():
+            return
+        try:
+            with open(self.outbox_path, "r") as f:
+                self.outbox.extend(json.load(f))
+            self.outbox_path.unlink()
+            agent_metrics.outbox_depth = len(self.outbox)
+            logger.info(f"Restored {len(self.outbox)} pending measurements")
+        except Exception as e:
+            logger.warning(f"Failed to restore outbox: {e}")
+
+    def save_outbox(self) -> None:
+        """Сохранение неотправленных измерений на диск"""
+        if not self.outbox_path or not self.outbox:
+            return
+        try:
+            self.outbox_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.outbox_path, "w") as f:
+                json.dump(list(self.outbox), f)
+            logger.info(f"Saved {len(self.outbox)} pending measurements to {self.outbox_path}")
+        except Exception as e:
+            logger.error(f"Failed to save outbox: {e}")
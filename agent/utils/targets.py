@@ -0,0 +1,213 @@
+# app/utils/targets.py
+import asyncio
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def _host_of(address: str) -> str:
+    return address.split("//")[-1].split("/")[0].split(":")[0]
+
+def _rtt_summary(rtts: List[Optional[float]]) -> Dict:
+    ok = [rtt for rtt in rtts if rtt is not None]
+    return {
+        "rtt_avg": round(statistics.mean(ok), 2) if ok else None,
+        "rtt_min": round(min(ok), 2) if ok else None,
+        "rtt_max": round(max(ok), 2) if ok else None,
+        "loss": round((len(rtts) - len(ok)) / len(rtts) * 100, 2) if rtts else None,
+    }
+
+class TargetProber:
+    """
+    Параллельный опрос списка целей (SaaS, филиалы, DNS-серверы).
+
+    У каждой цели свой набор проб и интервал; все пробы выполняются
+    под общим ограничением параллельности и через общую сессию aiohttp.
+    Каждая цель опрашивается отдельной задачей: медленная цель не задерживает
+    расписание остальных, а ее следующий опрос начинается только после
+    завершения текущего. Результаты накапливаются и забираются пачкой
+    раз в цикл измерений.
+    """
+
+    def __init__(
+        self,
+        targets: List,
+        session,
+        default_interval: int,
+        max_concurrency: int = 20,
+        timeout: int = 5
+    ):
+        self.targets = targets
+        self.session = session
+        self.default_interval = default_interval
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Блокирующие пробы (ICMP, DNS) - в собственном пуле потоков
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._next_due: Dict[str, float] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._pending: List[Dict] = []
+
+    @property
+    def tick(self) -> float:
+        """Шаг опроса - минимальный интервал среди целей (не чаще 10 секунд)"""
+        intervals = [t.interval or self.default_interval for t in self.targets]
+        return max(10, min(intervals)) if intervals else self.default_interval
+
+    def update_targets(self, targets: List, default_interval: int) -> None:
+        self.targets = targets
+        self.default_interval = default_interval
+        names = {t.name for t in targets}
+        self._next_due = {k: v for k, v in self._next_due.items() if k in names}
+
+    def drain(self) -> List[Dict]:
+        """Забрать накопленные результаты (для отправки с циклом измерений)"""
+        results, self._pending = self._pending, []
+        return results
+
+    def run_due(self) -> List[asyncio.Task]:
+        """Запуск опроса целей, у которых подошел срок (без ожидания результатов)"""
+        now = asyncio.get_running_loop().time()
+        started = []
+        for target in self.targets:
+            if self._next_due.get(target.name, 0) > now:
+                continue
+            if target.name in self._in_flight:
+                # Прошлый опрос еще идет: новый начнется после него, на следующем шаге
+                continue
+            self._next_due[target.name] = now + (target.interval or self.default_interval)
+            task = asyncio.create_task(self._run_target(target), name=f"target-{target.name}")
+            self._in_flight[target.name] = task
+            task.add_done_callback(lambda done, name=target.name: self._finished(name, done))
+            started.append(task)
+        return started
+
+    def _finished(self, name: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(name) is task:
+            del self._in_flight[name]
+        if not task.cancelled() and task.exception():
+            logger.error(f"Target {name} probing failed: {task.exception()}")
+
+    async def _run_target(self, target) -> None:
+        results = await asyncio.gather(*(self._run_probe(target, probe) for probe in target.probes))
+        self._pending.extend(result for result in results if result is not None)
+
+    async def run_forever(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                self.run_due()
+            except Exception as e:
+                logger.error(f"Target probing failed: {e}")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.tick)
+            except asyncio.TimeoutError:
+                pass
+
+    async def finish(self, timeout: float) -> None:
+        """Ожидание идущих опросов (при остановке), не дольше timeout; остальные отменяются"""
+        tasks = list(self._in_flight.values())
+        if not tasks:
+            return
+        _, unfinished = await asyncio.wait(tasks, timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            logger.warning(f"Cancelled {len(unfinished)} unfinished target probes")
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    def close(self) -> None:
+        for task in self._in_flight.values():
+            task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def _run_probe(self, target, probe: str) -> Optional[Dict]:
+        handler = getattr(self, f"probe_{probe}", None)
+        if handler is None:
+            logger.warning(f"Unknown probe type {probe} for target {target.name}")
+            return None
+        async with self._semaphore:
+            try:
+                result = await handler(target)
+            except Exception as e:
+                result = {"error": str(e)}
+        result.update({"target": target.name, "probe": probe, "timestamp": time.time()})
+        return result
+
+    async def probe_http(self, target) -> Dict:
+        """Время ответа HTTP(S) (через общий пул соединений)"""
+        import aiohttp
+
+        url = target.host if "//" in target.host else f"https://{target.host}"
+        rtts = []
+        for _ in range(target.count):
+            started = time.perf_counter()
+            try:
+                async with self.session.get(
+                    url, timeout=aiohttp.ClientTimeout(total=self.timeout)
+                ) as response:
+                    await response.read()
+                    status = response.status
+                rtts.append((time.perf_counter() - started) * 1000)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = None
+                rtts.append(None)
+        return {**_rtt_summary(rtts), "status": status}
+
+    async def probe_ping(self, target) -> Dict:
+        """ICMP ping"""
+        from ping3 import ping
+
+        loop = asyncio.get_running_loop()
+        host = _host_of(target.host)
+        rtts = []
+        for _ in range(target.count):
+            result = await loop.run_in_executor(self._executor, ping, host, self.timeout)
+            rtts.append(result * 1000 if result else None)
+        return _rtt_summary(rtts)
+
+    async def probe_tcp(self, target) -> Dict:
+        """Время установления TCP-соединения"""
+        host = _host_of(target.host)
+        port = target.port or (80 if target.host.startswith("http://") else 443)
+        rtts = []
+        for _ in range(target.count):
+            started = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port), timeout=self.timeout
+                )
+            except (OSError, asyncio.TimeoutError):
+                rtts.append(None)
+                continue
+            rtts.append((time.perf_counter() - started) * 1000)
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), timeout=self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                pass
+        return _rtt_summary(rtts)
+
+    async def probe_dns(self, target) -> Dict:
+        """
+        Время DNS-разрешения. Если задан dns_server - запрос идет к нему
+        (проверка конкретного DNS-сервера), иначе к системному резолверу
+        """
+        import dns.resolver
+
+        def resolve() -> List[str]:
+            resolver = dns.resolver.Resolver()
+            resolver.lifetime = self.timeout
+            if target.dns_server:
+                resolver.nameservers = [target.dns_server]
+            return [str(answer) for answer in resolver.resolve(target.query or _host_of(target.host))]
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        answers = await loop.run_in_executor(self._executor, resolve)
+        return {
+            "resolution_time": round((time.perf_counter() - started) * 1000, 2),
+            "answers": answers,
+        }
@@ -0,0 +1,60 @@
+"""baseline: schema previously created by create_all
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+Существующие базы, созданные через Base.metadata.create_all, отмечаются
+этой ревизией без выполнения (alembic stamp 0001_baseline), после чего
+alembic upgrade head применяет остальные миграции online.
+
+Схема совпадает с исходной (до миграций); колонки и таблицы, которые
+create_all мог создать в промежуточных версиях, 0002 добавляет через
+IF NOT EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "measurements",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("timestamp", sa.DateTime()),
+        sa.Column("agent_id", sa.String()),
+        sa.Column("latency", sa.Float()),
+        sa.Column("download", sa.Float()),
+        sa.Column("upload", sa.Float()),
+        sa.Column("packet_loss", sa.Float()),
+        sa.Column("jitter", sa.Float()),
+        sa.Column("metainfo", sa.JSON()),
+    )
+    op.create_index("ix_measurements_id", "measurements", ["id"])
+    op.create_index("ix_measurements_timestamp", "measurements", ["timestamp"])
+    op.create_index("ix_measurements_agent_id", "measurements", ["agent_id"])
+
+    op.create_table(
+        "agents",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("location", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("last_seen", sa.DateTime()),
+    )
+    op.create_index("ix_agents_id", "agents", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("agents")
+    op.drop_table("measurements")
@@ -0,0 +1,243 @@
+"""uuid measurement ids, agent groups and hourly rollups (online)
+
+Revision ID: 0002_uuid_ids_and_rollups
+Revises: 0001_baseline
+Create Date: 2026-10-19 09:30:00.000000
+
+Миграция выполняется без остановки приема измерений:
+- measurements.id (varchar) -> uuid через новую колонку, пакетное
+  заполнение и уникальный индекс CONCURRENTLY; ACCESS EXCLUSIVE
+  блокировка нужна только на переименование и смену первичного ключа;
+- измерения, принятые приложением во время заполнения, заполняет
+  триггер; NOT NULL ставится через проверенный CHECK, поэтому смена
+  ключа не сканирует таблицу под блокировкой;
+- колонки и таблицы, появившиеся после исходной схемы (ключи агентов,
+  детекторы аномалий), создаются через IF NOT EXISTS - в базах от
+  create_all промежуточных версий они уже есть;
+- часовые агрегаты заполняются по суткам отдельными транзакциями.
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from db.migrations import (
+    backfill_by_time,
+    batched_backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+    run_with_lock_timeout,
+    validate_not_null,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_uuid_ids_and_rollups"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Старые ID, не являющиеся UUID, получают новый случайный UUID
+UUID_PATTERN = "^[0-9a-fA-F]{8}-?([0-9a-fA-F]{4}-?){3}[0-9a-fA-F]{12}$"
+def _to_uuid(column: str) -> str:
+    return f"CASE WHEN {column} ~ '{UUID_PATTERN}' THEN {column}::uuid ELSE gen_random_uuid() END"
+
+ID_TO_UUID = _to_uuid("id")
+
+# Заполнение новой колонки ID при вставке, пока идет миграция
+FILL_ID_NEW_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION measurements_fill_id_new() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.id_new IS NULL THEN
+            NEW.id_new := {_to_uuid("NEW.id")};
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+FILL_ID_OLD_FUNCTION = """
+    CREATE OR REPLACE FUNCTION measurements_fill_id_old() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.id_old IS NULL THEN
+            NEW.id_old := NEW.id::text;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+ROLLUP_METRICS = ("latency", "download", "upload", "packet_loss", "jitter")
+
+
+def _rollup_backfill_sql() -> str:
+    sums = ", ".join(f"sum({m}), count({m})" for m in ROLLUP_METRICS)
+    columns = ", ".join(f"{m}_sum, {m}_count" for m in ROLLUP_METRICS)
+    updates = ", ".join(
+        f"{c} = EXCLUDED.{c}"
+        for c in ("measurement_count", "download_min", "download_max", *columns.split(", "))
+    )
+    return f"""
+        INSERT INTO measurement_rollups_hourly
+            (agent_id, hour, measurement_count, download_min, download_max, {columns})
+        SELECT agent_id, date_trunc('hour', timestamp), count(*),
+               min(download), max(download), {sums}
+        FROM measurements
+        WHERE timestamp >= :start AND timestamp < :end AND agent_id IS NOT NULL
+        GROUP BY agent_id, date_trunc('hour', timestamp)
+        ON CONFLICT (agent_id, hour) DO UPDATE SET {updates}
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # --- agents: новые колонки (без значения по умолчанию - без перезаписи таблицы) ---
+    run_with_lock_timeout([
+        "ALTER TABLE agents ADD COLUMN IF NOT EXISTS api_key VARCHAR",
+        "ALTER TABLE agents ADD COLUMN IF NOT EXISTS test_interval INTEGER",
+        "ALTER TABLE agents ADD COLUMN IF NOT EXISTS tags JSON",
+        "ALTER TABLE agents ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITHOUT TIME ZONE",
+    ])
+    create_index_concurrently("ix_agents_api_key", "agents", ["api_key"], unique=True)
+
+    # --- новые таблицы ---
+    op.create_table(
+        "detector_states",
+        sa.Column("agent_id", sa.String(), primary_key=True),
+        sa.Column("metric", sa.String(), primary_key=True),
+        sa.Column("state", sa.JSON()),
+        sa.Column("updated_at", sa.DateTime()),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "anomalies",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("timestamp", sa.DateTime()),
+        sa.Column("agent_id", sa.String()),
+        sa.Column("metric", sa.String()),
+        sa.Column("value", sa.Float()),
+        sa.Column("baseline", sa.Float()),
+        sa.Column("deviation", sa.Float()),
+        sa.Column("direction", sa.String()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_anomalies_timestamp", "anomalies", ["timestamp"], if_not_exists=True)
+    op.create_index("ix_anomalies_agent_id", "anomalies", ["agent_id"], if_not_exists=True)
+    op.create_table(
+        "agent_group_members",
+        sa.Column("group_key", sa.String(), primary_key=True),
+        sa.Column("agent_id", sa.String(), primary_key=True),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_agent_group_members_agent_id", "agent_group_members", ["agent_id"], if_not_exists=True
+    )
+    op.create_table(
+        "measurement_rollups_hourly",
+        sa.Column("agent_id", sa.String(), primary_key=True),
+        sa.Column("hour", sa.DateTime(), primary_key=True),
+        sa.Column("measurement_count", sa.Integer(), nullable=False),
+        sa.Column("latency_sum", sa.Float()),
+        sa.Column("latency_count", sa.Integer()),
+        sa.Column("download_sum", sa.Float()),
+        sa.Column("download_count", sa.Integer()),
+        sa.Column("download_min", sa.Float()),
+        sa.Column("download_max", sa.Float()),
+        sa.Column("upload_sum", sa.Float()),
+        sa.Column("upload_count", sa.Integer()),
+        sa.Column("packet_loss_sum", sa.Float()),
+        sa.Column("packet_loss_count", sa.Integer()),
+        sa.Column("jitter_sum", sa.Float()),
+        sa.Column("jitter_count", sa.Integer()),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_measurement_rollups_hourly_hour", "measurement_rollups_hourly", ["hour"], if_not_exists=True
+    )
+
+    # --- measurements.id: varchar -> uuid ---
+    # Новые строки получают id_new сразу при вставке, backfill - старые
+    op.execute(FILL_ID_NEW_FUNCTION)
+    run_with_lock_timeout([
+        "ALTER TABLE measurements ADD COLUMN IF NOT EXISTS id_new UUID",
+        "DROP TRIGGER IF EXISTS measurements_fill_id_new ON measurements",
+        "CREATE TRIGGER measurements_fill_id_new BEFORE INSERT ON measurements "
+        "FOR EACH ROW EXECUTE FUNCTION measurements_fill_id_new()",
+    ])
+    batched_backfill("measurements", f"id_new = {ID_TO_UUID}", "id_new IS NULL")
+    create_index_concurrently("measurements_id_new_key", "measurements", ["id_new"], unique=True)
+
+    # PRIMARY KEY USING INDEX на nullable колонке неявно выполняет SET NOT NULL
+    # с полным сканированием под ACCESS EXCLUSIVE; с проверенным CHECK
+    # SET NOT NULL проходит без сканирования
+    check = validate_not_null("measurements", "id_new")
+    run_with_lock_timeout([
+        "DROP TRIGGER measurements_fill_id_new ON measurements",
+        "ALTER TABLE measurements ALTER COLUMN id_new SET NOT NULL",
+        f"ALTER TABLE measurements DROP CONSTRAINT {check}",
+        "ALTER TABLE measurements DROP CONSTRAINT measurements_pkey",
+        "ALTER TABLE measurements RENAME COLUMN id TO id_old",
+        "ALTER TABLE measurements RENAME COLUMN id_new TO id",
+        "ALTER TABLE measurements ADD CONSTRAINT measurements_pkey PRIMARY KEY USING INDEX measurements_id_new_key",
+    ])
+    op.execute("DROP FUNCTION IF EXISTS measurements_fill_id_new()")
+    # Индекс по старому ID и сама колонка больше не нужны: PK покрывает поиск по id
+    drop_index_concurrently("ix_measurements_id")
+    run_with_lock_timeout(["ALTER TABLE measurements DROP COLUMN id_old"])
+
+    # --- заполнение групп и часовых агрегатов ---
+    op.execute(
+        """
+        INSERT INTO agent_group_members (group_key, agent_id)
+        SELECT 'location:' || location, id FROM agents WHERE location IS NOT NULL AND location <> ''
+        UNION
+        SELECT 'tag:' || tag, id FROM agents, json_array_elements_text(coalesce(tags, '[]'::json)) AS tag
+        ON CONFLICT DO NOTHING
+        """
+    )
+
+    # Измерения, которые старые реплики запишут после этого снимка (без агрегатов),
+    # досчитывает новый leader при запуске: rebuild_recent_rollups
+    oldest = op.get_bind().scalar(sa.text("SELECT min(timestamp) FROM measurements"))
+    if oldest is not None:
+        start = oldest.replace(minute=0, second=0, microsecond=0)
+        end = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        backfill_by_time(_rollup_backfill_sql(), start, end, step=timedelta(days=1))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("measurement_rollups_hourly")
+    op.drop_table("agent_group_members")
+
+    op.execute(FILL_ID_OLD_FUNCTION)
+    run_with_lock_timeout([
+        "ALTER TABLE measurements ADD COLUMN IF NOT EXISTS id_old VARCHAR",
+        "DROP TRIGGER IF EXISTS measurements_fill_id_old ON measurements",
+        "CREATE TRIGGER measurements_fill_id_old BEFORE INSERT ON measurements "
+        "FOR EACH ROW EXECUTE FUNCTION measurements_fill_id_old()",
+    ])
+    batched_backfill("measurements", "id_old = id::text", "id_old IS NULL")
+    create_index_concurrently("ix_measurements_id", "measurements", ["id_old"], unique=True)
+    check = validate_not_null("measurements", "id_old")
+    run_with_lock_timeout([
+        "DROP TRIGGER measurements_fill_id_old ON measurements",
+        "ALTER TABLE measurements ALTER COLUMN id_old SET NOT NULL",
+        f"ALTER TABLE measurements DROP CONSTRAINT {check}",
+        "ALTER TABLE measurements DROP CONSTRAINT measurements_pkey",
+        "ALTER TABLE measurements DROP COLUMN id",
+        "ALTER TABLE measurements RENAME COLUMN id_old TO id",
+        "ALTER TABLE measurements ADD CONSTRAINT measurements_pkey PRIMARY KEY USING INDEX ix_measurements_id",
+    ])
+    op.execute("DROP FUNCTION IF EXISTS measurements_fill_id_old()")
+    create_index_concurrently("ix_measurements_id", "measurements", ["id"])
+
+    op.drop_table("anomalies")
+    op.drop_table("detector_states")
+    drop_index_concurrently("ix_agents_api_key")
+    run_with_lock_timeout([
+        "ALTER TABLE agents DROP COLUMN IF EXISTS created_at",
+        "ALTER TABLE agents DROP COLUMN IF EXISTS tags",
+        "ALTER TABLE agents DROP COLUMN IF EXISTS test_interval",
+        "ALTER TABLE agents DROP COLUMN IF EXISTS api_key",
+    ])
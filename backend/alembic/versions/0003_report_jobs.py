@@ -0,0 +1,41 @@
+"""report jobs
+
+Revision ID: 0003_report_jobs
+Revises: 0002_uuid_ids_and_rollups
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_report_jobs"
+down_revision: Union[str, Sequence[str], None] = "0002_uuid_ids_and_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "report_jobs",
+        sa.Column("id", sa.Uuid(), primary_key=True),
+        sa.Column("params_hash", sa.String()),
+        sa.Column("params", sa.JSON()),
+        sa.Column("status", sa.String()),
+        sa.Column("result", sa.JSON()),
+        sa.Column("error", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("finished_at", sa.DateTime()),
+    )
+    op.create_index("ix_report_jobs_params_hash", "report_jobs", ["params_hash"])
+    op.create_index("ix_report_jobs_status", "report_jobs", ["status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("report_jobs")
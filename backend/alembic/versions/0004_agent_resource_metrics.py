@@ -0,0 +1,33 @@
+"""agent resource metrics
+
+Revision ID: 0004_agent_resource_metrics
+Revises: 0003_report_jobs
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from db.migrations import run_with_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_agent_resource_metrics"
+down_revision: Union[str, Sequence[str], None] = "0003_report_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    run_with_lock_timeout([
+        "ALTER TABLE agents ADD COLUMN IF NOT EXISTS resource_metrics JSON",
+        "ALTER TABLE agents ADD COLUMN IF NOT EXISTS resource_reported_at TIMESTAMP WITHOUT TIME ZONE",
+    ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    run_with_lock_timeout([
+        "ALTER TABLE agents DROP COLUMN IF EXISTS resource_reported_at",
+        "ALTER TABLE agents DROP COLUMN IF EXISTS resource_metrics",
+    ])
@@ -0,0 +1,38 @@
+"""network paths
+
+Revision ID: 0005_network_paths
+Revises: 0004_agent_resource_metrics
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_network_paths"
+down_revision: Union[str, Sequence[str], None] = "0004_agent_resource_metrics"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "network_paths",
+        sa.Column("agent_id", sa.String(), primary_key=True),
+        sa.Column("path_hash", sa.String(), primary_key=True),
+        sa.Column("target", sa.String()),
+        sa.Column("hops", sa.JSON()),
+        sa.Column("first_seen", sa.DateTime()),
+        sa.Column("last_seen", sa.DateTime()),
+        sa.Column("seen_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index("ix_network_paths_last_seen", "network_paths", ["last_seen"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("network_paths")
@@ -0,0 +1,33 @@
+"""agent configs
+
+Revision ID: 0006_agent_configs
+Revises: 0005_network_paths
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_agent_configs"
+down_revision: Union[str, Sequence[str], None] = "0005_network_paths"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "agent_configs",
+        sa.Column("scope", sa.String(), primary_key=True),
+        sa.Column("settings", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("agent_configs")
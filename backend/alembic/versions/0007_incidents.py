@@ -0,0 +1,44 @@
+"""incidents
+
+Revision ID: 0007_incidents
+Revises: 0006_agent_configs
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_incidents"
+down_revision: Union[str, Sequence[str], None] = "0006_agent_configs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "incidents",
+        sa.Column("id", sa.Uuid(), primary_key=True),
+        sa.Column("group", sa.String()),
+        sa.Column("kind", sa.String()),
+        sa.Column("status", sa.String()),
+        sa.Column("opened_at", sa.DateTime()),
+        sa.Column("closed_at", sa.DateTime()),
+        sa.Column("agents_in_group", sa.Integer()),
+        sa.Column("peak_agents", sa.Integer()),
+        sa.Column("reasons", sa.JSON()),
+        sa.Column("affected_agents", sa.JSON()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_incidents_group", "incidents", ["group"])
+    op.create_index("ix_incidents_status", "incidents", ["status"])
+    op.create_index("ix_incidents_updated_at", "incidents", ["updated_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("incidents")
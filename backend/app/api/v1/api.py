@@ -1,12 +1,19 @@
 # app/api/v1/api.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from .endpoints import (
+    agent_config,
     agents,
     measurements,
     healthcheck,
-    statistics
+    statistics,
+    anomalies,
+    incidents,
+    reports,
+    debug
 )
+from core.admission import stats_limiter
 from core.config import settings
+from services.agent_service import verify_admin_key
 
 api_router = APIRouter()
 
@@ -16,6 +23,12 @@ api_router.include_router(
     prefix="/health",
     tags=["Healthcheck"]
 )
+# До agents: иначе /agents/config совпадет с /agents/{agent_id}
+api_router.include_router(
+    agent_config.router,
+    prefix="/agents/config",
+    tags=["Agent Config"]
+)
 api_router.include_router(
     agents.router,
     prefix="/agents",
@@ -29,5 +42,29 @@ api_router.include_router(
 api_router.include_router(
     statistics.router,
     prefix="/stats",
-    tags=["Statistics"]
+    tags=["Statistics"],
+    dependencies=[Depends(stats_limiter.slot)]
+)
+api_router.include_router(
+    anomalies.router,
+    prefix="/anomalies",
+    tags=["Anomalies"]
+)
+
+api_router.include_router(
+    incidents.router,
+    prefix="/incidents",
+    tags=["Incidents"]
+)
+
+api_router.include_router(
+    reports.router,
+    prefix="/reports",
+    tags=["Reports"]
+)
+api_router.include_router(
+    debug.router,
+    prefix="/debug",
+    tags=["Debug"],
+    dependencies=[Depends(verify_admin_key)]
 )
@@ -0,0 +1,62 @@
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.serialization import JSONBytesResponse
+from db.session import get_db
+from db.schemas import AgentConfigIn, AgentConfigOut
+from services.agent_config_service import (
+    agent_config_store,
+    delete_config_scope,
+    list_config_scopes,
+    put_config_scope
+)
+from services.agent_service import cached_agent, verify_admin_key
+
+router = APIRouter()
+
+@router.get("/", response_class=JSONBytesResponse)
+async def get_agent_config(
+    wait: int = Query(0, ge=0),
+    if_none_match: Optional[str] = Header(None),
+    agent: Dict = Depends(cached_agent)
+):
+    """
+    Итоговая конфигурация агента (global < location < tag < agent)
+
+    С If-None-Match текущего ETag отвечает 304; wait > 0 - long-poll:
+    ответ задерживается до изменения конфигурации или wait секунд
+    (не больше AGENT_CONFIG_LONG_POLL_MAX). Слишком много ожидающих
+    запросов - 503 с Retry-After
+    """
+    changed, etag, body = await agent_config_store.poll(
+        agent, if_none_match, min(wait, settings.AGENT_CONFIG_LONG_POLL_MAX)
+    )
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not changed:
+        return Response(status_code=304, headers=headers)
+    return JSONBytesResponse(body, headers=headers)
+
+@router.get("/scopes", response_model=List[AgentConfigOut], dependencies=[Depends(verify_admin_key)])
+async def get_config_scopes(db: AsyncSession = Depends(get_db)):
+    return await list_config_scopes(db)
+
+@router.put("/scopes/{scope:path}", response_model=AgentConfigOut, dependencies=[Depends(verify_admin_key)])
+async def set_config_scope(
+    scope: str,
+    config: AgentConfigIn,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Параметры агентов области: global, location:<город>, tag:<тег>
+    или agent:<id>. Агенты получают изменения при следующем опросе
+    """
+    return await put_config_scope(db, scope, config.settings)
+
+@router.delete("/scopes/{scope:path}", status_code=204, dependencies=[Depends(verify_admin_key)])
+async def remove_config_scope(
+    scope: str,
+    db: AsyncSession = Depends(get_db)
+):
+    if not await delete_config_scope(db, scope):
+        raise HTTPException(status_code=404, detail="Config scope not found")
@@ -1,39 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import APIKeyHeader
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from db.session import get_db
 from db.models import Agent
-from db.schemas import AgentCreate, AgentOut
-from services.agent_service import generate_agent_key
+from db.schemas import AgentCreate, AgentOut, AgentUpdate
+from services.agent_service import (
+    RESOURCE_SORT_FIELDS,
+    create_agent,
+    list_agent_resources,
+    update_agent,
+    verify_admin_key
+)
+from services.liveness_service import liveness_tracker
+from services.path_service import list_agent_paths
 
 router = APIRouter()
-admin_key_scheme = APIKeyHeader(name="X-ADMIN-KEY")
 
-@router.post("/", response_model=AgentOut)
+@router.post("/", response_model=AgentOut, dependencies=[Depends(verify_admin_key)])
 async def register_agent(
     agent: AgentCreate,
-    db: AsyncSession = Depends(get_db),
-    admin_key: str = Depends(admin_key_scheme)
+    db: AsyncSession = Depends(get_db)
 ):
-    if admin_key != settings.ADMIN_SECRET:
-        raise HTTPException(status_code=403, detail="Invalid admin key")
-    
-    agent_key = generate_agent_key()
-    db_agent = await Agent.create(
-        db,
-        name=agent.name,
-        location=agent.location,
-        api_key=agent_key
-    )
-    return {**db_agent.dict(), "api_key": agent_key}
+    return await create_agent(db, agent)
 
-@router.get("/{agent_id}", response_model=AgentOut)
+@router.get("/stale", dependencies=[Depends(verify_admin_key)])
+async def get_stale_agents(
+    include_offline: bool = Query(True)
+):
+    """Агенты, пропустившие ожидаемые измерения (из памяти, без запросов к БД)"""
+    return {"agents": liveness_tracker.stale_agents(include_offline)}
+
+@router.get("/resources", dependencies=[Depends(verify_admin_key)])
+async def get_agent_resources(
+    sort_by: str = Query("cpu_pct", regex=f"^({'|'.join(RESOURCE_SORT_FIELDS)})$"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Агенты с самыми тяжелыми для устройства пробами: последние сводки
+    ресурсов (CPU, RSS, сокеты, длительность цикла и отправки)
+    """
+    return {"agents": await list_agent_resources(db, sort_by, limit)}
+
+@router.get("/{agent_id}", response_model=AgentOut, dependencies=[Depends(verify_admin_key)])
 async def get_agent(
     agent_id: str,
-    db: AsyncSession = Depends(get_db),
-    _: str = Depends(admin_key_scheme)
+    db: AsyncSession = Depends(get_db)
 ):
-    agent = await Agent.get(db, agent_id)
+    agent = await db.get(Agent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return agent
+
+@router.get("/{agent_id}/paths", dependencies=[Depends(verify_admin_key)])
+async def get_agent_paths(
+    agent_id: str,
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
+):
+    """Уникальные маршруты агента до тестового сервера (по трассировкам)"""
+    return {"paths": await list_agent_paths(db, agent_id, limit)}
+
+@router.patch("/{agent_id}", response_model=AgentOut, dependencies=[Depends(verify_admin_key)])
+async def patch_agent(
+    agent_id: str,
+    changes: AgentUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Изменение агента (location и tags определяют группы в /stats/groups)"""
+    agent = await db.get(Agent, agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return await update_agent(db, agent, changes)
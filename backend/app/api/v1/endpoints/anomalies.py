@@ -0,0 +1,49 @@
+# app/api/v1/endpoints/anomalies.py
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_db
+from db.models import Anomaly
+from services.anomaly_service import anomaly_detector
+
+router = APIRouter()
+
+@router.get("/")
+async def get_recent_anomalies(
+    agent_id: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Последние аномалии из памяти детектора (без запросов к БД)"""
+    return {"anomalies": anomaly_detector.recent(agent_id, limit)}
+
+@router.get("/history")
+async def get_anomaly_history(
+    agent_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """История аномалий из БД (сохраняются при чекпоинте детекторов)"""
+    query = select(Anomaly).order_by(Anomaly.timestamp.desc()).limit(limit)
+    if agent_id:
+        query = query.where(Anomaly.agent_id == agent_id)
+    if since:
+        query = query.where(Anomaly.timestamp >= since)
+
+    result = await db.execute(query)
+    return {
+        "anomalies": [
+            {
+                "timestamp": a.timestamp.isoformat() if a.timestamp else None,
+                "agent_id": a.agent_id,
+                "metric": a.metric,
+                "value": a.value,
+                "baseline": a.baseline,
+                "deviation": a.deviation,
+                "direction": a.direction,
+            }
+            for a in result.scalars()
+        ]
+    }
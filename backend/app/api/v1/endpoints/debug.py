@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from core.profiling import profiler, slow_query_log
+
+router = APIRouter()
+
+@router.get("/profile")
+async def get_profile(top: int = Query(20, ge=1, le=200)):
+    """
+    Сводка профилированных запросов (X-Profile или PROFILE_SAMPLE_RATE):
+    длительность и время SQL по маршрутам, самые дорогие запросы к БД
+    """
+    return profiler.summary(top)
+
+@router.get("/profile/flamegraph", response_class=PlainTextResponse)
+async def get_flamegraph():
+    """Свернутые стеки для flamegraph.pl, speedscope или inferno"""
+    return profiler.folded()
+
+@router.delete("/profile", status_code=204)
+async def reset_profile():
+    profiler.reset()
+
+@router.get("/slow-queries")
+async def get_slow_queries():
+    """Медленные запросы к БД (новые первыми) с планами EXPLAIN ANALYZE"""
+    return {"threshold": slow_query_log.threshold, "queries": slow_query_log.list()}
@@ -2,7 +2,11 @@ from fastapi import APIRouter, Depends
 from sqlalchemy import text
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.session import get_db
+from core.admission import admission_stats
+from core.config import settings
+from core.coordination import cluster_bus
+from core.readiness import readiness
+from db.session import get_db, pool_status
 
 router = APIRouter()
 
@@ -10,6 +14,35 @@ router = APIRouter()
 async def health():
     return {"status": "ok"}
 
+@router.get("/ready")
+async def ready():
+    """
+    Готовность реплики к трафику (readiness-проба): пул соединений
+    и кэши прогреты во всех worker'ах хоста, процесс не останавливается
+    """
+    ready = readiness.host_ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "worker_ready": readiness.ready,
+            "workers": {"ready": readiness.ready_workers(), "expected": settings.WEB_CONCURRENCY},
+            "shutting_down": readiness.shutting_down,
+            "warm_up": readiness.checks,
+            "pool": pool_status(),
+        }
+    )
+
+@router.get("/admission")
+async def admission_health():
+    """Нагрузка и отклоненные запросы (в этом worker-процессе)"""
+    return admission_stats()
+
+@router.get("/bus")
+async def bus_health():
+    """Шина между репликами (в этом worker-процессе): очередь и потерянные сообщения"""
+    return cluster_bus.stats()
+
 @router.get("/db")
 async def db_health(db: AsyncSession = Depends(get_db)):
     try:
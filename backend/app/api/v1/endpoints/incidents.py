@@ -0,0 +1,44 @@
+# app/api/v1/endpoints/incidents.py
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.schemas import IncidentOut
+from db.session import get_db
+from services.correlation_service import GROUP_KINDS, correlation_index, get_incident
+
+router = APIRouter()
+
+@router.get("/")
+async def get_incidents(
+    status: Optional[str] = Query(None, regex="^(open|resolved)$"),
+    kind: Optional[str] = Query(None, regex=f"^({'|'.join(GROUP_KINDS)})$"),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """
+    Инциденты: одновременная деградация агентов одной группы
+
+    Параметры:
+    - status: open - текущие, resolved - завершенные
+    - kind: тип группы (location - местоположение, prefix - сеть внешнего IP,
+      server - тестовый сервер)
+    - limit: количество инцидентов (последние изменения первыми)
+
+    Затронутые агенты - число и первые из них (affected_sample);
+    полный список - GET /incidents/{id}
+    """
+    return {"incidents": correlation_index.incidents(status, kind, limit)}
+
+@router.get("/{incident_id}", response_model=IncidentOut)
+async def get_incident_details(
+    incident_id: UUID,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Инцидент с полным списком затронутых агентов. Leader сохраняет изменения
+    раз в CORRELATION_SWEEP_INTERVAL, поэтому последние могут появиться позже
+    """
+    incident = await get_incident(db, incident_id)
+    if incident is None:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return incident
@@ -1,33 +1,162 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from uuid import UUID
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from db.session import get_db
-from db.models import Measurement
+from db.session import get_db, async_session
+from db.models import Agent, Measurement
 from db.schemas import MeasurementCreate, MeasurementOut
-from services.agent_service import verify_agent_key
+from services.agent_service import admitted_agent, record_agent_metrics
+from services.broadcast_service import broadcast_hub
+from services.measurement_service import MeasurementService, measurement_event
+from services.rollup_service import group_keys, rollup_event
+from core.admission import ingest_limiter
+from core.config import settings
+from core.serialization import JSONBytesResponse
+from core import events
 
 router = APIRouter()
 
-#@router.post("/", response_model=MeasurementOut, status_code=201)
+async def _ingest(
+    agent: Agent,
+    measurements: List[MeasurementCreate],
+    db: AsyncSession
+) -> List[Dict]:
+    for measurement in measurements:
+        if measurement.agent_id != agent.id:
+            raise HTTPException(
+                status_code=403,
+                detail=f"API key does not belong to agent {measurement.agent_id}"
+            )
+    service = MeasurementService(db)
+    inserted = await service.ingest(agent.id, measurements)
+
+    # Детекторы аномалий и живая лента получают только новые измерения, в виде
+    # сводки (событие уходит всем репликам); местоположение агента - для
+    # поиска общих инцидентов
+    for row in inserted:
+        events.emit("measurement", measurement_event(row, agent.location))
+    # Обновленные часовые агрегаты - для групповых дашбордов в живой ленте
+    groups = group_keys(agent.location, agent.tags)
+    for rollup in service.rollups:
+        events.emit("rollup", rollup_event(rollup, groups))
+    return inserted
+
+@router.post("/", status_code=201, dependencies=[Depends(ingest_limiter.slot)])
 async def create_measurement(
     measurement: MeasurementCreate,
     db: AsyncSession = Depends(get_db),
-    agent_id: str = Depends(verify_agent_key)
+    agent: Agent = Depends(admitted_agent)
 ):
-    db_measurement = Measurement(
-        agent_id=agent_id,
-        **measurement.dict()
-    )
+    """
+    Прием одного измерения от агента. Повторная отправка измерения
+    с тем же ID не создает дубликат (duplicate=true в ответе)
+    """
+    inserted = await _ingest(agent, [measurement], db)
+    return {"id": measurement.id or (inserted[0]["id"] if inserted else None), "duplicate": not inserted}
+
+@router.post("/batch", status_code=201, dependencies=[Depends(ingest_limiter.slot)])
+async def create_measurements_batch(
+    measurements: List[MeasurementCreate] = Body(..., max_length=settings.MEASUREMENTS_BATCH_LIMIT),
+    x_agent_metrics: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    agent: Agent = Depends(admitted_agent)
+):
+    """
+    Прием пачки измерений агента (отправка накопленной очереди).
+    Уже сохраненные ID пропускаются, поэтому пачку можно безопасно повторять.
+    Заголовок X-Agent-Metrics - сводка ресурсов агента (GET /agents/resources)
+    """
+    record_agent_metrics(agent.id, x_agent_metrics)
+    inserted = await _ingest(agent, measurements, db)
+    return {"received": len(measurements), "inserted": len(inserted)}
+
+@router.get("/", response_class=JSONBytesResponse)
+async def list_measurements(
+    agent_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=settings.MEASUREMENTS_PAGE_LIMIT),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Список измерений (новые первыми)
     
-    db.add(db_measurement)
-    await db.commit()
-    await db.refresh(db_measurement)
+    Параметры:
+    - agent_id: ID агента (опционально)
+    - since, until: границы интервала времени
+    - limit: размер страницы
+    - cursor: курсор следующей страницы из предыдущего ответа
+    """
+    service = MeasurementService(db)
+    try:
+        return JSONBytesResponse(await service.list_page(agent_id, since, until, limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/export")
+async def export_measurements(
+    agent_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None)
+):
+    """
+    Выгрузка измерений в NDJSON (по строке на измерение) без
+    загрузки всего результата в память
+    """
+    async def ndjson():
+        # Собственная сессия: ответ читается после выхода из зависимостей
+        async with async_session() as db:
+            async for chunk in MeasurementService(db).export_ndjson(agent_id, since, until):
+                yield chunk
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.get("/stream")
+async def stream_measurements(
+    request: Request,
+    agent_id: Optional[List[str]] = Query(None)
+):
+    """
+    Живая лента новых измерений (сводки без metainfo), аномалий
+    и обновленных часовых агрегатов агентов (Server-Sent Events)
     
-    return MeasurementOut.from_orm(db_measurement)
+    Параметры:
+    - agent_id: фильтр по агентам (можно указать несколько раз)
+    """
+    subscriber = broadcast_hub.subscribe(agent_id)
+
+    async def event_stream():
+        try:
+            while not subscriber.dropped:
+                try:
+                    message = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=settings.STREAM_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            broadcast_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-#@router.get("/{measurement_id}", response_model=MeasurementOut)
+@router.get("/{measurement_id}", response_model=MeasurementOut)
 async def get_measurement(
-    measurement_id: str,
+    measurement_id: UUID,
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(
@@ -38,4 +167,4 @@ async def get_measurement(
     if not measurement:
         raise HTTPException(status_code=404, detail="Measurement not found")
     
-    return MeasurementOut.from_orm(measurement)
+    return MeasurementOut.model_validate(measurement)
@@ -0,0 +1,40 @@
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_db
+from db.models import ReportJob
+from db.schemas import ReportJobOut, ReportRequest
+from services.report_service import submit_report
+
+router = APIRouter()
+
+@router.post("/", response_model=ReportJobOut, status_code=202)
+async def create_report(
+    request: ReportRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Постановка отчета за долгий период в очередь
+
+    Параметры:
+    - time_range или since/until: период (границы округляются до часа)
+    - group_by: global, agent, location, tag
+    - interval: разбивка по hour/day (опционально)
+    - metrics: метрики отчета (по умолчанию все)
+
+    Результат - в GET /reports/{id} после status=done
+    """
+    try:
+        return await submit_report(db, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{job_id}", response_model=ReportJobOut)
+async def get_report(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db)
+):
+    job = await db.get(ReportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return job
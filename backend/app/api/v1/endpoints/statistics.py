@@ -2,12 +2,15 @@
 from typing import Optional
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.session import get_db
-from services.stats_service import calculate_stats, StatsService
+from core.config import settings
+from db.session import get_db, set_statement_timeout
+from core.serialization import JSONBytesResponse, cached_json, stats_cache
+from services.stats_service import calculate_stats, StatsService, AGENT_SORT_METRICS
+from services.rollup_service import GROUP_KINDS
 
 router = APIRouter()
 
-@router.get("/")
+@router.get("/", response_class=JSONBytesResponse)
 async def get_stats(
     agent_id: Optional[str] = Query(None),
     time_range: str = Query("24h", regex="^(1h|24h|7d|30d)$"),
@@ -21,36 +24,117 @@ async def get_stats(
     - time_range: диапазон времени (1h, 24h, 7d, 30d)
     """
     try:
-        return await calculate_stats(db, agent_id, time_range)
+        return await cached_json(
+            stats_cache,
+            ("stats", agent_id, time_range),
+            lambda: calculate_stats(db, agent_id, time_range)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"Error calculating stats: {str(e)}"
         )
 
-@router.get("/advanced")
-async def get_advanced_stats(
+@router.get("/agents", response_class=JSONBytesResponse)
+async def get_agents_stats(
     time_range: str = Query("24h", regex="^(1h|24h|7d|30d)$"),
+    sort_by: str = Query("avg_latency", regex=f"^({'|'.join(AGENT_SORT_METRICS)})$"),
+    order: str = Query("desc", regex="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """Расширенная статистика с использованием StatsService"""
+    """
+    Сравнение всех агентов одним запросом
+    
+    Параметры:
+    - time_range: диапазон времени (1h, 24h, 7d, 30d)
+    - sort_by: метрика для сортировки
+    - order: направление сортировки (asc, desc)
+    - limit: количество агентов на странице (top-K)
+    - cursor: курсор следующей страницы из предыдущего ответа
+    """
     service = StatsService(db)
     try:
+        return await cached_json(
+            stats_cache,
+            ("agents", time_range, sort_by, order, limit, cursor),
+            lambda: service.get_agents_stats(time_range, sort_by, order, limit, cursor)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error calculating agents stats: {str(e)}"
+        )
+
+@router.get("/groups", response_class=JSONBytesResponse)
+async def get_groups_stats(
+    kind: str = Query("location", regex=f"^({'|'.join(GROUP_KINDS)})$"),
+    time_range: str = Query("24h", regex="^(1h|24h|7d|30d)$"),
+    group: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Агрегаты по группам агентов (из часовых rollup'ов)
+    
+    Параметры:
+    - kind: тип группы (location - по местоположению, tag - по тегам агента)
+    - time_range: диапазон времени (1h, 24h, 7d, 30d)
+    - group: одна группа (например, город); по умолчанию все группы
+    """
+    service = StatsService(db)
+    try:
+        return await cached_json(
+            stats_cache,
+            ("groups", kind, time_range, group),
+            lambda: service.get_groups_stats(kind, time_range, group)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error calculating groups stats: {str(e)}"
+        )
+
+@router.get("/advanced", response_class=JSONBytesResponse)
+async def get_advanced_stats(
+    time_range: str = Query("24h", regex="^(1h|24h|7d|30d)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Расширенная статистика с использованием StatsService.
+    Запросы ограничены STATS_STATEMENT_TIMEOUT; отчеты за долгие
+    периоды и с группировкой - через POST /reports
+    """
+    service = StatsService(db)
+
+    async def produce():
+        await set_statement_timeout(db, settings.STATS_STATEMENT_TIMEOUT)
         if time_range == "30d":
-            # Пример дополнительной логики
             weekly = await service.get_global_stats("7d")
             monthly = await service.get_global_stats("30d")
+            # Без измерений за неделю средняя задержка 0 - изменение не определено
+            latency_change = None
+            if weekly["avg_latency"]:
+                latency_change = round(
+                    (monthly["avg_latency"] - weekly["avg_latency"]) / weekly["avg_latency"] * 100, 2
+                )
             return {
                 "weekly": weekly,
                 "monthly": monthly,
                 "comparison": {
-                    "latency_change": round(
-                        (monthly["avg_latency"] - weekly["avg_latency"]) / weekly["avg_latency"] * 100, 2
-                    )
+                    "latency_change": latency_change
                 }
             }
         return await service.get_global_stats(time_range)
+
+    try:
+        return await cached_json(stats_cache, ("advanced", time_range), produce)
     except Exception as e:
+        if "statement timeout" in str(e):
+            raise HTTPException(
+                status_code=503,
+                detail="Advanced stats took too long, use POST /reports for this range"
+            )
         raise HTTPException(
             status_code=400,
             detail=f"Error calculating advanced stats: {str(e)}"
@@ -0,0 +1,120 @@
+# app/core/admission.py
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Dict
+from fastapi import HTTPException, status
+from core.config import settings
+from core.logger import logger
+
+class TokenBucket:
+    """Token bucket: устойчивый темп rate запросов/сек и всплеск до burst"""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """0 - запрос допущен, иначе через сколько секунд будет достаточно токенов"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+class RateLimiter:
+    """
+    Ограничение темпа по ключу (ID агента). Состояние в памяти процесса:
+    при нескольких worker'ах лимит действует в каждом из них
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.rejected = 0
+
+    def check(self, key: str, cost: float = 1.0) -> None:
+        """Проверка лимита; при превышении - 429 с Retry-After"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        wait = bucket.take(cost)
+        if wait:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+class ConcurrencyLimiter:
+    """
+    Ограничение одновременно выполняемых запросов. Запрос ждет
+    свободный слот не дольше queue_timeout, после чего отклоняется
+    с 503 и Retry-After (сброс нагрузки вместо очереди без границ)
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(limit)
+        self.rejected = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self.limit - self._semaphore._value
+
+    async def slot(self):
+        """FastAPI dependency: слот удерживается до конца обработки запроса"""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            if self.rejected % 100 == 1:
+                logger.warning(f"Shedding {self.name} load: {self.limit} requests in flight")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Server is overloaded ({self.name})",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+agent_rate_limiter = RateLimiter(settings.AGENT_RATE_LIMIT, settings.AGENT_RATE_BURST)
+ingest_limiter = ConcurrencyLimiter(
+    "ingest",
+    settings.INGEST_MAX_CONCURRENCY,
+    settings.ADMISSION_QUEUE_TIMEOUT,
+    settings.ADMISSION_RETRY_AFTER
+)
+stats_limiter = ConcurrencyLimiter(
+    "stats",
+    settings.STATS_MAX_CONCURRENCY,
+    settings.ADMISSION_QUEUE_TIMEOUT,
+    settings.ADMISSION_RETRY_AFTER
+)
+
+def admission_stats() -> Dict[str, Dict]:
+    """Счетчики отклоненных запросов (для healthcheck)"""
+    return {
+        "agent_rate": {"rejected": agent_rate_limiter.rejected},
+        "ingest": {"in_flight": ingest_limiter.in_flight, "rejected": ingest_limiter.rejected},
+        "stats": {"in_flight": stats_limiter.in_flight, "rejected": stats_limiter.rejected},
+    }
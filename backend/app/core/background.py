@@ -0,0 +1,66 @@
+# app/core/background.py
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+from core.coordination import leader
+from core.logger import logger
+
+JobFunc = Callable[[], Awaitable[None]]
+
+_jobs: List[Dict] = []
+_tasks: List[asyncio.Task] = []
+
+def register_periodic(
+    name: str,
+    interval: float,
+    func: JobFunc,
+    run_on_shutdown: bool = False,
+    singleton: bool = False
+) -> None:
+    """
+    Регистрация периодической фоновой задачи
+
+    Args:
+        name: Имя задачи (для логов)
+        interval: Период запуска в секундах
+        func: Асинхронная функция без аргументов
+        run_on_shutdown: Выполнить задачу еще раз при остановке приложения
+        singleton: Выполнять только в leader-процессе (один раз на кластер,
+            а не в каждом worker'е каждой реплики)
+    """
+    _jobs.append({
+        "name": name,
+        "interval": interval,
+        "func": func,
+        "run_on_shutdown": run_on_shutdown,
+        "singleton": singleton
+    })
+
+async def _run_job(job: Dict) -> None:
+    if job["singleton"] and not leader.is_leader:
+        return
+    try:
+        await job["func"]()
+    except Exception as e:
+        logger.error(f"Background job {job['name']} failed: {str(e)}")
+
+async def _periodic(job: Dict) -> None:
+    while True:
+        await asyncio.sleep(job["interval"])
+        await _run_job(job)
+
+def start_background_jobs() -> None:
+    """Запуск всех зарегистрированных задач"""
+    for job in _jobs:
+        _tasks.append(asyncio.create_task(_periodic(job), name=job["name"]))
+        logger.info(f"Background job {job['name']} started (every {job['interval']}s)")
+
+async def stop_background_jobs() -> None:
+    """Остановка задач и финальный запуск тех, что должны сбросить состояние"""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+    for job in _jobs:
+        if job["run_on_shutdown"]:
+            await _run_job(job)
@@ -0,0 +1,60 @@
+# app/core/cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from core.coordination import worker_bus
+
+_caches: Dict[str, "TTLCache"] = {}
+
+class TTLCache:
+    """
+    Кэш в памяти процесса с TTL и ограничением размера (LRU).
+    Инвалидация рассылается всем worker'ам через WorkerBus.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        _caches[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Инвалидация ключа (или всего кэша) во всех worker'ах"""
+        self._invalidate_local(key)
+        worker_bus.publish("cache.invalidate", {"cache": self.name, "key": key})
+
+    def _invalidate_local(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+
+def _on_invalidate(payload: Dict) -> None:
+    cache = _caches.get(payload["cache"])
+    if cache is not None:
+        key = payload.get("key")
+        # Ключи-кортежи приходят из JSON списками
+        cache._invalidate_local(tuple(key) if isinstance(key, list) else key)
+
+worker_bus.subscribe("cache.invalidate", _on_invalidate)
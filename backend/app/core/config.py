@@ -6,12 +6,119 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str
     DATABASE_URL: str = "postgresql+asyncpg://iqmsuser:iqmspassword@db:5432/iqms"
+    DB_POOL_SIZE: int = 5          # соединений пула в каждом worker-процессе
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_WARM: int = 5          # соединений, открываемых до готовности (/health/ready)
+    WEB_CONCURRENCY: int = 1       # worker-процессов uvicorn на хосте (/health/ready ждет все)
+    READINESS_REPORT_INTERVAL: float = 2.0  # рассылка готовности worker'а остальным, сек
     AGENT_KEY_EXPIRE_DAYS: int = 365
+    ADMIN_SECRET: Optional[str] = None  # Ключ администратора (X-ADMIN-KEY); None - админ-API закрыт
     
     # Настройки логирования
     LOG_LEVEL: str = "INFO"
     LOG_FILE: Optional[str] = "logs/app.log"
     
+    # Настройки детектора аномалий (EWMA/EWMV + CUSUM)
+    ANOMALY_EWMA_ALPHA: float = 0.1
+    ANOMALY_CUSUM_K: float = 0.5
+    ANOMALY_CUSUM_H: float = 5.0
+    ANOMALY_WARMUP: int = 20
+    ANOMALY_BUFFER_SIZE: int = 1000
+    ANOMALY_CHECKPOINT_INTERVAL: int = 60
+    ANOMALY_PENDING_LIMIT: int = 10000      # несохраненных аномалий в памяти
+    
+    # Отслеживание активности агентов
+    DEFAULT_TEST_INTERVAL: int = 300
+    LIVENESS_STALE_FACTOR: float = 1.5    # stale после 1.5 пропущенных интервалов
+    LIVENESS_OFFLINE_FACTOR: float = 3.0  # offline после 3 интервалов
+    LIVENESS_FLUSH_INTERVAL: int = 30
+    
+    # Живая лента измерений (SSE)
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_KEEPALIVE: int = 15
+    
+    # Координация worker-процессов: сокеты в общем каталоге внутри хоста,
+    # LISTEN/NOTIFY PostgreSQL между репликами, лидер - advisory-блокировка
+    WORKER_BUS_DIR: str = "/tmp/iqms"
+    INSTANCE_ID: Optional[str] = None        # имя реплики; None - имя хоста (пода)
+    CLUSTER_BUS_CHANNEL: str = "iqms_bus"
+    CLUSTER_BUS_MAX_PAYLOAD: int = 7900      # байт на NOTIFY (предел PostgreSQL - 8000)
+    CLUSTER_BUS_QUEUE_SIZE: int = 10000
+    CLUSTER_BUS_FLUSH_DELAY: float = 0.05
+    LEADER_LOCK_KEY: int = 0x49514D53        # ключ pg_advisory_lock ("IQMS")
+    LEADER_ELECTION_INTERVAL: int = 5
+    
+    # Кэш закодированных ответов статистики (секунды)
+    STATS_CACHE_TTL: int = 30
+    # Максимальный размер страницы списка измерений
+    MEASUREMENTS_PAGE_LIMIT: int = 1000
+    # Максимальный размер пачки измерений от агента
+    MEASUREMENTS_BATCH_LIMIT: int = 500
+    
+    # Холодное хранение: измерения старше HOT_RETENTION_DAYS переносятся
+    # из БД в Parquet (нужен extra "archive" - pyarrow)
+    ARCHIVE_URI: Optional[str] = None  # каталог или URI (file://, s3://); None - отключено
+    HOT_RETENTION_DAYS: int = 30
+    ARCHIVE_INTERVAL: int = 3600
+    ARCHIVE_MAX_DAYS_PER_RUN: int = 7
+    ARCHIVE_CHUNK_MINUTES: int = 60    # интервал, переносимый за один шаг (запись + DELETE)
+    
+    # Пересчет часовых агрегатов за последние часы при получении лидерства
+    # (измерения, записанные без агрегатов старыми репликами при выкатке); 0 - отключено
+    ROLLUP_REBUILD_HOURS: int = 2
+    
+    # Фоновые отчеты (долгие периоды): выполняются в leader-процессе
+    REPORT_WORKERS: int = 2                 # одновременно выполняемых отчетов
+    REPORT_STATEMENT_TIMEOUT: int = 300     # лимит запроса отчета, сек
+    REPORT_RESULT_TTL: int = 3600           # повторное использование готового отчета, сек
+    REPORT_RETENTION_DAYS: int = 7
+    REPORT_POLL_INTERVAL: int = 5
+    REPORT_ORPHAN_MARGIN: int = 60          # запас сверх REPORT_STATEMENT_TIMEOUT до возврата зависшего отчета в очередь, сек
+    # Лимит запросов интерактивной статистики, сек
+    STATS_STATEMENT_TIMEOUT: int = 10
+    
+    # Защита от перегрузки (лимиты действуют в каждом worker-процессе)
+    AGENT_RATE_LIMIT: float = 0.2       # устойчивый темп запросов агента, в секунду
+    AGENT_RATE_BURST: int = 10          # всплеск (отправка накопленной очереди)
+    INGEST_MAX_CONCURRENCY: int = 32    # одновременных запросов приема измерений
+    STATS_MAX_CONCURRENCY: int = 8      # одновременных запросов статистики
+    ADMISSION_QUEUE_TIMEOUT: float = 0.5  # ожидание свободного слота перед 503, сек
+    ADMISSION_RETRY_AFTER: int = 5
+
+    # Профилирование запросов: X-Profile вместе с X-ADMIN-KEY или доля всех запросов
+    PROFILE_SAMPLE_RATE: float = 0.0         # 0 - только по заголовку
+    PROFILE_SAMPLE_INTERVAL: float = 0.005   # период сэмплирования стека, сек
+    # Медленные запросы к БД сохраняются с планом EXPLAIN ANALYZE (только SELECT)
+    SLOW_QUERY_THRESHOLD: float = 1.0        # сек; 0 - отключено
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_EXPLAIN_INTERVAL: int = 300   # повторный EXPLAIN того же запроса, сек
+    SLOW_QUERY_LOG_SIZE: int = 50
+
+    # Централизованная конфигурация агентов (GET /agents/config с ETag)
+    AGENT_CONFIG_REFRESH_INTERVAL: int = 15  # проверка изменений от других реплик, сек
+    AGENT_CONFIG_LONG_POLL_MAX: int = 120    # предел ожидания изменений (wait), сек
+    AGENT_CONFIG_MAX_WAITERS: int = 5000     # ожидающих запросов в worker-процессе
+    AGENT_CONFIG_BUSY_RETRY_AFTER: int = 30  # Retry-After при превышении AGENT_CONFIG_MAX_WAITERS, сек
+    # Кэш проверки ключа агента для опроса конфигурации, сек; дольше
+    # AGENT_CONFIG_LONG_POLL_MAX, чтобы опросы подряд не ходили в БД
+    AGENT_AUTH_CACHE_TTL: int = 300
+
+    # Инциденты: одновременная деградация агентов одной группы
+    # (местоположение, сеть внешнего IP, тестовый сервер); считается в leader-процессе
+    CORRELATION_WINDOW: int = 1800           # окно состояния агентов, сек
+    CORRELATION_SILENCE: int = 900           # агент без измерений считается деградировавшим, сек
+    CORRELATION_ANOMALY_HOLD: int = 600      # аномалия агента учитывается как деградация, сек
+    CORRELATION_LOSS_THRESHOLD: float = 5.0  # потери, %
+    CORRELATION_MIN_AGENTS: int = 3          # минимум деградировавших агентов в группе
+    CORRELATION_RATIO: float = 0.5           # доля деградировавших агентов группы
+    CORRELATION_IPV4_PREFIX: int = 24
+    CORRELATION_IPV6_PREFIX: int = 48
+    CORRELATION_MAX_GROUPS: int = 10000
+    CORRELATION_INCIDENT_BUFFER: int = 500
+    CORRELATION_INCIDENT_SAMPLE: int = 20    # ID затронутых агентов в событии инцидента (полный список - в БД)
+    CORRELATION_INCIDENT_RETENTION_DAYS: int = 30
+    CORRELATION_SWEEP_INTERVAL: int = 60
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
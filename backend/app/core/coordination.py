@@ -0,0 +1,326 @@
+# app/core/coordination.py
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+from core.config import settings
+from core.logger import logger
+
+class WorkerBus:
+    """
+    Обмен сообщениями между worker-процессами одного хоста через
+    Unix datagram сокеты в общем каталоге (по сокету на процесс).
+    Доставка best-effort: сообщение теряется, если буфер получателя полон.
+    С подключенным ClusterBus сообщения доходят и до других реплик.
+    """
+
+    PEER_REFRESH_SECONDS = 5
+    MAX_MESSAGE_SIZE = 256 * 1024
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.path: Optional[Path] = None
+        self._sock: Optional[socket.socket] = None
+        self._handlers: Dict[str, List[Callable[[Dict], None]]] = {}
+        self._peers: List[str] = []
+        self._peers_refreshed = 0.0
+        self._cluster: Optional["ClusterBus"] = None
+
+    def attach(self, cluster: "ClusterBus") -> None:
+        """Пересылка сообщений worker'ам других хостов через ClusterBus"""
+        self._cluster = cluster
+        cluster.set_handler(self._deliver)
+
+    def subscribe(self, topic: str, handler: Callable[[Dict], None]) -> None:
+        """Обработчик сообщений от других worker'ов"""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"worker-{os.getpid()}.sock"
+        if self.path.exists():
+            self.path.unlink()
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self.path))
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+        logger.info(f"Worker bus listening on {self.path}")
+
+    def stop(self) -> None:
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        if self.path and self.path.exists():
+            self.path.unlink()
+
+    def _refresh_peers(self) -> None:
+        now = time.monotonic()
+        if now - self._peers_refreshed < self.PEER_REFRESH_SECONDS:
+            return
+        self._peers = [
+            str(peer) for peer in self.directory.glob("worker-*.sock")
+            if peer != self.path
+        ]
+        self._peers_refreshed = now
+
+    def publish(self, topic: str, payload: Dict, local: bool = False) -> None:
+        """Отправка сообщения всем остальным worker'ам (всех реплик; local - только своего хоста)"""
+        if self._cluster is not None and not local:
+            self._cluster.publish(topic, payload)
+        if self._sock is None:
+            return
+        self._refresh_peers()
+        data = json.dumps({"topic": topic, "payload": payload}, default=str).encode()
+        for peer in list(self._peers):
+            try:
+                self._sock.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Процесс завершился, сокет остался - убираем
+                self._peers.remove(peer)
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                logger.warning(f"Worker bus peer {peer} is busy, message dropped")
+            except OSError as e:
+                logger.error(f"Worker bus send to {peer} failed: {str(e)}")
+
+    def _on_readable(self) -> None:
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(self.MAX_MESSAGE_SIZE)
+            except BlockingIOError:
+                return
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            self._deliver(message.get("topic"), message.get("payload"))
+
+    def _deliver(self, topic: str, payload: Dict) -> None:
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Worker bus handler for {topic} failed: {str(e)}")
+
+class ClusterBus:
+    """
+    Обмен сообщениями между репликами (подами) через LISTEN/NOTIFY
+    PostgreSQL. WorkerBus доставляет сообщение worker'ам своего хоста,
+    ClusterBus - worker'ам остальных хостов: сообщения со своего хоста
+    при получении пропускаются. Каждый worker держит одно выделенное
+    соединение (вне пула SQLAlchemy); на нем же держится блокировка
+    лидера (LeaderLock). Сообщения копятся и отправляются пачками
+    (не больше CLUSTER_BUS_MAX_PAYLOAD байт на NOTIFY), доставка
+    best-effort, как у WorkerBus.
+    """
+
+    def __init__(self, channel: str, host: str):
+        self.channel = channel
+        self.host = host
+        self.connection = None
+        self.lock = asyncio.Lock()   # asyncpg не выполняет запросы на соединении параллельно
+        self._handler: Optional[Callable[[str, Dict], None]] = None
+        self._outbox: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Сообщения, не отправленные другим репликам (превышен размер, очередь полна)
+        self.dropped: Counter = Counter()
+
+    def set_handler(self, handler: Callable[[str, Dict], None]) -> None:
+        """Получатель сообщений других хостов (topic, payload)"""
+        self._handler = handler
+
+    async def start(self) -> None:
+        await self._connect()
+        self._task = asyncio.create_task(self._run(), name="cluster-bus")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self._flush()
+        except Exception as e:
+            logger.error(f"Cluster bus final flush failed: {str(e)}")
+        await self._close()
+
+    async def _connect(self) -> None:
+        import asyncpg
+        from sqlalchemy.engine import make_url
+
+        url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+        connection = await asyncpg.connect(url.render_as_string(hide_password=False))
+        await connection.add_listener(self.channel, self._on_notify)
+        # Обрыв соединения будит цикл отправки для переподключения
+        connection.add_termination_listener(lambda _: self._wakeup.set())
+        self.connection = connection
+        logger.info(f"Cluster bus listening on channel {self.channel} as {self.host}")
+
+    async def _close(self) -> None:
+        connection, self.connection = self.connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await connection.close(timeout=5)
+            except Exception:
+                connection.terminate()
+
+    @property
+    def connected(self) -> bool:
+        return self.connection is not None and not self.connection.is_closed()
+
+    def publish(self, topic: str, payload: Dict) -> None:
+        """Отправка сообщения worker'ам других хостов (в следующей пачке)"""
+        if self._task is None:
+            return
+        # ensure_ascii: длина строки равна размеру в байтах
+        message = json.dumps({"topic": topic, "payload": payload}, default=str)
+        if len(message) > self._max_message:
+            # Ошибка отправителя: события для других реплик должны быть компактными
+            self.dropped[f"oversized:{topic}"] += 1
+            logger.error(
+                f"Cluster bus message {topic} is too large ({len(message)} bytes, "
+                f"limit {self._max_message}), not delivered to other replicas"
+            )
+            return
+        if len(self._outbox) >= settings.CLUSTER_BUS_QUEUE_SIZE:
+            self.dropped[f"queue_full:{topic}"] += 1
+            logger.warning("Cluster bus queue is full, message dropped")
+            return
+        self._outbox.append(message)
+        self._wakeup.set()
+
+    def stats(self) -> Dict:
+        return {
+            "host": self.host,
+            "connected": self.connected,
+            "queued": len(self._outbox),
+            "dropped": dict(self.dropped),
+        }
+
+    @property
+    def _max_message(self) -> int:
+        # Конверт пачки: {"host": ..., "messages": [...]}
+        return settings.CLUSTER_BUS_MAX_PAYLOAD - len(json.dumps(self.host)) - 32
+
+    async def _flush(self) -> None:
+        while self._outbox and self.connected:
+            # Пачка сообщений в пределах ограничения NOTIFY (8000 байт)
+            batch, size = [], settings.CLUSTER_BUS_MAX_PAYLOAD - self._max_message
+            while self._outbox and size + len(self._outbox[0]) + 1 <= settings.CLUSTER_BUS_MAX_PAYLOAD:
+                message = self._outbox.popleft()
+                batch.append(message)
+                size += len(message) + 1
+            data = f'{{"host": {json.dumps(self.host)}, "messages": [{",".join(batch)}]}}'
+            async with self.lock:
+                await self.connection.execute("SELECT pg_notify($1, $2)", self.channel, data)
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                if not self.connected:
+                    await self._close()
+                    await self._connect()
+                attempt = 0
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                # Короткая пауза собирает сообщения одного всплеска в одну пачку
+                await asyncio.sleep(settings.CLUSTER_BUS_FLUSH_DELAY)
+                await self._flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                attempt += 1
+                delay = min(2 ** attempt, 30)
+                logger.error(f"Cluster bus failed: {str(e)}, reconnecting in {delay}s")
+                self._outbox.clear()
+                await self._close()
+                await asyncio.sleep(delay)
+
+    def _on_notify(self, connection, pid, channel, data: str) -> None:
+        try:
+            envelope = json.loads(data)
+        except ValueError:
+            return
+        if envelope.get("host") == self.host or self._handler is None:
+            return
+        for message in envelope.get("messages", []):
+            self._handler(message.get("topic"), message.get("payload"))
+
+class LeaderLock:
+    """
+    Выбор одного worker'а на весь кластер (все реплики) для singleton-задач
+    и обработчиков с общим состоянием: сессионная advisory-блокировка
+    PostgreSQL на выделенном соединении ClusterBus. При обрыве соединения
+    блокировка снимается сервером и лидерство сразу теряется, ее забирает
+    worker любой реплики при следующих выборах.
+    """
+
+    def __init__(self, bus: ClusterBus, key: int):
+        self.bus = bus
+        self.key = key
+        self._connection = None
+        self._on_acquire: List[Callable[[], Awaitable[None]]] = []
+
+    @property
+    def is_leader(self) -> bool:
+        return (
+            self._connection is not None
+            and self._connection is self.bus.connection
+            and not self._connection.is_closed()
+        )
+
+    def on_acquire(self, callback: Callable[[], Awaitable[None]]) -> None:
+        self._on_acquire.append(callback)
+
+    async def try_acquire(self) -> bool:
+        if self.is_leader:
+            return True
+        if self._connection is not None:
+            logger.warning(f"Worker {os.getpid()} lost leadership (cluster bus connection closed)")
+            self._connection = None
+        if not self.bus.connected:
+            return False
+
+        connection = self.bus.connection
+        async with self.bus.lock:
+            acquired = await connection.fetchval("SELECT pg_try_advisory_lock($1)", self.key)
+        if not acquired:
+            return False
+
+        self._connection = connection
+        logger.info(f"Worker {os.getpid()} on {self.bus.host} became leader")
+        for callback in self._on_acquire:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Leader acquire callback failed: {str(e)}")
+        return True
+
+    async def release(self) -> None:
+        if not self.is_leader:
+            self._connection = None
+            return
+        try:
+            async with self.bus.lock:
+                await self._connection.fetchval("SELECT pg_advisory_unlock($1)", self.key)
+        except Exception as e:
+            # Блокировка все равно снимется при закрытии соединения
+            logger.error(f"Leader release failed: {str(e)}")
+        self._connection = None
+
+worker_bus = WorkerBus(settings.WORKER_BUS_DIR)
+cluster_bus = ClusterBus(settings.CLUSTER_BUS_CHANNEL, settings.INSTANCE_ID or socket.gethostname())
+worker_bus.attach(cluster_bus)
+leader = LeaderLock(cluster_bus, settings.LEADER_LOCK_KEY)
@@ -0,0 +1,36 @@
+# app/core/events.py
+from typing import Callable, Dict, List, Tuple
+from core.coordination import leader, worker_bus
+from core.logger import logger
+
+EventHandler = Callable[[Dict], None]
+
+# event -> [(обработчик, только в leader-процессе)]
+_handlers: Dict[str, List[Tuple[EventHandler, bool]]] = {}
+
+def on(event: str, handler: EventHandler, leader_only: bool = False) -> None:
+    """
+    Подписка на событие приложения. Обработчик вызывается для событий
+    из всех worker'ов всех реплик; leader_only - только в leader-процессе кластера
+    (для обработчиков с общим состоянием, например детекторов аномалий)
+    """
+    _handlers.setdefault(event, []).append((handler, leader_only))
+
+def emit(event: str, data: Dict) -> None:
+    """Событие обрабатывается локально и рассылается остальным worker'ам (и репликам)"""
+    _dispatch(event, data)
+    worker_bus.publish("event", {"event": event, "data": data})
+
+def _dispatch(event: str, data: Dict) -> None:
+    for handler, leader_only in _handlers.get(event, []):
+        if leader_only and not leader.is_leader:
+            continue
+        try:
+            handler(data)
+        except Exception as e:
+            logger.error(f"Event handler for {event} failed: {str(e)}")
+
+def _on_bus_event(payload: Dict) -> None:
+    _dispatch(payload["event"], payload["data"])
+
+worker_bus.subscribe("event", _on_bus_event)
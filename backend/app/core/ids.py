@@ -0,0 +1,50 @@
+# app/core/ids.py
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+def uuid7(timestamp_ms: Optional[int] = None) -> uuid.UUID:
+    """
+    UUIDv7 (RFC 9562): 48 бит unix-времени в мс + счетчик + случайные биты.
+
+    ID упорядочены по времени создания, поэтому вставки в индекс
+    первичного ключа идут в конец B-дерева. Внутри одной миллисекунды
+    монотонность обеспечивает 12-битный счетчик (rand_a).
+
+    Args:
+        timestamp_ms: Время в мс (для исторических данных); без монотонности
+    """
+    global _last_ms, _counter
+    if timestamp_ms is not None:
+        return _build(timestamp_ms, int.from_bytes(os.urandom(2), "big") & 0xFFF)
+
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # Счетчик исчерпан - заимствуем следующую миллисекунду
+                _last_ms += 1
+                _counter = 0
+        timestamp_ms, counter = _last_ms, _counter
+    return _build(timestamp_ms, counter)
+
+def _build(timestamp_ms: int, counter: int) -> uuid.UUID:
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (
+        (timestamp_ms & ((1 << 48) - 1)) << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | rand_b
+    )
+    return uuid.UUID(int=value)
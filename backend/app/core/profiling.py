@@ -0,0 +1,322 @@
+# app/core/profiling.py
+import asyncio
+import contextvars
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+from sqlalchemy import event
+from core.config import settings
+from core.logger import logger
+
+# Профиль текущего запроса: виден в обработчиках событий SQLAlchemy
+# (контекст передается в greenlet'ы async-драйвера)
+current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+# Собственные запросы профилировщика (EXPLAIN) не попадают в журнал медленных
+capture_disabled: contextvars.ContextVar[bool] = contextvars.ContextVar("capture_disabled", default=False)
+
+# Длина текста запроса в отчетах и синтетических кадрах flamegraph
+STATEMENT_PREVIEW = 200
+SQL_FRAME_PREVIEW = 80
+
+class RequestProfile:
+    """Стеки и SQL-запросы одного профилируемого запроса"""
+    __slots__ = ("started", "samples", "sql", "sql_time", "lock")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.samples: Counter = Counter()  # свернутый стек -> число сэмплов
+        self.sql: List[tuple] = []          # (текст запроса, длительность)
+        self.sql_time = 0.0
+        self.lock = threading.Lock()
+
+class Profiler:
+    """
+    Профилирование запросов по требованию: сэмплирующий поток снимает
+    стек потока event loop (sys._current_frames) и относит сэмпл к запросу,
+    если в стеке есть кадр ProfilingMiddleware этого запроса. Сэмплы
+    отражают время CPU в event loop; ожидание БД добавляется во flamegraph
+    синтетическими кадрами [sql] по длительности запросов.
+
+    Агрегаты в памяти процесса: при нескольких worker'ах - в каждом свои
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._active: Dict[object, RequestProfile] = {}  # кадр middleware -> профиль
+        self._loop_thread: Optional[int] = None
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self.stacks: Counter = Counter()
+        self.routes: Dict[str, Dict] = {}
+        self.statements: Dict[str, Dict] = {}
+        self.since = datetime.utcnow()
+
+    def begin(self, frame) -> RequestProfile:
+        if self._thread is None:
+            self._loop_thread = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+        profile = RequestProfile()
+        self._active[frame] = profile
+        self._wakeup.set()
+        return profile
+
+    def end(self, frame, profile: RequestProfile, label: str) -> float:
+        """Завершение профиля запроса и перенос в агрегаты; возвращает длительность"""
+        self._active.pop(frame, None)
+        elapsed = time.perf_counter() - profile.started
+        with profile.lock:
+            samples = dict(profile.samples)
+        with self._lock:
+            for stack, count in samples.items():
+                self.stacks[f"{label};{stack}"] += count
+            for statement, duration in profile.sql:
+                frame_name = " ".join(statement.split())[:SQL_FRAME_PREVIEW].replace(";", ",")
+                weight = max(1, round(duration / self.interval))
+                self.stacks[f"{label};[sql] {frame_name}"] += weight
+                stats = self.statements.setdefault(
+                    statement[:STATEMENT_PREVIEW], {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+                )
+                stats["count"] += 1
+                stats["total_ms"] += duration * 1000
+                stats["max_ms"] = max(stats["max_ms"], duration * 1000)
+            route = self.routes.setdefault(
+                label, {"requests": 0, "total_ms": 0.0, "sql_ms": 0.0, "sql_queries": 0, "samples": 0}
+            )
+            route["requests"] += 1
+            route["total_ms"] += elapsed * 1000
+            route["sql_ms"] += profile.sql_time * 1000
+            route["sql_queries"] += len(profile.sql)
+            route["samples"] += sum(samples.values())
+        return elapsed
+
+    def _run(self) -> None:
+        while not self._stopped:
+            if not self._active:
+                self._wakeup.clear()
+                # Повторная проверка: begin() мог выполниться между проверкой и clear()
+                if not self._active:
+                    self._wakeup.wait()
+                continue
+            self._sample()
+            time.sleep(self.interval)
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            profile = self._active.get(frame)
+            if profile is not None:
+                with profile.lock:
+                    profile.samples[";".join(reversed(stack))] += 1
+                return
+            code = frame.f_code
+            name = getattr(code, "co_qualname", code.co_name)
+            stack.append(f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wakeup.set()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.routes.clear()
+            self.statements.clear()
+            self.since = datetime.utcnow()
+
+    def folded(self) -> str:
+        """Свернутые стеки (формат flamegraph.pl / speedscope / inferno)"""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 20) -> Dict:
+        with self._lock:
+            routes = {
+                label: {
+                    "requests": r["requests"],
+                    "avg_ms": round(r["total_ms"] / r["requests"], 2),
+                    "avg_sql_ms": round(r["sql_ms"] / r["requests"], 2),
+                    "avg_sql_queries": round(r["sql_queries"] / r["requests"], 2),
+                    "samples": r["samples"],
+                }
+                for label, r in self.routes.items()
+            }
+            statements = sorted(self.statements.items(), key=lambda item: -item[1]["total_ms"])[:top]
+            return {
+                "since": self.since.isoformat(),
+                "sample_interval_ms": self.interval * 1000,
+                "routes": routes,
+                "statements": [
+                    {
+                        "statement": statement,
+                        "count": s["count"],
+                        "total_ms": round(s["total_ms"], 2),
+                        "avg_ms": round(s["total_ms"] / s["count"], 2),
+                        "max_ms": round(s["max_ms"], 2),
+                    }
+                    for statement, s in statements
+                ],
+            }
+
+class SlowQueryLog:
+    """
+    Запросы дольше SLOW_QUERY_THRESHOLD с планом EXPLAIN ANALYZE.
+    План снимается в фоне отдельным соединением и только для SELECT
+    (EXPLAIN ANALYZE выполняет запрос повторно); один и тот же текст
+    запроса повторно анализируется не чаще SLOW_QUERY_EXPLAIN_INTERVAL
+    """
+
+    def __init__(self, threshold: float, size: int = 50):
+        self.threshold = threshold
+        self.entries: Deque[Dict] = deque(maxlen=size)
+        self._explained: Dict[str, float] = {}
+        self._tasks: set = set()
+        self._engine = None
+
+    def record(self, statement: str, parameters, duration: float) -> None:
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "duration_ms": round(duration * 1000, 2),
+            "statement": statement,
+            "plan": None,
+        }
+        self.entries.append(entry)
+        logger.warning(f"Slow query ({entry['duration_ms']} ms): {' '.join(statement.split())[:STATEMENT_PREVIEW]}")
+        if self._engine is None or not settings.SLOW_QUERY_EXPLAIN:
+            return
+        normalized = " ".join(statement.split()).upper()
+        if not normalized.startswith("SELECT") or " FOR UPDATE" in normalized:
+            return
+        now = time.monotonic()
+        if now - self._explained.get(statement, -settings.SLOW_QUERY_EXPLAIN_INTERVAL) < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+            return
+        if len(self._explained) > 1000:
+            self._explained = {
+                key: at for key, at in self._explained.items()
+                if now - at < settings.SLOW_QUERY_EXPLAIN_INTERVAL
+            }
+        self._explained[statement] = now
+        try:
+            task = asyncio.get_running_loop().create_task(self._explain(entry, statement, parameters))
+        except RuntimeError:
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, entry: Dict, statement: str, parameters) -> None:
+        # Отключаем захват, чтобы сам EXPLAIN не попал в журнал
+        token = capture_disabled.set(True)
+        try:
+            async with self._engine.connect() as conn:
+                timeout = int(max(self.threshold * 10, 5) * 1000)
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout}")
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}",
+                    tuple(parameters) if isinstance(parameters, list) else parameters
+                )
+                entry["plan"] = result.scalar()
+                # Соединение закрывается с откатом транзакции
+        except Exception as e:
+            entry["plan_error"] = str(e)
+        finally:
+            capture_disabled.reset(token)
+
+    def list(self) -> List[Dict]:
+        return list(reversed(self.entries))
+
+profiler = Profiler(settings.PROFILE_SAMPLE_INTERVAL)
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_THRESHOLD, settings.SLOW_QUERY_LOG_SIZE)
+
+def instrument_engine(engine) -> None:
+    """Замер длительности SQL-запросов через события движка"""
+    slow_query_log._engine = engine
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_started
+        profile = current_profile.get()
+        if profile is not None:
+            profile.sql.append((statement, duration))
+            profile.sql_time += duration
+        if (
+            slow_query_log.threshold
+            and duration >= slow_query_log.threshold
+            and not executemany
+            and not capture_disabled.get()
+        ):
+            slow_query_log.record(statement, parameters, duration)
+
+def _admin_requested(headers: List) -> bool:
+    """Профиль по заголовку X-Profile: только вместе с ключом администратора"""
+    requested = admin_key = None
+    for name, value in headers:
+        if name == b"x-profile":
+            requested = value
+        elif name == b"x-admin-key":
+            admin_key = value.decode("latin-1")
+    return (
+        requested is not None
+        and requested not in (b"0", b"false")
+        and bool(settings.ADMIN_SECRET)
+        and admin_key is not None
+        and secrets.compare_digest(admin_key, settings.ADMIN_SECRET)
+    )
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware: профилирует запросы с X-Profile (и X-ADMIN-KEY) или
+    долю PROFILE_SAMPLE_RATE всех запросов. Ответ профилируемого запроса
+    получает заголовок Server-Timing (общая длительность и время SQL)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            (settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE)
+            or _admin_requested(scope["headers"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        frame = sys._getframe()
+        profile = profiler.begin(frame)
+        token = current_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = (time.perf_counter() - profile.started) * 1000
+                timing = (
+                    f'app;dur={total:.1f}, '
+                    f'sql;dur={profile.sql_time * 1000:.1f};desc="{len(profile.sql)} queries"'
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            profiler.end(frame, profile, f"{scope['method']} {path}")
@@ -0,0 +1,90 @@
+# app/core/readiness.py
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+from core.config import settings
+from core.coordination import worker_bus
+from core.logger import logger
+
+class Readiness:
+    """
+    Готовность реплики принимать трафик (/health/ready): прогрев
+    выполняется в фоне после запуска каждого worker'а, до его завершения
+    и во время остановки readiness-проба получает 503 и балансировщик
+    не направляет запросы на холодную реплику.
+
+    Пробу принимает один из worker'ов, поэтому worker'ы хоста рассылают
+    свое состояние через WorkerBus: реплика готова, когда прогреты
+    все WEB_CONCURRENCY worker'ов
+    """
+
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], Awaitable]]] = []
+        self.checks: Dict[str, object] = {}
+        self.warmed = False
+        self.shutting_down = False
+        self._task = None
+        self._reporter = None
+        # pid worker'а -> (готов, время получения состояния)
+        self._peers: Dict[int, Tuple[bool, float]] = {}
+
+    def add_step(self, name: str, func: Callable[[], Awaitable]) -> None:
+        self._steps.append((name, func))
+        self.checks[name] = None
+
+    @property
+    def ready(self) -> bool:
+        """Готовность этого worker'а"""
+        return self.warmed and not self.shutting_down
+
+    def ready_workers(self) -> int:
+        """Прогретые worker'ы хоста (включая этот) по свежим состояниям"""
+        horizon = time.monotonic() - settings.READINESS_REPORT_INTERVAL * 3
+        for pid, (_, received) in list(self._peers.items()):
+            if received < horizon:
+                del self._peers[pid]   # worker завершился
+        return sum(1 for ready, _ in self._peers.values() if ready) + (1 if self.ready else 0)
+
+    @property
+    def host_ready(self) -> bool:
+        return self.ready and self.ready_workers() >= settings.WEB_CONCURRENCY
+
+    def on_peer_state(self, payload: Dict) -> None:
+        """Состояние другого worker'а хоста"""
+        self._peers[payload["pid"]] = (payload["ready"], time.monotonic())
+
+    def _publish(self) -> None:
+        worker_bus.publish("readiness.state", {"pid": os.getpid(), "ready": self.ready}, local=True)
+
+    async def _report(self) -> None:
+        while True:
+            self._publish()
+            await asyncio.sleep(settings.READINESS_REPORT_INTERVAL)
+
+    async def _warm_up(self, retry_delay: float) -> None:
+        for name, func in self._steps:
+            while True:
+                try:
+                    self.checks[name] = await func()
+                    break
+                except Exception as e:
+                    logger.warning(f"Warm-up step {name} failed, retrying in {retry_delay}s: {e}")
+                    await asyncio.sleep(retry_delay)
+        self.warmed = True
+        self._publish()
+        logger.info(f"Worker ready: {self.checks}")
+
+    def start(self, retry_delay: float = 5.0) -> None:
+        self._task = asyncio.create_task(self._warm_up(retry_delay))
+        self._reporter = asyncio.create_task(self._report())
+
+    def stop(self) -> None:
+        self.shutting_down = True
+        for task in (self._task, self._reporter):
+            if task and not task.done():
+                task.cancel()
+        self._publish()
+
+readiness = Readiness()
+worker_bus.subscribe("readiness.state", readiness.on_peer_state)
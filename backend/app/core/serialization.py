@@ -0,0 +1,40 @@
+# app/core/serialization.py
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Hashable
+import orjson
+from fastapi.responses import Response
+from core.cache import TTLCache
+from core.config import settings
+
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _default(value: Any) -> Any:
+    # func.avg/sum по numeric-колонкам возвращают Decimal
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(data: Any) -> bytes:
+    """Быстрая сериализация в JSON (datetime, UUID, dataclass - нативно)"""
+    return orjson.dumps(data, default=_default, option=JSON_OPTIONS)
+
+class JSONBytesResponse(Response):
+    """Ответ с уже закодированным JSON (без повторной валидации и кодирования)"""
+    media_type = "application/json"
+
+# Готовые байты ответов статистики: повторные запросы за окно TTL
+# не обращаются к БД и не сериализуют результат заново
+stats_cache = TTLCache("stats", ttl=settings.STATS_CACHE_TTL, max_entries=256)
+
+async def cached_json(
+    cache: TTLCache,
+    key: Hashable,
+    producer: Callable[[], Awaitable[Any]]
+) -> JSONBytesResponse:
+    """Ответ из кэша закодированных байтов либо producer() + кэширование"""
+    body = cache.get(key)
+    if body is not None:
+        return JSONBytesResponse(body, headers={"X-Cache": "HIT"})
+    body = dumps(await producer())
+    cache.set(key, body)
+    return JSONBytesResponse(body, headers={"X-Cache": "MISS"})
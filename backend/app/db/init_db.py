@@ -1,32 +1,64 @@
 # app/db/init_db.py
+from pathlib import Path
+from typing import Set
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from db.session import engine, Base
 from core.logger import logger
 
+# Каталог миграций Alembic (backend/alembic)
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "alembic"
+
+class SchemaVersionError(RuntimeError):
+    """Схема БД не совпадает с последней миграцией кода"""
+
+def expected_revisions() -> Set[str]:
+    """Головные ревизии миграций, с которыми работает этот код"""
+    from alembic.script import ScriptDirectory
+    return set(ScriptDirectory(str(MIGRATIONS_DIR)).get_heads())
+
+async def current_revisions() -> Set[str]:
+    async with engine.connect() as conn:
+        exists = await conn.scalar(text("SELECT to_regclass('alembic_version') IS NOT NULL"))
+        if not exists:
+            return set()
+        return set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars())
+
+async def verify_schema_version() -> None:
+    """
+    Проверка версии схемы при запуске вместо create_all: миграции
+    применяются заранее (alembic upgrade head - job перед выкаткой),
+    реплика со схемой другой версии не запускается
+    """
+    expected = expected_revisions()
+    current = await current_revisions()
+    if current != expected:
+        raise SchemaVersionError(
+            f"Database schema revision {sorted(current) or 'none'} does not match "
+            f"{sorted(expected)}, run 'alembic upgrade head'"
+        )
+    logger.info(f"Database schema revision {', '.join(sorted(current))}")
+
 async def create_db_tables():
-    """Асинхронное создание таблиц с обработкой ошибок"""
+    """
+    Создание таблиц по моделям на пустой БД с отметкой последней ревизии
+    (бенчмарки и локальные эксперименты; в остальных случаях - alembic upgrade head)
+    """
     try:
         async with engine.begin() as conn:
-            # Создание стандартных таблиц
             await conn.run_sync(Base.metadata.create_all)
-            
-            # Установка расширений TimescaleDB
-            # await conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb CASCADE"))
-            
-            # Преобразование таблицы measurements в гипертаблицу TimescaleDB
-            # import pdb; pdb.set_trace()
-            # await conn.execute(text("""
-            #     SELECT create_hypertable(
-            #         'measurements', 
-            #         'timestamp',
-            #         if_not_exists => TRUE,
-            #         chunk_time_interval => INTERVAL '1 week'
-            #     )
-            # """))
-            
+            await conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS alembic_version ("
+                "version_num VARCHAR(32) NOT NULL PRIMARY KEY)"
+            ))
+            await conn.execute(text("DELETE FROM alembic_version"))
+            for revision in expected_revisions():
+                await conn.execute(
+                    text("INSERT INTO alembic_version (version_num) VALUES (:revision)"),
+                    {"revision": revision}
+                )
             logger.info("Database tables created successfully")
-            
+
     except SQLAlchemyError as e:
         logger.error(f"Error creating database tables: {str(e)}")
         raise
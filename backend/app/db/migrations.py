@@ -0,0 +1,289 @@
+# app/db/migrations.py
+"""
+Помощники для online-миграций Alembic (большая таблица measurements)
+
+Правила, которые они реализуют:
+- индексы создаются CONCURRENTLY (без блокировки записи), для
+  секционированных таблиц - по секциям с последующим ATTACH;
+- DDL, которому нужна ACCESS EXCLUSIVE блокировка, выполняется с коротким
+  lock_timeout и повторами, чтобы не вставать в очередь перед ingest;
+- заполнение данных идет пачками по ключу, каждая пачка - отдельная
+  транзакция, с паузой между пачками;
+- NOT NULL на заполненной колонке ставится через проверенный CHECK,
+  без сканирования таблицы под ACCESS EXCLUSIVE.
+
+Все функции вызываются внутри upgrade()/downgrade() миграции.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Sequence
+from alembic import op
+from sqlalchemy import text
+from core.logger import logger
+
+# --- Общие проверки ---
+
+def _scalar(sql: str, **params):
+    return op.get_bind().execute(text(sql), params).scalar()
+
+def is_partitioned(table: str) -> bool:
+    """Таблица секционирована (PARTITION BY)"""
+    return bool(_scalar(
+        """
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :table
+        """,
+        table=table
+    ))
+
+def partitions(table: str) -> List[str]:
+    """Секции таблицы (по имени)"""
+    result = op.get_bind().execute(text(
+        """
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table
+        ORDER BY child.relname
+        """
+    ), {"table": table})
+    return [row[0] for row in result]
+
+def index_state(name: str) -> Optional[bool]:
+    """None - индекса нет, False - невалидный (прерванный CONCURRENTLY), True - готов"""
+    return _scalar(
+        """
+        SELECT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name
+        """,
+        name=name
+    )
+
+# --- Блокировки ---
+
+def run_with_lock_timeout(
+    statements: Sequence[str],
+    lock_timeout: str = "2s",
+    retries: int = 10,
+    retry_delay: float = 5.0
+) -> None:
+    """
+    Выполнение DDL с коротким lock_timeout и повторами в отдельной транзакции.
+
+    ALTER TABLE ждет ACCESS EXCLUSIVE блокировку; пока он ждет, все новые
+    запросы к таблице (включая вставки агентов) встают в очередь за ним.
+    С lock_timeout ожидание ограничено, а при неудаче попытка повторяется.
+    """
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for attempt in range(1, retries + 1):
+            try:
+                bind.execute(text("BEGIN"))
+                bind.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+                for statement in statements:
+                    bind.execute(text(statement))
+                bind.execute(text("COMMIT"))
+                return
+            except Exception as e:
+                bind.execute(text("ROLLBACK"))
+                if "lock timeout" not in str(e) or attempt == retries:
+                    raise
+                logger.warning(f"Lock timeout (attempt {attempt}/{retries}), retrying in {retry_delay}s")
+                time.sleep(retry_delay)
+
+# --- Ограничения ---
+
+def constraint_exists(table: str, name: str) -> bool:
+    return bool(_scalar(
+        """
+        SELECT 1 FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        WHERE c.relname = :table AND con.conname = :name
+        """,
+        table=table,
+        name=name
+    ))
+
+def validate_not_null(table: str, column: str) -> str:
+    """
+    Подготовка SET NOT NULL без полного сканирования под ACCESS EXCLUSIVE:
+    CHECK (column IS NOT NULL) NOT VALID (короткая блокировка), затем
+    VALIDATE CONSTRAINT в отдельной транзакции (SHARE UPDATE EXCLUSIVE -
+    запись не блокируется). После этого ALTER COLUMN ... SET NOT NULL
+    (PostgreSQL 12+) использует проверенное ограничение и не сканирует
+    таблицу. Возвращает имя ограничения - его удаляют после SET NOT NULL.
+
+    Новые строки сразу проверяются ограничением, поэтому до вызова
+    колонка должна заполняться и при вставке (триггер или приложение)
+    """
+    name = f"{table}_{column}_not_null"[:63]
+    with op.get_context().autocommit_block():
+        exists = constraint_exists(table, name)
+    if not exists:
+        run_with_lock_timeout([
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({column} IS NOT NULL) NOT VALID"
+        ])
+    run_with_lock_timeout([f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}"])
+    return name
+
+# --- Индексы ---
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Iterable[str],
+    unique: bool = False,
+    where: Optional[str] = None
+) -> None:
+    """
+    CREATE INDEX CONCURRENTLY, идемпотентно: невалидный индекс от
+    прерванной попытки удаляется и строится заново.
+
+    Для секционированной таблицы CONCURRENTLY на родителе недоступен,
+    поэтому: индекс ON ONLY на родителе (невалидный), CONCURRENTLY на
+    каждой секции, затем ATTACH PARTITION - после последней секции
+    родительский индекс становится валидным.
+    """
+    column_sql = ", ".join(columns)
+    unique_sql = "UNIQUE " if unique else ""
+    where_sql = f" WHERE {where}" if where else ""
+
+    with op.get_context().autocommit_block():
+        if not is_partitioned(table):
+            _build_concurrently(name, f"{unique_sql}INDEX CONCURRENTLY {name} ON {table} ({column_sql}){where_sql}")
+            return
+
+        op.execute(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON ONLY {table} ({column_sql}){where_sql}")
+        for partition in partitions(table):
+            child = f"{partition}_{name}"[:63]
+            _build_concurrently(
+                child,
+                f"{unique_sql}INDEX CONCURRENTLY {child} ON {partition} ({column_sql}){where_sql}"
+            )
+            attached = _scalar(
+                """
+                SELECT 1 FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE c.relname = :child
+                """,
+                child=child
+            )
+            if not attached:
+                op.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+def _build_concurrently(name: str, create_sql: str) -> None:
+    state = index_state(name)
+    if state:
+        return
+    if state is False:
+        logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    logger.info(f"Building index {name} concurrently")
+    op.execute(f"CREATE {create_sql}")
+
+def drop_index_concurrently(name: str) -> None:
+    """DROP INDEX CONCURRENTLY (для индексов несекционированных таблиц)"""
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+# --- Заполнение данных ---
+
+def batched_backfill(
+    table: str,
+    set_sql: str,
+    where: str,
+    key: str = "id",
+    batch_size: int = 5000,
+    pause: float = 0.1
+) -> int:
+    """
+    UPDATE большой таблицы пачками по ключу (keyset), каждая пачка в своей
+    транзакции: блокировки строк короткие, autovacuum успевает за
+    изменениями, прерванный backfill можно просто запустить снова
+    (условие where должно исключать уже обработанные строки)
+
+    Args:
+        set_sql: SET-часть, например "id_new = id::uuid"
+        where: строки, которые еще нужно обработать, например "id_new IS NULL"
+        pause: пауза между пачками (сек) - ограничение нагрузки на БД
+    """
+    total = 0
+    last = None
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            after = f"AND {key} > :last" if last is not None else ""
+            result = bind.execute(text(
+                f"""
+                WITH batch AS (
+                    SELECT {key} FROM {table}
+                    WHERE ({where}) {after}
+                    ORDER BY {key}
+                    LIMIT :limit
+                )
+                UPDATE {table} t SET {set_sql}
+                FROM batch WHERE t.{key} = batch.{key}
+                RETURNING t.{key}
+                """
+            ), {"last": last, "limit": batch_size})
+            keys = [row[0] for row in result]
+            if not keys:
+                break
+            total += len(keys)
+            last = max(keys)
+            logger.info(f"Backfill {table}: {total} rows")
+            time.sleep(pause)
+    return total
+
+def backfill_by_time(
+    sql: str,
+    start: datetime,
+    end: datetime,
+    step: timedelta = timedelta(days=1),
+    pause: float = 0.5
+) -> None:
+    """
+    Выполнение INSERT ... SELECT / UPDATE по окнам времени (:start, :end),
+    каждое окно - отдельная транзакция
+    """
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        window_start = start
+        while window_start < end:
+            window_end = min(window_start + step, end)
+            bind.execute(text(sql), {"start": window_start, "end": window_end})
+            logger.info(f"Backfill window {window_start} - {window_end} done")
+            window_start = window_end
+            time.sleep(pause)
+
+# --- Секции ---
+
+def create_time_partitions(
+    table: str,
+    start: datetime,
+    months: int,
+    suffix_format: str = "%Y%m"
+) -> List[str]:
+    """
+    Создание месячных секций RANGE-секционированной таблицы заранее
+    (CREATE TABLE ... PARTITION OF не блокирует запись в другие секции)
+    """
+    created = []
+    month_start = datetime(start.year, start.month, 1)
+    for _ in range(months):
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        name = f"{table}_{month_start.strftime(suffix_format)}"
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        created.append(name)
+        month_start = next_month
+    return created
+
+def detach_partition_concurrently(table: str, partition: str) -> None:
+    """Отсоединение старой секции без блокировки родителя (PostgreSQL 14+)"""
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {table} DETACH PARTITION {partition} CONCURRENTLY")
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Float, String, DateTime, JSON, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Float, String, DateTime, JSON, Boolean, Integer, Uuid
+from core.ids import uuid7
 from db.session import Base
 
 class Measurement(Base):
     __tablename__ = "measurements"
     
-    id = Column(String, primary_key=True, index=True)
+    # UUIDv7 от агента: упорядочен по времени, вставки идут в конец индекса
+    id = Column(Uuid, primary_key=True, default=uuid7)
     timestamp = Column(DateTime, index=True)
     agent_id = Column(String, index=True)
     latency = Column(Float)
@@ -20,5 +23,110 @@ class Agent(Base):
     id = Column(String, primary_key=True, index=True)
     name = Column(String)
     location = Column(String)
+    api_key = Column(String, unique=True, index=True)
     is_active = Column(Boolean, default=True)
     last_seen = Column(DateTime)
+    test_interval = Column(Integer, default=300)  # Ожидаемый интервал измерений, сек
+    tags = Column(JSON, default=list)             # Произвольные группы: офис, провайдер и т.п.
+    created_at = Column(DateTime, default=datetime.utcnow)
+    resource_metrics = Column(JSON)               # Последняя сводка ресурсов агента (X-Agent-Metrics)
+    resource_reported_at = Column(DateTime)
+
+class AgentGroupMember(Base):
+    __tablename__ = "agent_group_members"
+    
+    # "location:<город>" или "tag:<тег>" - поддерживается при изменении агента
+    group_key = Column(String, primary_key=True)
+    agent_id = Column(String, primary_key=True, index=True)
+
+class HourlyRollup(Base):
+    __tablename__ = "measurement_rollups_hourly"
+    
+    # Частичные агрегаты агента за час, обновляются при приеме измерений
+    agent_id = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True, index=True)
+    measurement_count = Column(Integer, nullable=False, default=0)
+    latency_sum = Column(Float)
+    latency_count = Column(Integer)
+    download_sum = Column(Float)
+    download_count = Column(Integer)
+    download_min = Column(Float)
+    download_max = Column(Float)
+    upload_sum = Column(Float)
+    upload_count = Column(Integer)
+    packet_loss_sum = Column(Float)
+    packet_loss_count = Column(Integer)
+    jitter_sum = Column(Float)
+    jitter_count = Column(Integer)
+
+class DetectorState(Base):
+    __tablename__ = "detector_states"
+    
+    agent_id = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    state = Column(JSON)      # Состояние EWMA/CUSUM детектора
+    updated_at = Column(DateTime)
+
+class Anomaly(Base):
+    __tablename__ = "anomalies"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime, index=True)
+    agent_id = Column(String, index=True)
+    metric = Column(String)
+    value = Column(Float)
+    baseline = Column(Float)  # Значение EWMA на момент срабатывания
+    deviation = Column(Float) # Отклонение в стандартных отклонениях
+    direction = Column(String)  # up / down
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+    
+    id = Column(Uuid, primary_key=True, default=uuid7)
+    params_hash = Column(String, index=True)  # Одинаковые параметры - один отчет
+    params = Column(JSON)
+    status = Column(String, index=True, default="pending")  # pending / running / done / failed
+    result = Column(JSON)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class NetworkPath(Base):
+    __tablename__ = "network_paths"
+    
+    # Уникальные маршруты агента: в измерении остается только path_hash
+    # и RTT/потери по хопам, список адресов хранится здесь один раз
+    agent_id = Column(String, primary_key=True)
+    path_hash = Column(String, primary_key=True)
+    target = Column(String)
+    hops = Column(JSON)       # Адреса по TTL, None - хоп не ответил
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime, index=True)
+    seen_count = Column(Integer, nullable=False, default=0)
+
+class AgentConfigScope(Base):
+    __tablename__ = "agent_configs"
+    
+    # "global", "location:<город>", "tag:<тег>" или "agent:<id>";
+    # итоговая конфигурация агента - слияние в этом порядке
+    scope = Column(String, primary_key=True)
+    settings = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class Incident(Base):
+    __tablename__ = "incidents"
+    
+    # Инциденты корреляции (пишет leader): события на шине несут только
+    # сводку, полный список затронутых агентов хранится здесь
+    id = Column(Uuid, primary_key=True)
+    group = Column(String, index=True)   # "location:<город>", "prefix:<сеть>", "server:<хост>"
+    kind = Column(String)
+    status = Column(String, index=True)  # open / resolved
+    opened_at = Column(DateTime)
+    closed_at = Column(DateTime)
+    agents_in_group = Column(Integer)
+    peak_agents = Column(Integer)
+    reasons = Column(JSON)
+    affected_agents = Column(JSON)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,10 +1,12 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field, validator
+from typing import Any, Dict, List, Literal, Optional
+from uuid import UUID
+from pydantic import BaseModel, ConfigDict, Field
 
 class AgentBase(BaseModel):
-    name: str = Field(..., example="Home Router")
-    location: Optional[str] = Field(None, example="New York, USA")
+    name: str = Field(..., examples=["Home Router"])
+    location: Optional[str] = Field(None, examples=["New York, USA"])
+    tags: List[str] = Field(default_factory=list, examples=[["office-hq", "isp-a"]])
     is_active: bool = Field(default=True)
 
 class AgentCreate(AgentBase):
@@ -15,34 +17,164 @@ class AgentUpdate(BaseModel):
     """Схема для обновления агента"""
     name: Optional[str] = None
     location: Optional[str] = None
+    tags: Optional[List[str]] = None
     is_active: Optional[bool] = None
 
 class AgentOut(AgentBase):
     """Схема для вывода данных агента"""
     id: str
     api_key: str
-    created_at: datetime
+    created_at: Optional[datetime]
     last_seen: Optional[datetime]
+    tags: Optional[List[str]] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class MeasurementBase(BaseModel):
-    latency: float = Field(..., ge=0, example=25.4)
-    download: float = Field(..., ge=0, example=78.2)
-    upload: float = Field(..., ge=0, example=32.1)
-    packet_loss: float = Field(..., ge=0, le=100, example=0.5)
-    jitter: float = Field(..., ge=0, example=3.2)
+    # None - проба не удалась на стороне агента
+    latency: Optional[float] = Field(..., ge=0, examples=[25.4])
+    download: Optional[float] = Field(..., ge=0, examples=[78.2])
+    upload: Optional[float] = Field(..., ge=0, examples=[32.1])
+    packet_loss: Optional[float] = Field(..., ge=0, le=100, examples=[0.5])
+    jitter: Optional[float] = Field(..., ge=0, examples=[3.2])
 
 class MeasurementCreate(MeasurementBase):
     """Схема для создания измерения"""
-    agent_id: str = Field(..., example="agent-123")
+    # ID (UUIDv7) и время измерения задает агент; повторная отправка
+    # с тем же ID игнорируется
+    id: Optional[UUID] = Field(None, examples=["01929b5e-7c1a-7d3e-8f2a-3b4c5d6e7f80"])
+    timestamp: Optional[datetime] = None
+    agent_id: str = Field(..., examples=["agent-123"])
+    metainfo: Optional[dict] = Field(None, examples=[{"test_server": "https://httpbin.org"}])
 
 class MeasurementOut(MeasurementCreate):
     """Схема для вывода измерения"""
-    id: str
+    id: UUID
+    timestamp: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class MeasurementEvent(MeasurementBase):
+    """
+    Сводка измерения для событий (шина между репликами, живая лента):
+    без metainfo, чтобы событие укладывалось в одно сообщение NOTIFY.
+    Полное измерение - GET /measurements/{id}
+    """
+    id: UUID
     timestamp: datetime
-    metadata: dict = {}
+    agent_id: str
+    location: Optional[str] = None
+    external_ip: Optional[str] = None
+    test_server: Optional[str] = None
+    targets_only: bool = False   # только результаты опроса целей (при остановке агента)
+
+class ReportRequest(BaseModel):
+    """Параметры фонового отчета"""
+    # Период: time_range или явные границы since/until
+    time_range: Optional[str] = Field(None, pattern="^(1h|24h|7d|30d|90d|365d)$", examples=["30d"])
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    group_by: Literal["global", "agent", "location", "tag"] = "global"
+    interval: Optional[Literal["hour", "day"]] = None
+    metrics: Optional[List[Literal["latency", "download", "upload", "packet_loss", "jitter"]]] = None
+
+class ReportJobOut(BaseModel):
+    """Состояние фонового отчета"""
+    id: UUID
+    status: str
+    params: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class IncidentOut(BaseModel):
+    """Инцидент корреляции с полным списком затронутых агентов"""
+    id: UUID
+    group: str
+    kind: str
+    status: str
+    opened_at: datetime
+    closed_at: Optional[datetime] = None
+    agents_in_group: int
+    peak_agents: int
+    reasons: Dict[str, int]
+    affected_agents: List[str]
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class AgentTargetSettings(BaseModel):
+    """Цель мониторинга агента (targets) - как TargetConfig агента"""
+    name: str = Field(..., min_length=1)
+    host: str = Field(..., min_length=1)
+    probes: List[Literal["http", "ping", "tcp", "dns"]] = Field(default_factory=lambda: ["http"], min_length=1)
+    interval: Optional[int] = Field(None, ge=10)
+    count: int = Field(3, ge=1, le=20)
+    port: Optional[int] = Field(None, ge=1, le=65535)
+    dns_server: Optional[str] = None
+    query: Optional[str] = None
+
+    model_config = ConfigDict(extra="forbid")
+
+class ManagedAgentSettings(BaseModel):
+    """
+    Параметры агента, которыми можно управлять централизованно: типы и
+    диапазоны - как в AgentConfig агента. Заданный параметр не может быть
+    null (значение по умолчанию - только для отсутствующих ключей)
+    """
+    test_interval: int = Field(None, ge=60)
+    test_server: str = Field(None, pattern="^https?://")
+    test_timeout: int = Field(None, ge=1)
+    schedule_jitter: float = Field(None, ge=0, le=1)
+    dns_test_hostname: str = Field(None, min_length=1)
+    mtu_test_host: str = Field(None, min_length=1)
+    adaptive_scheduling: bool = None
+    link_busy_threshold: float = Field(None, ge=0, le=1)
+    link_defer_threshold: float = Field(None, ge=0, le=1)
+    max_throughput_defer: int = Field(None, ge=0)
+    adaptive_min_interval: int = Field(None, ge=10)
+    adaptive_max_factor: float = Field(None, ge=1)
+    degradation_latency_factor: float = Field(None, gt=1)
+    degradation_loss: float = Field(None, ge=0, le=100)
+    boost_duration: int = Field(None, ge=0)
+    path_probe_enabled: bool = None
+    path_latency_threshold: float = Field(None, ge=0)
+    path_loss_threshold: float = Field(None, ge=0, le=100)
+    path_max_hops: int = Field(None, ge=1, le=64)
+    targets: List[AgentTargetSettings] = None
+    max_concurrent_probes: int = Field(None, ge=1)
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = None
+    max_retries: int = Field(None, ge=0)
+    retry_delay: int = Field(None, ge=0)
+    retry_max_delay: int = Field(None, ge=0)
+    enable_detailed_metrics: bool = None
+    data_retention_days: int = Field(None, ge=1)
+
+    model_config = ConfigDict(extra="forbid")
+
+class AgentConfigIn(BaseModel):
+    """Параметры агента для области (global, location:..., tag:..., agent:...)"""
+    settings: Dict[str, Any] = Field(..., examples=[{"test_interval": 600, "test_server": "https://speed.example.com"}])
+
+class AgentConfigOut(AgentConfigIn):
+    scope: str
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class AgentResourceMetrics(BaseModel):
+    """Сводка ресурсов агента (заголовок X-Agent-Metrics); неизвестные поля отбрасываются"""
+    cpu_s: Optional[float] = Field(None, ge=0)
+    cpu_pct: Optional[float] = Field(None, ge=0)
+    rss_mb: Optional[float] = Field(None, ge=0)
+    sockets: Optional[int] = Field(None, ge=0)
+    outbox: Optional[int] = Field(None, ge=0)
+    upload_ms: Optional[float] = Field(None, ge=0)
+    cycle_ms: Optional[float] = Field(None, ge=0)
+    probe_ms: Optional[Dict[str, float]] = Field(None, max_length=32)
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(allow_inf_nan=False)
@@ -1,3 +1,5 @@
+import asyncio
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from core.config import settings
@@ -7,7 +9,9 @@ Base = declarative_base()
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,  # Включить для отладки SQL-запросов
-    future=True
+    future=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
 )
 
 async_session = sessionmaker(
@@ -18,20 +22,34 @@ async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
 
-async def create_db_tables():
-    """Создает все таблицы в базе данных"""
-    async with engine.begin() as conn:
-        # Для production используйте миграции Alembic вместо этого!
-        await conn.run_sync(Base.metadata.create_all)
-        
-    # Опционально: создание индексов
-    async with async_session() as session:
-        await session.execute("""
-            CREATE INDEX IF NOT EXISTS idx_measurements_agent_id 
-            ON measurements (agent_id);
-        """)
-        await session.execute("""
-            CREATE INDEX IF NOT EXISTS idx_measurements_timestamp 
-            ON measurements (timestamp);
-        """)
-        await session.commit()
+async def set_statement_timeout(db: AsyncSession, seconds: float) -> None:
+    """Лимит времени запросов до конца текущей транзакции (SET LOCAL)"""
+    await db.execute(text(f"SET LOCAL statement_timeout = {int(seconds * 1000)}"))
+
+async def warm_pool(connections: int) -> int:
+    """
+    Открытие соединений пула заранее (одновременно, чтобы пул вырос
+    до connections); возвращает число открытых соединений
+    """
+    async def touch():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    results = await asyncio.gather(
+        *(touch() for _ in range(min(connections, settings.DB_POOL_SIZE))),
+        return_exceptions=True
+    )
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        raise failed[0]
+    return len(results)
+
+def pool_status() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
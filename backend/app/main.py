@@ -1,19 +1,139 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from api.v1.api import api_router
 from core.config import settings
-from db.init_db import create_db_tables
+from core import events
+from core.background import register_periodic, start_background_jobs, stop_background_jobs
+from core.coordination import cluster_bus, leader, worker_bus
+from core.profiling import ProfilingMiddleware, instrument_engine, profiler
+from core.readiness import readiness
+from db.init_db import verify_schema_version
+from db.session import async_session, engine, warm_pool
+from services.agent_config_service import agent_config_store
+from services.anomaly_service import (
+    anomaly_detector,
+    restore_anomaly_detector,
+    checkpoint_anomaly_detector
+)
+from services.archive_service import archive_old_measurements
+from services.broadcast_service import broadcast_hub
+from services.correlation_service import correlation_index, sweep_correlation_index
+from services.liveness_service import restore_liveness_tracker, flush_liveness_tracker
+from services.report_service import delete_old_reports, report_pool, requeue_orphaned_reports
+from services.rollup_service import rebuild_recent_rollups
+from services.stats_service import warm_stats_cache
 
 app = FastAPI(
     title="Internet Monitor API",
     description="Distributed internet quality monitoring system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# Профилирование по требованию и журнал медленных запросов
+app.add_middleware(ProfilingMiddleware)
+instrument_engine(engine)
+
+async def elect_leader():
+    await leader.try_acquire()
+
+async def warm_stats():
+    async with async_session() as db:
+        return await warm_stats_cache(db)
+
 @app.on_event("startup")
 async def startup():
-    await create_db_tables()
+    # Схема только проверяется: миграции применяются до выкатки (alembic upgrade head)
+    await verify_schema_version()
+    worker_bus.start()
+    await cluster_bus.start()
+
+    # Детекторы аномалий работают только в leader-процессе:
+    # состояние восстанавливается из чекпоинта при получении лидерства
+    leader.on_acquire(restore_anomaly_detector)
+    leader.on_acquire(requeue_orphaned_reports)
+    leader.on_acquire(rebuild_recent_rollups)
+    events.on("measurement", anomaly_detector.observe, leader_only=True)
+    anomaly_detector.add_listener(lambda event: events.emit("anomaly", event))
+    events.on("anomaly", anomaly_detector.remember)
+
+    # Общие инциденты по группам агентов - тоже в leader-процессе,
+    # список инцидентов - в каждом worker'е
+    events.on("measurement", correlation_index.observe, leader_only=True)
+    events.on("anomaly", correlation_index.observe_anomaly, leader_only=True)
+    correlation_index.add_listener(lambda incident: events.emit("incident", incident))
+    events.on("incident", correlation_index.remember)
+
+    # Живая лента в каждом worker'е получает события всех worker'ов
+    events.on("measurement", lambda m: broadcast_hub.publish("measurement", m, m["agent_id"]))
+    events.on("anomaly", lambda a: broadcast_hub.publish("anomaly", a, a["agent_id"]))
+    events.on("rollup", lambda r: broadcast_hub.publish("rollup", r, r["agent_id"]))
+    events.on("incident", lambda i: broadcast_hub.publish("incident", i))
+
+    await elect_leader()
+    await restore_liveness_tracker()
+
+    register_periodic("leader-election", settings.LEADER_ELECTION_INTERVAL, elect_leader)
+    register_periodic(
+        "anomaly-checkpoint",
+        settings.ANOMALY_CHECKPOINT_INTERVAL,
+        checkpoint_anomaly_detector,
+        run_on_shutdown=True,
+        singleton=True
+    )
+    if settings.ARCHIVE_URI:
+        register_periodic(
+            "measurement-archive",
+            settings.ARCHIVE_INTERVAL,
+            archive_old_measurements,
+            singleton=True
+        )
+    register_periodic(
+        "liveness-flush",
+        settings.LIVENESS_FLUSH_INTERVAL,
+        flush_liveness_tracker,
+        run_on_shutdown=True
+    )
+    register_periodic("report-cleanup", 86400, delete_old_reports, singleton=True)
+    register_periodic(
+        "report-requeue",
+        settings.REPORT_ORPHAN_MARGIN,
+        requeue_orphaned_reports,
+        singleton=True
+    )
+    register_periodic(
+        "correlation-sweep",
+        settings.CORRELATION_SWEEP_INTERVAL,
+        sweep_correlation_index,
+        run_on_shutdown=True,
+        singleton=True
+    )
+    # В каждом worker'е: изменения конфигурации агентов с других реплик
+    register_periodic(
+        "agent-config-refresh",
+        settings.AGENT_CONFIG_REFRESH_INTERVAL,
+        agent_config_store.refresh
+    )
+    start_background_jobs()
+    report_pool.start()
+
+    # Прогрев пула соединений и кэшей до готовности (/health/ready)
+    readiness.add_step("pool", lambda: warm_pool(settings.DB_POOL_WARM))
+    readiness.add_step("stats_cache", warm_stats)
+    readiness.add_step("agent_config", agent_config_store.refresh)
+    readiness.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    readiness.stop()
+    await report_pool.stop()
+    await stop_background_jobs()
+    await leader.release()
+    await cluster_bus.stop()
+    worker_bus.stop()
+    profiler.stop()
 
 @app.get("/")
 async def root():
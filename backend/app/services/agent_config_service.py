@@ -0,0 +1,195 @@
+# app/services/agent_config_service.py
+import asyncio
+import hashlib
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.coordination import worker_bus
+from core.logger import logger
+from core.serialization import dumps
+from db.models import AgentConfigScope
+from db.schemas import ManagedAgentSettings
+from db.session import async_session
+from services.rollup_service import group_keys
+
+# Параметры, которыми можно управлять централизованно (схема - ManagedAgentSettings).
+# Идентификация и подключение агента (agent_id, api_key, api_url, data_dir) - только локально
+AGENT_CONFIG_KEYS = frozenset(ManagedAgentSettings.model_fields)
+
+SCOPE_PATTERN = re.compile(r"^(global|(location|tag|agent):.+)$")
+
+def validate_scope(scope: str, values: Dict) -> Dict:
+    """
+    Проверка области и значений параметров (типы и диапазоны - как у агента):
+    некорректное значение отклонил бы каждый агент, поэтому оно не сохраняется.
+    Возвращает нормализованные значения
+    """
+    if not SCOPE_PATTERN.match(scope):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Scope must be 'global', 'location:<name>', 'tag:<name>' or 'agent:<id>'"
+        )
+    unknown = sorted(set(values) - AGENT_CONFIG_KEYS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Settings not managed centrally: {', '.join(unknown)}"
+        )
+    try:
+        validated = ManagedAgentSettings.model_validate(values)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False)
+        )
+    return validated.model_dump(mode="json", exclude_unset=True)
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Сравнение с If-None-Match (список тегов, слабые теги W/...)"""
+    if not header:
+        return False
+    return any(
+        candidate.strip().removeprefix("W/") in (etag, "*")
+        for candidate in header.split(",")
+    )
+
+class AgentConfigStore:
+    """
+    Конфигурация агентов в памяти worker-процесса. Таблица небольшая
+    и читается целиком; изменения подхватываются по сигналу от других
+    worker'ов (WorkerBus) и проверкой count/max(updated_at) раз в
+    AGENT_CONFIG_REFRESH_INTERVAL (изменения с других реплик). Опрос
+    агентом не обращается к БД: итоговая конфигурация и ETag
+    вычисляются один раз на агента до следующего изменения
+    """
+
+    def __init__(self):
+        self.scopes: Dict[str, Dict] = {}
+        self.version: Optional[tuple] = None
+        # ID агента -> (группы, ETag, тело ответа)
+        self._resolved: Dict[str, Tuple[tuple, str, bytes]] = {}
+        self._changed = asyncio.Event()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+    async def refresh(self, force: bool = False) -> int:
+        async with async_session() as db:
+            version = tuple(
+                (await db.execute(
+                    select(func.count(), func.max(AgentConfigScope.updated_at))
+                )).one()
+            )
+            if not force and version == self.version:
+                return len(self.scopes)
+            rows = await db.execute(select(AgentConfigScope.scope, AgentConfigScope.settings))
+            scopes = {row.scope: row.settings or {} for row in rows}
+
+        changed = scopes != self.scopes
+        self.scopes = scopes
+        self.version = version
+        if changed:
+            self._resolved.clear()
+            # Пробуждение ожидающих long-poll запросов
+            event, self._changed = self._changed, asyncio.Event()
+            event.set()
+            logger.info(f"Agent config reloaded: {len(scopes)} scopes")
+        return len(scopes)
+
+    async def ensure_loaded(self) -> None:
+        if self.version is None:
+            await self.refresh()
+
+    def schedule_refresh(self, payload: Optional[Dict] = None) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self.refresh(force=True))
+
+    def resolve(self, agent: Dict) -> Tuple[str, bytes]:
+        """ETag и тело ответа: global < location < tag < agent"""
+        groups = tuple(group_keys(agent.get("location"), agent.get("tags")))
+        cached = self._resolved.get(agent["id"])
+        if cached is not None and cached[0] == groups:
+            return cached[1], cached[2]
+
+        merged: Dict = {}
+        for scope in ("global", *groups, f"agent:{agent['id']}"):
+            merged.update(self.scopes.get(scope, {}))
+        body = dumps({"settings": dict(sorted(merged.items()))})
+        # ETag по содержимому - одинаковый во всех worker'ах и репликах
+        etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'
+        self._resolved[agent["id"]] = (groups, etag, body)
+        return etag, body
+
+    async def wait_changed(self, timeout: float) -> bool:
+        """
+        Ожидание изменения конфигурации (False - таймаут). При
+        AGENT_CONFIG_MAX_WAITERS ожидающих - 503 с Retry-After: немедленный
+        304 вернул бы агента с новым опросом сразу же
+        """
+        if self.waiters >= settings.AGENT_CONFIG_MAX_WAITERS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many agents waiting for config changes",
+                headers={"Retry-After": str(settings.AGENT_CONFIG_BUSY_RETRY_AFTER)}
+            )
+        self.waiters += 1
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiters -= 1
+
+    async def poll(self, agent: Dict, if_none_match: Optional[str], wait: float) -> Tuple[bool, str, bytes]:
+        """
+        Условный запрос: (изменилась ли конфигурация, ETag, тело).
+        При совпадении ETag ответ задерживается до изменения или wait секунд
+        """
+        await self.ensure_loaded()
+        deadline = time.monotonic() + wait
+        etag, body = self.resolve(agent)
+        while etag_matches(if_none_match, etag):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not await self.wait_changed(remaining):
+                return False, etag, body
+            # Изменение могло не касаться этого агента - ждем дальше
+            etag, body = self.resolve(agent)
+        return True, etag, body
+
+agent_config_store = AgentConfigStore()
+worker_bus.subscribe("agent_config.changed", agent_config_store.schedule_refresh)
+
+async def _notify_changed() -> None:
+    await agent_config_store.refresh(force=True)
+    worker_bus.publish("agent_config.changed", {})
+
+async def list_config_scopes(db: AsyncSession) -> List[AgentConfigScope]:
+    result = await db.execute(select(AgentConfigScope).order_by(AgentConfigScope.scope))
+    return list(result.scalars())
+
+async def put_config_scope(db: AsyncSession, scope: str, values: Dict) -> AgentConfigScope:
+    values = validate_scope(scope, values)
+    stmt = insert(AgentConfigScope).values(scope=scope, settings=values, updated_at=datetime.utcnow())
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[AgentConfigScope.scope],
+            set_={"settings": stmt.excluded.settings, "updated_at": stmt.excluded.updated_at}
+        )
+    )
+    await db.commit()
+    await _notify_changed()
+    return await db.get(AgentConfigScope, scope, populate_existing=True)
+
+async def delete_config_scope(db: AsyncSession, scope: str) -> bool:
+    result = await db.execute(delete(AgentConfigScope).where(AgentConfigScope.scope == scope))
+    await db.commit()
+    if result.rowcount:
+        await _notify_changed()
+    return bool(result.rowcount)
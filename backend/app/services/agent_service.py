@@ -1,11 +1,23 @@
-from datetime import datetime, timedelta
+import secrets
+import string
+from typing import Dict, List, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyHeader
+from pydantic import ValidationError
+from sqlalchemy import select, nulls_last
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.session import get_db
+from core.admission import agent_rate_limiter
+from core.cache import TTLCache
+from core.config import settings
+from core.ids import uuid7
+from db.session import async_session, get_db
 from db.models import Agent
+from db.schemas import AgentCreate, AgentResourceMetrics, AgentUpdate
+from services.liveness_service import liveness_tracker
+from services.rollup_service import sync_group_membership
 
 api_key_scheme = APIKeyHeader(name="X-API-KEY")
+admin_key_scheme = APIKeyHeader(name="X-ADMIN-KEY")
 
 def generate_agent_key(length: int = 32) -> str:
     """Генерация случайного API ключа для агента"""
@@ -13,8 +25,8 @@ def generate_agent_key(length: int = 32) -> str:
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
 async def verify_agent_key(
-    api_key: str,
-    db: AsyncSession
+    api_key: str = Depends(api_key_scheme),
+    db: AsyncSession = Depends(get_db)
 ) -> Agent:
     """Проверка валидности API ключа агента"""
     agent = await db.execute(
@@ -28,8 +40,107 @@ async def verify_agent_key(
             detail="Invalid or inactive API key"
         )
     
-    # Обновляем время последней активности
-    agent.last_seen = datetime.utcnow()
-    await db.commit()
+    # Обновляем время последней активности (в БД пишется пакетно)
+    liveness_tracker.heartbeat(agent.id, agent.test_interval)
     
     return agent
+
+# Ключ агента -> краткие данные агента (None в id - неизвестный ключ).
+# Частые запросы (опрос конфигурации) не обращаются к БД
+agent_auth_cache = TTLCache("agent-auth", ttl=settings.AGENT_AUTH_CACHE_TTL, max_entries=100_000)
+
+async def cached_agent(api_key: str = Depends(api_key_scheme)) -> Dict:
+    """
+    Проверка ключа агента через кэш (с лимитом запросов). Время активности
+    не обновляется: живость агента определяется по измерениям.
+    Сессия только на время проверки ключа: long-poll не держит
+    соединение пула (и транзакцию) до конца ожидания
+    """
+    agent = agent_auth_cache.get(api_key)
+    if agent is None:
+        async with async_session() as db:
+            row = (await db.execute(
+                select(Agent.id, Agent.is_active, Agent.location, Agent.tags).where(Agent.api_key == api_key)
+            )).one_or_none()
+        agent = dict(row._mapping) if row else {"id": None, "is_active": False}
+        agent_auth_cache.set(api_key, agent)
+    if not agent["id"] or not agent["is_active"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or inactive API key"
+        )
+    agent_rate_limiter.check(agent["id"])
+    return agent
+
+async def admitted_agent(agent: Agent = Depends(verify_agent_key)) -> Agent:
+    """Агент с проверкой лимита запросов (429 + Retry-After при превышении)"""
+    agent_rate_limiter.check(agent.id)
+    return agent
+
+def verify_admin_key(admin_key: str = Depends(admin_key_scheme)) -> None:
+    """Проверка ключа администратора"""
+    if not settings.ADMIN_SECRET or not secrets.compare_digest(admin_key, settings.ADMIN_SECRET):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin key"
+        )
+
+async def create_agent(db: AsyncSession, data: AgentCreate) -> Agent:
+    """Регистрация агента вместе с членством в группах"""
+    agent = Agent(id=str(uuid7()), api_key=generate_agent_key(), **data.model_dump())
+    db.add(agent)
+    await db.flush()
+    await sync_group_membership(db, agent)
+    await db.commit()
+    return agent
+
+async def update_agent(db: AsyncSession, agent: Agent, data: AgentUpdate) -> Agent:
+    """Изменение агента; при смене location/tags пересчитывается членство в группах"""
+    changes = data.model_dump(exclude_unset=True)
+    for field, value in changes.items():
+        setattr(agent, field, value)
+    if "location" in changes or "tags" in changes:
+        await sync_group_membership(db, agent)
+    await db.commit()
+    agent_auth_cache.invalidate(agent.api_key)
+    return agent
+
+# Поля сводки ресурсов, по которым можно искать самых "тяжелых" агентов
+RESOURCE_SORT_FIELDS = ("cpu_pct", "cpu_s", "rss_mb", "sockets", "outbox", "upload_ms", "cycle_ms")
+MAX_RESOURCE_HEADER = 4096
+
+def record_agent_metrics(agent_id: str, raw: Optional[str]) -> None:
+    """
+    Сводка ресурсов из заголовка X-Agent-Metrics: проверяется по схеме
+    (только числа - по ним сортирует list_agent_resources) и пишется
+    в БД пакетно вместе с last_seen. Некорректная сводка игнорируется -
+    измерения важнее
+    """
+    if not raw or len(raw) > MAX_RESOURCE_HEADER:
+        return
+    try:
+        metrics = AgentResourceMetrics.model_validate_json(raw)
+    except ValidationError:
+        return
+    liveness_tracker.report_resources(agent_id, metrics.model_dump(exclude_none=True))
+
+async def list_agent_resources(db: AsyncSession, sort_by: str = "cpu_pct", limit: int = 50) -> List[Dict]:
+    """Агенты по убыванию потребления ресурса (последние сводки)"""
+    key = Agent.resource_metrics[sort_by].as_float()
+    result = await db.execute(
+        select(
+            Agent.id, Agent.name, Agent.location, Agent.resource_metrics, Agent.resource_reported_at
+        ).where(
+            Agent.resource_metrics.is_not(None)
+        ).order_by(nulls_last(key.desc())).limit(limit)
+    )
+    return [
+        {
+            "agent_id": row.id,
+            "name": row.name,
+            "location": row.location,
+            "metrics": row.resource_metrics,
+            "reported_at": row.resource_reported_at.isoformat() if row.resource_reported_at else None,
+        }
+        for row in result
+    ]
@@ -0,0 +1,244 @@
+# app/services/anomaly_service.py
+import math
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.logger import logger
+from db.models import Anomaly, DetectorState
+from db.session import async_session
+
+# Метрика -> направление, в котором изменение означает деградацию
+WATCHED_METRICS = {
+    "latency": "up",
+    "packet_loss": "up",
+    "download": "down",
+    "upload": "down",
+}
+
+# Минимальное стандартное отклонение, чтобы стабильный ряд
+# (например, нулевые потери) не давал бесконечный z-score
+MIN_STD = {
+    "latency": 1.0,       # ms
+    "packet_loss": 0.5,   # %
+    "download": 1.0,      # Mbps
+    "upload": 1.0,        # Mbps
+}
+
+# Строк в одном INSERT чекпоинта: у asyncpg не больше 32767 параметров на запрос
+CHECKPOINT_CHUNK = 1000
+
+class MetricDetector:
+    """
+    Детектор для одной метрики одного агента: EWMA/EWMV базовая линия
+    и двусторонний CUSUM по нормированному отклонению. Состояние O(1).
+    """
+    __slots__ = ("mean", "var", "count", "cusum_pos", "cusum_neg")
+
+    def __init__(self, state: Optional[Dict] = None):
+        state = state or {}
+        self.mean: float = state.get("mean", 0.0)
+        self.var: float = state.get("var", 0.0)
+        self.count: int = state.get("count", 0)
+        self.cusum_pos: float = state.get("cusum_pos", 0.0)
+        self.cusum_neg: float = state.get("cusum_neg", 0.0)
+
+    def to_state(self) -> Dict:
+        return {
+            "mean": self.mean,
+            "var": self.var,
+            "count": self.count,
+            "cusum_pos": self.cusum_pos,
+            "cusum_neg": self.cusum_neg,
+        }
+
+    def update(
+        self,
+        value: float,
+        alpha: float,
+        k: float,
+        h: float,
+        warmup: int,
+        min_std: float
+    ) -> Optional[Tuple[str, float, float]]:
+        """
+        Обработка нового значения
+
+        Returns:
+            (направление, базовая линия, отклонение в σ) при срабатывании, иначе None
+        """
+        alarm = None
+        if self.count == 0:
+            self.mean = value
+        elif self.count >= warmup:
+            std = max(math.sqrt(self.var), min_std, abs(self.mean) * 0.05)
+            z = (value - self.mean) / std
+            self.cusum_pos = max(0.0, self.cusum_pos + z - k)
+            self.cusum_neg = max(0.0, self.cusum_neg - z - k)
+            if self.cusum_pos > h:
+                alarm = ("up", self.mean, z)
+            elif self.cusum_neg > h:
+                alarm = ("down", self.mean, z)
+            if alarm:
+                self.cusum_pos = 0.0
+                self.cusum_neg = 0.0
+
+        # Обновление EWMA/EWMV
+        diff = value - self.mean
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1 - alpha) * (self.var + diff * incr)
+        self.count += 1
+        return alarm
+
+class AnomalyDetector:
+    """Потоковые детекторы по всем агентам, состояние хранится в памяти"""
+
+    def __init__(self):
+        self._detectors: Dict[Tuple[str, str], MetricDetector] = {}
+        self._dirty: set = set()
+        self._pending: List[Dict] = []
+        self._recent: deque = deque(maxlen=settings.ANOMALY_BUFFER_SIZE)
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        """Подписка на события об аномалиях"""
+        self._listeners.append(callback)
+
+    def observe(self, measurement: Dict) -> List[Dict]:
+        """Инкрементальная обработка нового измерения"""
+        events = []
+        agent_id = measurement["agent_id"]
+        timestamp = measurement.get("timestamp") or datetime.utcnow()
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+
+        for metric, bad_direction in WATCHED_METRICS.items():
+            value = measurement.get(metric)
+            if value is None:
+                continue
+
+            key = (agent_id, metric)
+            detector = self._detectors.get(key)
+            if detector is None:
+                detector = self._detectors[key] = MetricDetector()
+
+            alarm = detector.update(
+                value,
+                alpha=settings.ANOMALY_EWMA_ALPHA,
+                k=settings.ANOMALY_CUSUM_K,
+                h=settings.ANOMALY_CUSUM_H,
+                warmup=settings.ANOMALY_WARMUP,
+                min_std=MIN_STD[metric]
+            )
+            self._dirty.add(key)
+
+            if alarm and alarm[0] == bad_direction:
+                direction, baseline, deviation = alarm
+                events.append({
+                    "timestamp": timestamp,
+                    "agent_id": agent_id,
+                    "metric": metric,
+                    "value": value,
+                    "baseline": round(baseline, 2),
+                    "deviation": round(deviation, 2),
+                    "direction": direction,
+                })
+
+        for event in events:
+            logger.warning(
+                f"Anomaly detected: agent={event['agent_id']} metric={event['metric']} "
+                f"value={event['value']} baseline={event['baseline']}"
+            )
+            self._pending.append(event)
+            for callback in self._listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Anomaly listener failed: {str(e)}")
+
+        self._trim_pending()
+        return events
+
+    def _trim_pending(self) -> None:
+        """Ограничение очереди несохраненных аномалий (БД долго недоступна)"""
+        overflow = len(self._pending) - settings.ANOMALY_PENDING_LIMIT
+        if overflow > 0:
+            del self._pending[:overflow]
+            logger.warning(f"Anomaly checkpoint queue is full, dropped {overflow} oldest anomalies")
+
+    def remember(self, event: Dict) -> None:
+        """Аномалия (от любого worker'а) в буфер последних событий"""
+        self._recent.append(event)
+
+    def recent(self, agent_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Последние аномалии из памяти (новые первыми)"""
+        result = []
+        for event in reversed(self._recent):
+            if agent_id and event["agent_id"] != agent_id:
+                continue
+            result.append(event)
+            if len(result) >= limit:
+                break
+        return result
+
+    async def load(self, db: AsyncSession) -> None:
+        """Восстановление состояния детекторов из последнего чекпоинта"""
+        self._detectors.clear()
+        self._dirty.clear()
+        result = await db.execute(select(DetectorState))
+        for row in result.scalars():
+            self._detectors[(row.agent_id, row.metric)] = MetricDetector(row.state)
+        logger.info(f"Restored {len(self._detectors)} anomaly detector states")
+
+    async def checkpoint(self, db: AsyncSession) -> None:
+        """Сохранение измененных состояний и новых аномалий в БД"""
+        if not self._dirty and not self._pending:
+            return
+
+        now = datetime.utcnow()
+        states = [
+            {
+                "agent_id": agent_id,
+                "metric": metric,
+                "state": self._detectors[(agent_id, metric)].to_state(),
+                "updated_at": now,
+            }
+            for agent_id, metric in self._dirty
+        ]
+        anomalies, self._pending = self._pending, []
+        self._dirty = set()
+
+        try:
+            for start in range(0, len(states), CHECKPOINT_CHUNK):
+                stmt = insert(DetectorState).values(states[start:start + CHECKPOINT_CHUNK])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[DetectorState.agent_id, DetectorState.metric],
+                    set_={
+                        "state": stmt.excluded.state,
+                        "updated_at": stmt.excluded.updated_at,
+                    }
+                )
+                await db.execute(stmt)
+            for start in range(0, len(anomalies), CHECKPOINT_CHUNK):
+                await db.execute(insert(Anomaly).values(anomalies[start:start + CHECKPOINT_CHUNK]))
+            await db.commit()
+        except Exception:
+            # Вернем данные, чтобы сохранить их при следующем чекпоинте
+            self._dirty.update((s["agent_id"], s["metric"]) for s in states)
+            self._pending = anomalies + self._pending
+            self._trim_pending()
+            raise
+
+anomaly_detector = AnomalyDetector()
+
+async def restore_anomaly_detector() -> None:
+    async with async_session() as db:
+        await anomaly_detector.load(db)
+
+async def checkpoint_anomaly_detector() -> None:
+    async with async_session() as db:
+        await anomaly_detector.checkpoint(db)
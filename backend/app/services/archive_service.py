@@ -0,0 +1,299 @@
+# app/services/archive_service.py
+import asyncio
+import importlib.util
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import any_, bindparam, delete, func, select, and_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import Uuid
+from core.cache import TTLCache
+from core.config import settings
+from core.logger import logger
+from db.models import Measurement
+from db.session import async_session
+
+# Метрики, для которых считаются частичные агрегаты (sum/count)
+PARTIAL_METRICS = ("latency", "download", "upload", "packet_loss", "jitter")
+
+# Найденный набор файлов архива (listing каталога/бакета) переиспользуется
+# между запросами; архиватор инвалидирует его во всех worker'ах
+_dataset_cache = TTLCache("archive-dataset", ttl=300, max_entries=1)
+
+def merge_partial(into: Dict[str, Dict], agent_id: str, row: Dict) -> None:
+    """
+    Слияние частичных агрегатов агента (строки из БД или архива):
+    *_sum/*_count складываются, *_min/*_max сравниваются
+    """
+    acc = into.get(agent_id)
+    if acc is None:
+        into[agent_id] = {k: v for k, v in row.items() if k != "agent_id"}
+        return
+    for key, value in row.items():
+        if key == "agent_id" or value is None:
+            continue
+        current = acc.get(key)
+        if current is None:
+            acc[key] = value
+        elif key.endswith("_sum") or key.endswith("_count"):
+            acc[key] = current + value
+        elif key.endswith("_max"):
+            acc[key] = max(current, value)
+        elif key.endswith("_min"):
+            acc[key] = min(current, value)
+
+def hot_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Граница горячего окна (начало суток): более старые данные уходят в архив"""
+    now = now or datetime.utcnow()
+    day = (now - timedelta(days=settings.HOT_RETENTION_DAYS)).date()
+    return datetime.combine(day, datetime.min.time())
+
+class MeasurementArchive:
+    """
+    Холодное хранилище измерений: Parquet (zstd), разбиение
+    day=YYYY-MM-DD/agent_id=<id>/ (hive). Чтение через pyarrow.dataset
+    с фильтрами: отбрасываются лишние каталоги (day, agent_id) и
+    row group'ы по статистике timestamp.
+    """
+
+    def __init__(self, uri: str):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as pafs
+
+        self.pa = pa
+        self.ds = ds
+        if "://" in uri:
+            self.fs, self.path = pafs.FileSystem.from_uri(uri)
+        else:
+            self.fs, self.path = pafs.LocalFileSystem(), os.path.abspath(uri)
+        self.fs.create_dir(self.path, recursive=True)
+
+        self.schema = pa.schema([
+            ("id", pa.binary(16)),
+            ("timestamp", pa.timestamp("us")),
+            ("latency", pa.float64()),
+            ("download", pa.float64()),
+            ("upload", pa.float64()),
+            ("packet_loss", pa.float64()),
+            ("jitter", pa.float64()),
+            ("metainfo", pa.string()),
+            ("day", pa.string()),
+            ("agent_id", pa.string()),
+        ])
+        self.partitioning = ds.partitioning(
+            pa.schema([("day", pa.string()), ("agent_id", pa.string())]),
+            flavor="hive"
+        )
+
+    def write(self, rows: List[Dict], key: str) -> None:
+        """
+        Запись измерений (блокирующая - вызывать в отдельном потоке).
+        key - стабильная часть имени файлов: повторная запись с тем же
+        key перезаписывает файлы, а не добавляет копии строк
+        """
+        if not rows:
+            return
+        columns = {name: [] for name in self.schema.names}
+        for row in rows:
+            columns["id"].append(row["id"].bytes)
+            columns["metainfo"].append(json.dumps(row["metainfo"]) if row["metainfo"] is not None else None)
+            columns["day"].append(row["timestamp"].date().isoformat())
+            for name in ("timestamp", "agent_id", *PARTIAL_METRICS):
+                columns[name].append(row[name])
+        table = self.pa.table(columns, schema=self.schema)
+
+        self.ds.write_dataset(
+            table,
+            self.path,
+            filesystem=self.fs,
+            format="parquet",
+            partitioning=self.partitioning,
+            basename_template=f"part-{key}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=self.ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        )
+
+    def dataset(self):
+        dataset = _dataset_cache.get("dataset")
+        if dataset is None:
+            dataset = self.ds.dataset(
+                self.path,
+                filesystem=self.fs,
+                format="parquet",
+                schema=self.schema,
+                partitioning=self.partitioning,
+            )
+            _dataset_cache.set("dataset", dataset)
+        return dataset
+
+    def invalidate(self) -> None:
+        _dataset_cache.invalidate("dataset")
+
+    def _filter(
+        self,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        agent_id: Optional[str]
+    ):
+        field = self.ds.field
+        conditions = []
+        if since:
+            conditions.append(field("day") >= since.date().isoformat())
+            conditions.append(field("timestamp") >= self.pa.scalar(since, self.pa.timestamp("us")))
+        if until:
+            conditions.append(field("day") <= until.date().isoformat())
+            conditions.append(field("timestamp") <= self.pa.scalar(until, self.pa.timestamp("us")))
+        if agent_id:
+            conditions.append(field("agent_id") == agent_id)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def scan(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        agent_id: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Iterator[List[Dict]]:
+        """Пачки измерений из архива в формате строк БД"""
+        columns = [name for name in self.schema.names if name != "day"]
+        scanner = self.dataset().scanner(
+            columns=columns,
+            filter=self._filter(since, until, agent_id),
+            batch_size=batch_size
+        )
+        for batch in scanner.to_batches():
+            rows = batch.to_pylist()
+            for row in rows:
+                row["id"] = uuid.UUID(bytes=row["id"])
+                if row["metainfo"] is not None:
+                    row["metainfo"] = json.loads(row["metainfo"])
+            if rows:
+                yield rows
+
+    def aggregate(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        agent_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        Частичные агрегаты по агентам (как StatsService для БД),
+        считаются по пачкам без загрузки всего диапазона в память
+        """
+        aggregations = [
+            ("timestamp", "count"),
+            ("timestamp", "max"),
+            ("download", "min"),
+            ("download", "max"),
+        ]
+        for metric in PARTIAL_METRICS:
+            aggregations += [(metric, "sum"), (metric, "count")]
+
+        partials: Dict[str, Dict] = {}
+        scanner = self.dataset().scanner(
+            columns=["agent_id", "timestamp", *PARTIAL_METRICS],
+            filter=self._filter(since, until, agent_id)
+        )
+        for batch in scanner.to_batches():
+            if batch.num_rows == 0:
+                continue
+            grouped = self.pa.Table.from_batches([batch]).group_by("agent_id").aggregate(aggregations)
+            for row in grouped.to_pylist():
+                merge_partial(partials, row["agent_id"], row)
+        return partials
+
+_archive: Optional[MeasurementArchive] = None
+
+def get_archive() -> Optional[MeasurementArchive]:
+    """Архив, если он настроен и установлен pyarrow (иначе None)"""
+    global _archive
+    if _archive is None and settings.ARCHIVE_URI:
+        if importlib.util.find_spec("pyarrow") is None:
+            logger.warning("ARCHIVE_URI is set but pyarrow is not installed, archive disabled")
+            settings.ARCHIVE_URI = None
+            return None
+        _archive = MeasurementArchive(settings.ARCHIVE_URI)
+    return _archive
+
+def reaches_archive(since: Optional[datetime]) -> bool:
+    """Запрос за этот период должен читать и архив"""
+    return get_archive() is not None and (since is None or since < hot_cutoff())
+
+async def archive_chunk(db: AsyncSession, archive: MeasurementArchive, start: datetime, end: datetime) -> int:
+    """
+    Перенос измерений [start, end) из БД в архив. Имя файлов - начало
+    интервала и наибольший ID (UUIDv7) его строк: повтор после сбоя
+    (файл записан, строки не удалены) выбирает те же строки, а поздние
+    измерения старше уже записанных не меняют наибольший ID, поэтому
+    файл перезаписывается. Строки, пришедшие после переноса интервала,
+    получают свой файл и не затирают записанный
+    """
+    result = await db.execute(
+        select(Measurement.__table__).where(
+            and_(Measurement.timestamp >= start, Measurement.timestamp < end)
+        )
+    )
+    rows = [dict(row) for row in result.mappings()]
+    if not rows:
+        return 0
+
+    key = f"{start:%Y%m%dT%H%M}-{max(row['id'] for row in rows).hex}"
+    await asyncio.to_thread(archive.write, rows, key)
+
+    # Удаляем именно записанные строки: поздние измерения за этот же интервал,
+    # пришедшие во время записи, останутся в БД до следующего запуска
+    ids = [row["id"] for row in rows]
+    await db.execute(
+        delete(Measurement).where(
+            Measurement.id == any_(bindparam("ids", ids, type_=ARRAY(Uuid)))
+        )
+    )
+    await db.commit()
+    return len(rows)
+
+async def archive_day(db: AsyncSession, archive: MeasurementArchive, day_start: datetime, day_end: datetime) -> int:
+    """
+    Перенос измерений [day_start, day_end) из БД в архив интервалами по
+    ARCHIVE_CHUNK_MINUTES: в памяти и в одном DELETE - только строки интервала
+    """
+    step = timedelta(minutes=settings.ARCHIVE_CHUNK_MINUTES)
+    archived = 0
+    start = day_start
+    while start < day_end:
+        end = min(start + step, day_end)
+        archived += await archive_chunk(db, archive, start, end)
+        start = end
+    return archived
+
+async def archive_old_measurements() -> None:
+    """Фоновая задача: перенос измерений старше горячего окна в архив"""
+    archive = get_archive()
+    if archive is None:
+        return
+
+    cutoff = hot_cutoff()
+    archived = 0
+    async with async_session() as db:
+        oldest = await db.scalar(
+            select(func.min(Measurement.timestamp)).where(Measurement.timestamp < cutoff)
+        )
+        if oldest is None:
+            return
+        day_start = datetime.combine(oldest.date(), datetime.min.time())
+        for _ in range(settings.ARCHIVE_MAX_DAYS_PER_RUN):
+            if day_start >= cutoff:
+                break
+            day_end = min(day_start + timedelta(days=1), cutoff)
+            archived += await archive_day(db, archive, day_start, day_end)
+            day_start = day_end
+
+    if archived:
+        archive.invalidate()
+        logger.info(f"Archived {archived} measurements older than {cutoff.date()}")
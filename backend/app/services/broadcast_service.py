@@ -0,0 +1,68 @@
+# app/services/broadcast_service.py
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+from core.config import settings
+from core.logger import logger
+from core.serialization import dumps
+
+class Subscriber:
+    """Подписчик живой ленты с ограниченной очередью"""
+
+    def __init__(self, agent_ids: Optional[Iterable[str]], maxsize: int):
+        self.agent_ids: Optional[Set[str]] = set(agent_ids) if agent_ids else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def wants(self, agent_id: Optional[str]) -> bool:
+        return self.agent_ids is None or agent_id is None or agent_id in self.agent_ids
+
+class BroadcastHub:
+    """
+    Внутрипроцессная рассылка событий ingest-потока подписчикам.
+    Сообщение кодируется один раз; медленные подписчики отключаются.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Subscriber] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(
+        self,
+        agent_ids: Optional[Iterable[str]] = None,
+        maxsize: Optional[int] = None
+    ) -> Subscriber:
+        subscriber = Subscriber(agent_ids, maxsize or settings.STREAM_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: Dict, agent_id: Optional[str] = None) -> None:
+        """Неблокирующая отправка события всем подходящим подписчикам"""
+        if not self._subscribers:
+            return
+
+        message = b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+        for subscriber in list(self._subscribers):
+            if not subscriber.wants(agent_id):
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        """Отключение подписчика, который не успевает читать"""
+        logger.warning("Dropping slow stream subscriber")
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        # Освобождаем очередь и будим читателя сигналом завершения
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+broadcast_hub = BroadcastHub()
@@ -0,0 +1,349 @@
+# app/services/correlation_service.py
+import ipaddress
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from uuid import UUID
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.ids import uuid7
+from core.logger import logger
+from db.models import Incident
+from db.session import async_session
+from services.liveness_service import liveness_tracker
+
+# Типы групп, по которым ищется общая причина деградации
+GROUP_KINDS = ("location", "prefix", "server")
+
+def network_prefix(address: Optional[str]) -> Optional[str]:
+    """Сеть внешнего адреса агента: /24 для IPv4, /48 для IPv6"""
+    if not address:
+        return None
+    try:
+        ip = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return None
+    length = settings.CORRELATION_IPV4_PREFIX if ip.version == 4 else settings.CORRELATION_IPV6_PREFIX
+    return str(ipaddress.ip_network(f"{ip}/{length}", strict=False))
+
+def measurement_groups(measurement: Dict) -> List[str]:
+    """
+    Группы агента по измерению (сводке MeasurementEvent): местоположение,
+    сеть внешнего IP, тестовый сервер
+    """
+    groups = []
+    if measurement.get("location"):
+        groups.append(f"location:{measurement['location']}")
+    prefix = network_prefix(measurement.get("external_ip"))
+    if prefix:
+        groups.append(f"prefix:{prefix}")
+    server = urlparse(measurement.get("test_server") or "").hostname
+    if server:
+        groups.append(f"server:{server}")
+    return groups
+
+def degradation_reason(measurement: Dict) -> Optional[str]:
+    """Явные признаки деградации в самом измерении"""
+    # Результаты опроса целей, отправленные агентом при остановке, без основных проб
+    if measurement.get("targets_only"):
+        return None
+    if measurement.get("latency") is None:
+        return "failure"
+    if (measurement.get("packet_loss") or 0) >= settings.CORRELATION_LOSS_THRESHOLD:
+        return "loss"
+    return None
+
+class AgentHealth:
+    """Последнее состояние агента в окне"""
+    __slots__ = ("seen", "reason", "anomaly_until", "anomaly", "groups")
+
+    def __init__(self):
+        self.seen = 0.0
+        self.reason: Optional[str] = None
+        self.anomaly_until = 0.0
+        self.anomaly: Optional[str] = None
+        self.groups: Tuple[str, ...] = ()
+
+    def degraded(self, now: float, last_seen: Optional[float] = None) -> Optional[str]:
+        # Пропавшие агенты: при настоящем отказе измерения не доходят до сервера
+        if now - max(self.seen, last_seen or 0.0) > settings.CORRELATION_SILENCE:
+            return "silent"
+        if self.reason:
+            return self.reason
+        if now < self.anomaly_until:
+            return f"anomaly:{self.anomaly}"
+        return None
+
+class CorrelationIndex:
+    """
+    Скользящее окно состояния агентов с индексом по группам (местоположение,
+    сеть внешнего IP, тестовый сервер). Когда в группе одновременно
+    деградирует заметная доля агентов, открывается инцидент на всю группу
+    вместо N отдельных проблем агентов.
+
+    Память ограничена: в окне только агенты с измерениями за
+    CORRELATION_WINDOW, групп не больше CORRELATION_MAX_GROUPS (LRU).
+    Агент без измерений дольше CORRELATION_SILENCE считается деградировавшим
+    до выхода из окна (sweep), поэтому окно должно быть больше этого срока.
+    Молчание определяется и по last_seen (heartbeat'ы всех реплик и БД):
+    измерение, не дошедшее до leader'а по шине, не делает агента молчащим.
+    Слушатели получают сводку инцидента (summary); полный список
+    затронутых агентов leader сохраняет в БД (checkpoint)
+    """
+
+    def __init__(self, last_seen: Optional[Callable[[str], Optional[float]]] = None):
+        self._last_seen = last_seen
+        self._agents: "OrderedDict[str, AgentHealth]" = OrderedDict()   # по времени обновления
+        self._groups: "OrderedDict[str, Dict[str, None]]" = OrderedDict()
+        self._open: Dict[str, Dict] = {}   # группа -> открытый инцидент
+        self._unsaved: Dict[str, Dict] = {}   # изменения инцидентов для записи в БД
+        self._listeners: List[Callable[[Dict], None]] = []
+        # Инциденты от leader'а (в каждом worker'е) для API
+        self._incidents: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        self._listeners.append(callback)
+
+    def _expire(self, now: float) -> None:
+        horizon = now - settings.CORRELATION_WINDOW
+        while self._agents:
+            agent_id, health = next(iter(self._agents.items()))
+            if health.seen >= horizon:
+                break
+            self._agents.popitem(last=False)
+            for group in health.groups:
+                self._leave(group, agent_id)
+
+    def _leave(self, group: str, agent_id: str) -> None:
+        members = self._groups.get(group)
+        if members is not None:
+            members.pop(agent_id, None)
+            if not members:
+                del self._groups[group]
+
+    def _join(self, group: str, agent_id: str) -> None:
+        members = self._groups.get(group)
+        if members is None:
+            members = self._groups[group] = {}
+            while len(self._groups) > settings.CORRELATION_MAX_GROUPS:
+                self._groups.popitem(last=False)
+        members[agent_id] = None
+        self._groups.move_to_end(group)
+
+    def observe(self, measurement: Dict, now: Optional[float] = None) -> None:
+        """Новое измерение (из события measurement, в leader-процессе)"""
+        now = now if now is not None else time.time()
+        timestamp = measurement.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if timestamp is not None and timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        # Измерения из очереди агента за прошлые периоды не описывают текущее состояние
+        if timestamp is not None and now - timestamp.timestamp() > settings.CORRELATION_WINDOW:
+            return
+
+        agent_id = measurement["agent_id"]
+        health = self._agents.pop(agent_id, None) or AgentHealth()
+        groups = tuple(measurement_groups(measurement))
+        for group in set(health.groups) - set(groups):
+            self._leave(group, agent_id)
+        health.seen = now
+        health.reason = degradation_reason(measurement)
+        health.groups = groups
+        self._agents[agent_id] = health
+        for group in groups:
+            self._join(group, agent_id)
+
+        self._expire(now)
+        # Открытые инциденты проверяются всегда: группа могла опустеть
+        for group in set(groups) | set(self._open):
+            self._evaluate(group, now)
+
+    def sweep(self, now: Optional[float] = None) -> None:
+        """Периодическая проверка всех групп: пропавшие агенты и выход из окна"""
+        now = now if now is not None else time.time()
+        self._expire(now)
+        for group in set(self._groups) | set(self._open):
+            self._evaluate(group, now)
+
+    def observe_anomaly(self, event: Dict, now: Optional[float] = None) -> None:
+        """Аномалия агента (CUSUM) считается деградацией в течение CORRELATION_ANOMALY_HOLD"""
+        now = now if now is not None else time.time()
+        health = self._agents.get(event["agent_id"])
+        if health is None:
+            return
+        health.anomaly_until = now + settings.CORRELATION_ANOMALY_HOLD
+        health.anomaly = event.get("metric")
+        for group in health.groups:
+            self._evaluate(group, now)
+
+    def group_state(self, group: str, now: float) -> Tuple[int, Dict[str, str]]:
+        """Число агентов группы в окне и деградировавшие агенты с причинами"""
+        members = self._groups.get(group) or {}
+        degraded = {}
+        for agent_id in members:
+            last_seen = self._last_seen(agent_id) if self._last_seen else None
+            reason = self._agents[agent_id].degraded(now, last_seen)
+            if reason:
+                degraded[agent_id] = reason
+        return len(members), degraded
+
+    def _evaluate(self, group: str, now: float) -> None:
+        total, degraded = self.group_state(group, now)
+        ratio = len(degraded) / total if total else 0.0
+        incident = self._open.get(group)
+
+        if incident is None:
+            if (
+                len(degraded) >= settings.CORRELATION_MIN_AGENTS
+                and ratio >= settings.CORRELATION_RATIO
+            ):
+                kind, _, value = group.partition(":")
+                incident = {
+                    "id": str(uuid7()),
+                    "group": group,
+                    "kind": kind,
+                    "value": value,
+                    "status": "open",
+                    "opened_at": datetime.utcfromtimestamp(now).isoformat(),
+                    "closed_at": None,
+                    "peak_agents": 0,
+                }
+                self._open[group] = incident
+                self._update(incident, total, degraded)
+                logger.warning(
+                    f"Correlated degradation in {group}: {len(degraded)} of {total} agents"
+                )
+                self._notify(incident)
+            return
+
+        # Гистерезис: инцидент закрывается, когда деградирует меньше половины порога
+        if len(degraded) < settings.CORRELATION_MIN_AGENTS or ratio < settings.CORRELATION_RATIO / 2:
+            incident["status"] = "resolved"
+            incident["closed_at"] = datetime.utcfromtimestamp(now).isoformat()
+            # Все агенты группы вышли из окна: восстановление не подтверждено
+            incident["expired"] = total == 0
+            self._update(incident, total, degraded)
+            del self._open[group]
+            logger.info(f"Correlated degradation in {group} resolved")
+            self._notify(incident)
+        elif set(degraded) != set(incident["affected_agents"]):
+            self._update(incident, total, degraded)
+            self._notify(incident)
+
+    def _update(self, incident: Dict, total: int, degraded: Dict[str, str]) -> None:
+        incident["agents_in_group"] = total
+        incident["affected_agents"] = sorted(degraded)
+        incident["reasons"] = dict(Counter(degraded.values()))
+        incident["peak_agents"] = max(incident["peak_agents"], len(degraded))
+
+    @staticmethod
+    def summary(incident: Dict) -> Dict:
+        """
+        Инцидент для события (шина между репликами, API, живая лента): вместо
+        полного списка затронутых агентов - их число и первые
+        CORRELATION_INCIDENT_SAMPLE, чтобы событие укладывалось в NOTIFY
+        """
+        result = {key: value for key, value in incident.items() if key != "affected_agents"}
+        affected = incident.get("affected_agents") or []
+        result["affected_count"] = len(affected)
+        result["affected_sample"] = affected[:settings.CORRELATION_INCIDENT_SAMPLE]
+        return result
+
+    def _notify(self, incident: Dict) -> None:
+        self._unsaved[incident["id"]] = dict(incident)
+        for callback in self._listeners:
+            try:
+                callback(self.summary(incident))
+            except Exception as e:
+                logger.error(f"Incident listener failed: {str(e)}")
+
+    def remember(self, incident: Dict) -> None:
+        """Инцидент (от leader'а) в буфер последних инцидентов"""
+        self._incidents.pop(incident["id"], None)
+        self._incidents[incident["id"]] = incident
+        while len(self._incidents) > settings.CORRELATION_INCIDENT_BUFFER:
+            self._incidents.popitem(last=False)
+
+    def incidents(self, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Последние инциденты (новые изменения первыми)"""
+        result = []
+        for incident in reversed(self._incidents.values()):
+            if status and incident["status"] != status:
+                continue
+            if kind and incident["kind"] != kind:
+                continue
+            result.append(incident)
+            if len(result) >= limit:
+                break
+        return result
+
+    async def checkpoint(self, db: AsyncSession) -> None:
+        """Запись изменившихся инцидентов (с полным списком агентов) и удаление старых"""
+        incidents, self._unsaved = list(self._unsaved.values()), {}
+        now = datetime.utcnow()
+        try:
+            if incidents:
+                rows = [
+                    {
+                        "id": UUID(incident["id"]),
+                        "group": incident["group"],
+                        "kind": incident["kind"],
+                        "status": incident["status"],
+                        "opened_at": datetime.fromisoformat(incident["opened_at"]),
+                        "closed_at": (
+                            datetime.fromisoformat(incident["closed_at"]) if incident["closed_at"] else None
+                        ),
+                        "agents_in_group": incident["agents_in_group"],
+                        "peak_agents": incident["peak_agents"],
+                        "reasons": incident["reasons"],
+                        "affected_agents": incident["affected_agents"],
+                        "updated_at": now,
+                    }
+                    for incident in incidents
+                ]
+                stmt = insert(Incident).values(rows)
+                await db.execute(stmt.on_conflict_do_update(
+                    index_elements=[Incident.id],
+                    set_={
+                        name: stmt.excluded[name] for name in rows[0] if name not in ("id", "opened_at")
+                    }
+                ))
+            cutoff = now - timedelta(days=settings.CORRELATION_INCIDENT_RETENTION_DAYS)
+            # По времени изменения: и инциденты, оставшиеся открытыми после смены leader'а
+            await db.execute(delete(Incident).where(Incident.updated_at < cutoff))
+            await db.commit()
+        except Exception:
+            # Не записанные изменения - в следующую попытку (более новые важнее)
+            self._unsaved = {**{i["id"]: i for i in incidents}, **self._unsaved}
+            raise
+
+    def stats(self) -> Dict:
+        return {
+            "agents": len(self._agents),
+            "groups": len(self._groups),
+            "open_incidents": len(self._open),
+        }
+
+def _liveness_timestamp(agent_id: str) -> Optional[float]:
+    last_seen = liveness_tracker.last_seen(agent_id)
+    return last_seen.replace(tzinfo=timezone.utc).timestamp() if last_seen else None
+
+correlation_index = CorrelationIndex(_liveness_timestamp)
+
+async def sweep_correlation_index() -> None:
+    # last_seen из БД: heartbeat'ы, потерянные шиной (доставка best-effort)
+    async with async_session() as db:
+        await liveness_tracker.refresh(
+            db, datetime.utcnow() - timedelta(seconds=settings.CORRELATION_WINDOW)
+        )
+        correlation_index.sweep()
+        await correlation_index.checkpoint(db)
+
+async def get_incident(db: AsyncSession, incident_id: UUID) -> Optional[Incident]:
+    """Инцидент с полным списком затронутых агентов (из БД)"""
+    return await db.get(Incident, incident_id)
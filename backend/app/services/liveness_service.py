@@ -0,0 +1,168 @@
+# app/services/liveness_service.py
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.coordination import worker_bus
+from core.logger import logger
+from db.models import Agent
+from db.session import async_session
+
+class LivenessTracker:
+    """
+    Учет активности агентов в памяти: heartbeat на каждый запрос агента,
+    статус по ожидаемому интервалу, пакетная запись last_seen (и последней
+    сводки ресурсов агента) в БД
+    """
+
+    def __init__(self):
+        self._last_seen: Dict[str, datetime] = {}
+        self._intervals: Dict[str, int] = {}
+        self._dirty: Dict[str, datetime] = {}
+        self._resources: Dict[str, Tuple[Dict, datetime]] = {}
+        # Последний heartbeat агента, разосланный другим репликам
+        self._forwarded: Dict[str, datetime] = {}
+
+    def heartbeat(
+        self,
+        agent_id: str,
+        test_interval: Optional[int] = None,
+        seen_at: Optional[datetime] = None
+    ) -> None:
+        """Отметка активности агента (без обращения к БД)"""
+        seen_at = seen_at or datetime.utcnow()
+        self._observe(agent_id, test_interval, seen_at)
+        # В БД пишет тот worker, который принял запрос
+        self._dirty[agent_id] = seen_at
+        # Worker'ам своего хоста - каждый heartbeat, другим репликам - не чаще
+        # LIVENESS_FLUSH_INTERVAL (точнее они все равно узнают из БД)
+        forwarded = self._forwarded.get(agent_id)
+        local = forwarded is not None and (seen_at - forwarded).total_seconds() < settings.LIVENESS_FLUSH_INTERVAL
+        if not local:
+            self._forwarded[agent_id] = seen_at
+        worker_bus.publish("liveness.heartbeat", {
+            "agent_id": agent_id,
+            "test_interval": test_interval,
+            "seen_at": seen_at.isoformat(),
+        }, local=local)
+
+    def _observe(self, agent_id: str, test_interval: Optional[int], seen_at: datetime) -> None:
+        if seen_at > self._last_seen.get(agent_id, datetime.min):
+            self._last_seen[agent_id] = seen_at
+        if test_interval:
+            self._intervals[agent_id] = test_interval
+
+    def report_resources(self, agent_id: str, metrics: Dict) -> None:
+        """Сводка ресурсов агента; в БД пишется при следующем flush"""
+        self._resources[agent_id] = (metrics, datetime.utcnow())
+
+    def on_remote_heartbeat(self, payload: Dict) -> None:
+        """Heartbeat, принятый другим worker'ом"""
+        self._observe(
+            payload["agent_id"],
+            payload.get("test_interval"),
+            datetime.fromisoformat(payload["seen_at"])
+        )
+
+    def last_seen(self, agent_id: str) -> Optional[datetime]:
+        return self._last_seen.get(agent_id)
+
+    def status(self, agent_id: str, now: Optional[datetime] = None) -> str:
+        """Статус агента: online, stale, offline или unknown"""
+        last_seen = self._last_seen.get(agent_id)
+        if last_seen is None:
+            return "unknown"
+
+        now = now or datetime.utcnow()
+        interval = self._intervals.get(agent_id, settings.DEFAULT_TEST_INTERVAL)
+        age = (now - last_seen).total_seconds()
+
+        if age <= interval * settings.LIVENESS_STALE_FACTOR:
+            return "online"
+        if age <= interval * settings.LIVENESS_OFFLINE_FACTOR:
+            return "stale"
+        return "offline"
+
+    def stale_agents(self, include_offline: bool = True) -> List[Dict]:
+        """Агенты, пропустившие ожидаемые измерения (самые давние первыми)"""
+        now = datetime.utcnow()
+        wanted = ("stale", "offline") if include_offline else ("stale",)
+        result = []
+        for agent_id, last_seen in self._last_seen.items():
+            status = self.status(agent_id, now)
+            if status in wanted:
+                result.append({
+                    "agent_id": agent_id,
+                    "status": status,
+                    "last_seen": last_seen.isoformat(),
+                    "expected_interval": self._intervals.get(
+                        agent_id, settings.DEFAULT_TEST_INTERVAL
+                    ),
+                    "silent_for": round((now - last_seen).total_seconds()),
+                })
+        result.sort(key=lambda a: a["silent_for"], reverse=True)
+        return result
+
+    async def load(self, db: AsyncSession) -> None:
+        """Начальное заполнение из таблицы agents"""
+        result = await db.execute(
+            select(Agent.id, Agent.last_seen, Agent.test_interval).where(
+                Agent.is_active.is_(True)
+            )
+        )
+        for agent_id, last_seen, test_interval in result:
+            if last_seen and last_seen > self._last_seen.get(agent_id, datetime.min):
+                self._last_seen[agent_id] = last_seen
+            if test_interval:
+                self._intervals[agent_id] = test_interval
+        logger.info(f"Liveness tracker loaded {len(self._last_seen)} agents")
+
+    async def refresh(self, db: AsyncSession, since: datetime) -> None:
+        """last_seen из БД (записанные другими репликами) для агентов, активных после since"""
+        result = await db.execute(
+            select(Agent.id, Agent.last_seen).where(Agent.last_seen >= since)
+        )
+        for agent_id, last_seen in result:
+            self._observe(agent_id, None, last_seen)
+
+    async def flush(self, db: AsyncSession) -> None:
+        """Пакетное обновление agents.last_seen и сводок ресурсов"""
+        if not self._dirty and not self._resources:
+            return
+
+        dirty, self._dirty = self._dirty, {}
+        resources, self._resources = self._resources, {}
+        try:
+            if dirty:
+                await db.execute(
+                    update(Agent),
+                    [{"id": agent_id, "last_seen": seen_at} for agent_id, seen_at in dirty.items()]
+                )
+            if resources:
+                await db.execute(
+                    update(Agent),
+                    [
+                        {"id": agent_id, "resource_metrics": metrics, "resource_reported_at": reported_at}
+                        for agent_id, (metrics, reported_at) in resources.items()
+                    ]
+                )
+            await db.commit()
+        except Exception:
+            # Более свежие heartbeat'ы и сводки уже могли появиться - их не затираем
+            for agent_id, seen_at in dirty.items():
+                self._dirty.setdefault(agent_id, seen_at)
+            for agent_id, resource in resources.items():
+                self._resources.setdefault(agent_id, resource)
+            raise
+
+liveness_tracker = LivenessTracker()
+worker_bus.subscribe("liveness.heartbeat", liveness_tracker.on_remote_heartbeat)
+
+async def restore_liveness_tracker() -> None:
+    async with async_session() as db:
+        await liveness_tracker.load(db)
+
+async def flush_liveness_tracker() -> None:
+    async with async_session() as db:
+        await liveness_tracker.flush(db)
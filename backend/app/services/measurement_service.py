@@ -0,0 +1,186 @@
+# app/services/measurement_service.py
+import asyncio
+import base64
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import UUID
+from pydantic import TypeAdapter
+from sqlalchemy import select, and_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.ids import uuid7
+from core.serialization import dumps
+from db.models import Measurement
+from db.schemas import MeasurementCreate, MeasurementEvent, MeasurementOut
+from services.archive_service import get_archive, reaches_archive
+from services.path_service import apply_paths, compact_paths
+from services.rollup_service import apply_rollups
+
+# Колонки MeasurementOut: выборка кортежей вместо ORM-объектов
+# (без identity map и отслеживания изменений)
+MEASUREMENT_COLUMNS = tuple(getattr(Measurement, name) for name in MeasurementOut.model_fields)
+
+measurement_list = TypeAdapter(List[MeasurementOut])
+
+def encode_measurements(rows) -> bytes:
+    """Строки выборки -> JSON-массив MeasurementOut (валидация и кодирование в pydantic-core)"""
+    return measurement_list.dump_json(measurement_list.validate_python(rows, from_attributes=True))
+
+# Ограничение строк из metainfo агента в событии измерения
+EVENT_FIELD_LIMIT = 256
+
+def measurement_event(row: Dict, location: Optional[str]) -> Dict:
+    """Вставленное измерение -> сводка для событий (MeasurementEvent)"""
+    metainfo = row.get("metainfo") or {}
+
+    def text(key: str) -> Optional[str]:
+        value = metainfo.get(key)
+        return value[:EVENT_FIELD_LIMIT] if isinstance(value, str) else None
+
+    return MeasurementEvent(
+        **{name: row[name] for name in MeasurementEvent.model_fields if name in row},
+        location=location,
+        external_ip=text("external_ip"),
+        test_server=text("test_server"),
+        targets_only=bool(metainfo.get("targets_only"))
+    ).model_dump(mode="json")
+
+def _naive_utc(value: Optional[datetime]) -> datetime:
+    """Колонка timestamp хранит UTC без часового пояса"""
+    if value is None:
+        return datetime.utcnow()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class MeasurementService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        # Часовые агрегаты, обновленные последним ingest
+        self.rollups: List[Dict] = []
+
+    async def ingest(self, agent_id: str, measurements: List[MeasurementCreate]) -> List[Dict]:
+        """
+        Идемпотентная вставка пачки измерений агента
+
+        Измерения с уже сохраненным ID пропускаются (ON CONFLICT DO NOTHING),
+        поэтому повторная отправка пачки агентом не создает дубликатов.
+
+        Returns:
+            Вставленные измерения (повторы не включаются)
+        """
+        if not measurements:
+            return []
+        rows = []
+        for measurement in measurements:
+            row = measurement.model_dump()
+            row["id"] = measurement.id or uuid7()
+            row["timestamp"] = _naive_utc(measurement.timestamp)
+            row["agent_id"] = agent_id
+            rows.append(row)
+        # Список хопов трассировки хранится один раз на маршрут агента
+        paths = compact_paths(rows)
+
+        stmt = (
+            insert(Measurement)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[Measurement.id])
+            .returning(*MEASUREMENT_COLUMNS)
+        )
+        inserted = [dict(row) for row in (await self.db.execute(stmt)).mappings()]
+        # Часовые агрегаты для групповых отчетов - в той же транзакции
+        self.rollups = await apply_rollups(self.db, inserted)
+        await apply_paths(self.db, paths, inserted)
+        await self.db.commit()
+        return inserted
+
+    def _filtered(
+        self,
+        agent_id: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime]
+    ):
+        conditions = []
+        if agent_id:
+            conditions.append(Measurement.agent_id == agent_id)
+        if since:
+            conditions.append(Measurement.timestamp >= since)
+        if until:
+            conditions.append(Measurement.timestamp <= until)
+        query = select(*MEASUREMENT_COLUMNS)
+        if conditions:
+            query = query.where(and_(*conditions))
+        return query
+
+    async def list_page(
+        self,
+        agent_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> bytes:
+        """
+        Страница измерений (новые первыми) с keyset-пагинацией
+        по (timestamp, id)
+
+        Returns:
+            Готовый JSON {"items": [...], "next_cursor": str | null}
+        """
+        query = self._filtered(agent_id, since, until)
+        if cursor:
+            last_timestamp, last_id = self._decode_cursor(cursor)
+            query = query.where(
+                tuple_(Measurement.timestamp, Measurement.id) < tuple_(last_timestamp, last_id)
+            )
+        query = query.order_by(Measurement.timestamp.desc(), Measurement.id.desc()).limit(limit + 1)
+
+        rows = (await self.db.execute(query)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+        return b'{"items":' + encode_measurements(rows) + b',"next_cursor":' + dumps(next_cursor) + b"}"
+
+    async def export_ndjson(
+        self,
+        agent_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[bytes]:
+        """
+        Потоковая выгрузка измерений в NDJSON (серверный курсор, пачками).
+        Если период захватывает данные старше горячего окна, сначала
+        выгружается архив (Parquet), затем БД
+        """
+        if reaches_archive(since):
+            batches = get_archive().scan(since, until, agent_id, batch_size)
+            while True:
+                # Чтение Parquet блокирующее - в отдельном потоке
+                rows = await asyncio.to_thread(next, batches, None)
+                if rows is None:
+                    break
+                yield b"".join(dumps(row) + b"\n" for row in rows)
+
+        query = self._filtered(agent_id, since, until).order_by(Measurement.timestamp)
+        result = await self.db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.mappings().partitions(batch_size):
+            yield b"".join(dumps(dict(row)) + b"\n" for row in rows)
+
+    @staticmethod
+    def _encode_cursor(timestamp: datetime, measurement_id: UUID) -> str:
+        """Кодирование ключа последней строки страницы"""
+        raw = json.dumps([timestamp.isoformat(), str(measurement_id)]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        """Декодирование курсора страницы"""
+        try:
+            timestamp, measurement_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(timestamp), UUID(measurement_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
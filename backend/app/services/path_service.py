@@ -0,0 +1,103 @@
+# app/services/path_service.py
+import hashlib
+import json
+from typing import Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import NetworkPath
+
+def path_hash(target: str, hops: List[Optional[str]]) -> str:
+    return hashlib.sha256(json.dumps([target, hops]).encode()).hexdigest()[:16]
+
+def compact_paths(rows: List[Dict]) -> Dict:
+    """
+    Замена трассировки в metainfo измерений на ссылку на маршрут
+    (path_hash) плюс RTT/потери по хопам; возвращает маршруты
+    по ID измерений для apply_paths
+    """
+    paths = {}
+    for row in rows:
+        path = (row.get("metainfo") or {}).get("path")
+        if not isinstance(path, dict) or not path.get("hops"):
+            continue
+        target = str(path.get("target") or "")
+        hops = path["hops"]
+        key = path_hash(target, hops)
+        row["metainfo"]["path"] = {
+            "id": key,
+            "reached": path.get("reached"),
+            "rtt": path.get("rtt"),
+            "loss": path.get("loss"),
+        }
+        paths[row["id"]] = {
+            "agent_id": row["agent_id"],
+            "path_hash": key,
+            "target": target,
+            "hops": hops,
+            "timestamp": row["timestamp"],
+        }
+    return paths
+
+async def apply_paths(db: AsyncSession, paths: Dict, inserted: List[Dict]) -> None:
+    """
+    Учет маршрутов вставленных измерений (без commit; повторно
+    присланные измерения не увеличивают seen_count)
+    """
+    merged: Dict[tuple, Dict] = {}
+    for row in inserted:
+        path = paths.get(row["id"])
+        if path is None:
+            continue
+        key = (path["agent_id"], path["path_hash"])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = {
+                "agent_id": path["agent_id"],
+                "path_hash": path["path_hash"],
+                "target": path["target"],
+                "hops": path["hops"],
+                "first_seen": path["timestamp"],
+                "last_seen": path["timestamp"],
+                "seen_count": 1,
+            }
+        else:
+            current["first_seen"] = min(current["first_seen"], path["timestamp"])
+            current["last_seen"] = max(current["last_seen"], path["timestamp"])
+            current["seen_count"] += 1
+    if not merged:
+        return
+
+    # Порядок ключей одинаков во всех транзакциях - без взаимных блокировок
+    stmt = insert(NetworkPath).values([merged[key] for key in sorted(merged)])
+    table = NetworkPath.__table__
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.agent_id, table.c.path_hash],
+            set_={
+                "first_seen": func.least(table.c.first_seen, stmt.excluded.first_seen),
+                "last_seen": func.greatest(table.c.last_seen, stmt.excluded.last_seen),
+                "seen_count": table.c.seen_count + stmt.excluded.seen_count,
+            }
+        )
+    )
+
+async def list_agent_paths(db: AsyncSession, agent_id: str, limit: int = 20) -> List[Dict]:
+    """Маршруты агента, последние использованные первыми"""
+    result = await db.execute(
+        select(NetworkPath)
+        .where(NetworkPath.agent_id == agent_id)
+        .order_by(NetworkPath.last_seen.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "id": path.path_hash,
+            "target": path.target,
+            "hops": path.hops,
+            "first_seen": path.first_seen,
+            "last_seen": path.last_seen,
+            "seen_count": path.seen_count,
+        }
+        for path in result.scalars()
+    ]
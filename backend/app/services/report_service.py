@@ -0,0 +1,289 @@
+# app/services/report_service.py
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+from sqlalchemy import Float, delete, func, select, update, and_, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.coordination import leader, worker_bus
+from core.logger import logger
+from db.models import AgentGroupMember, HourlyRollup, ReportJob
+from db.schemas import ReportRequest
+from db.session import async_session, set_statement_timeout
+from services.archive_service import PARTIAL_METRICS
+
+REPORT_RANGES = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(days=1),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+    "365d": timedelta(days=365),
+}
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def report_params(request: ReportRequest, now: Optional[datetime] = None) -> Dict:
+    """
+    Нормализованные параметры отчета. Границы округляются до часа
+    (отчеты строятся по часовым rollup'ам), поэтому одинаковые запросы
+    в течение часа получают один и тот же отчет
+    """
+    until = _utc(request.until) if request.until else (now or datetime.utcnow())
+    if request.since:
+        since = _utc(request.since)
+    else:
+        since = until - REPORT_RANGES[request.time_range or "24h"]
+
+    since = _floor_hour(since)
+    if until != _floor_hour(until):
+        until = _floor_hour(until) + timedelta(hours=1)
+    if since >= until:
+        raise ValueError("since must be earlier than until")
+
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "group_by": request.group_by,
+        "interval": request.interval,
+        "metrics": sorted(request.metrics or PARTIAL_METRICS),
+    }
+
+def params_hash(params: Dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+async def submit_report(db: AsyncSession, request: ReportRequest) -> ReportJob:
+    """
+    Постановка отчета в очередь. Если такой же отчет уже выполняется
+    или недавно готов - возвращается он
+    """
+    params = report_params(request)
+    digest = params_hash(params)
+
+    fresh_after = datetime.utcnow() - timedelta(seconds=settings.REPORT_RESULT_TTL)
+    existing = await db.scalar(
+        select(ReportJob).where(
+            and_(
+                ReportJob.params_hash == digest,
+                or_(
+                    ReportJob.status.in_(("pending", "running")),
+                    and_(ReportJob.status == "done", ReportJob.finished_at >= fresh_after)
+                )
+            )
+        ).order_by(ReportJob.created_at.desc()).limit(1)
+    )
+    if existing is not None:
+        return existing
+
+    job = ReportJob(params_hash=digest, params=params, status="pending")
+    db.add(job)
+    await db.commit()
+
+    # Отчеты выполняет leader: будим его, в каком бы worker'е он ни был
+    report_pool.notify()
+    worker_bus.publish("reports.submitted", {})
+    return job
+
+async def build_report(db: AsyncSession, params: Dict) -> Dict:
+    """Расчет отчета по часовым rollup'ам (переживают архивацию измерений)"""
+    since = datetime.fromisoformat(params["since"])
+    until = datetime.fromisoformat(params["until"])
+    group_by = params["group_by"]
+    interval = params["interval"]
+    metrics: List[str] = params["metrics"]
+
+    def avg(metric: str):
+        total = func.sum(getattr(HourlyRollup, f"{metric}_sum"))
+        count = func.sum(getattr(HourlyRollup, f"{metric}_count"))
+        return total / func.nullif(count, 0, type_=Float)
+
+    keys = []
+    conditions = [HourlyRollup.hour >= since, HourlyRollup.hour < until]
+    if group_by == "agent":
+        keys.append(HourlyRollup.agent_id.label("group"))
+    elif group_by in ("location", "tag"):
+        keys.append(AgentGroupMember.group_key.label("group"))
+        conditions.append(AgentGroupMember.group_key.startswith(f"{group_by}:"))
+    if interval:
+        keys.append(func.date_trunc(interval, HourlyRollup.hour).label("bucket"))
+
+    columns = [
+        *keys,
+        func.count(func.distinct(HourlyRollup.agent_id)).label("active_agents"),
+        func.sum(HourlyRollup.measurement_count).label("measurement_count"),
+        *[avg(metric).label(f"avg_{metric}") for metric in metrics],
+    ]
+    if "download" in metrics:
+        columns += [
+            func.min(HourlyRollup.download_min).label("min_download"),
+            func.max(HourlyRollup.download_max).label("max_download"),
+        ]
+
+    query = select(*columns).select_from(HourlyRollup)
+    if group_by in ("location", "tag"):
+        query = query.join(AgentGroupMember, AgentGroupMember.agent_id == HourlyRollup.agent_id)
+    query = query.where(and_(*conditions))
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+
+    prefix_length = len(group_by) + 1
+    rows = []
+    for row in (await db.execute(query)).mappings():
+        item = {}
+        if group_by == "global":
+            item["group"] = "all"
+        elif group_by == "agent":
+            item["group"] = row["group"]
+        else:
+            item["group"] = row["group"][prefix_length:]
+        if interval:
+            item["bucket"] = row["bucket"].isoformat()
+        item["active_agents"] = row["active_agents"]
+        item["measurement_count"] = row["measurement_count"] or 0
+        for metric in metrics:
+            value = row[f"avg_{metric}"]
+            item[f"avg_{metric}"] = round(value, 2) if value is not None else None
+        if "download" in metrics:
+            item["min_download"] = row["min_download"]
+            item["max_download"] = row["max_download"]
+        rows.append(item)
+
+    return {"rows": rows, "generated_at": datetime.utcnow().isoformat()}
+
+async def _claim_next_job() -> Optional[Row]:
+    """Захват следующего отчета из очереди (SKIP LOCKED - без гонок между исполнителями)"""
+    async with async_session() as db:
+        next_id = select(ReportJob.id).where(
+            ReportJob.status == "pending"
+        ).order_by(ReportJob.created_at).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        result = await db.execute(
+            update(ReportJob).where(
+                ReportJob.id == next_id
+            ).values(
+                status="running",
+                started_at=datetime.utcnow()
+            ).returning(ReportJob.id, ReportJob.params, ReportJob.started_at)
+        )
+        job = result.first()
+        await db.commit()
+        return job
+
+async def _run_job(job_id: UUID, params: Dict, started_at: datetime) -> None:
+    result, error = None, None
+    try:
+        async with async_session() as db:
+            await set_statement_timeout(db, settings.REPORT_STATEMENT_TIMEOUT)
+            result = await build_report(db, params)
+    except Exception as e:
+        if "statement timeout" in str(e):
+            error = f"Report exceeded {settings.REPORT_STATEMENT_TIMEOUT}s statement timeout"
+        else:
+            error = str(e)
+        logger.error(f"Report {job_id} failed: {error}")
+
+    async with async_session() as db:
+        # Отчет, возвращенный в очередь как зависший, мог быть захвачен заново:
+        # результат записывает только последний захват
+        await db.execute(
+            update(ReportJob).where(
+                ReportJob.id == job_id,
+                ReportJob.started_at == started_at
+            ).values(
+                status="failed" if error else "done",
+                result=result,
+                error=error,
+                finished_at=datetime.utcnow()
+            )
+        )
+        await db.commit()
+    if not error:
+        logger.info(f"Report {job_id} done ({len(result['rows'])} rows)")
+
+class ReportWorkerPool:
+    """
+    Ограниченный пул исполнителей отчетов. Исполнители работают только
+    в leader-процессе, поэтому одновременно выполняется не больше
+    REPORT_WORKERS отчетов на хост, и интерактивные запросы других
+    worker'ов не ждут долгих расчетов
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        for number in range(self.size):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"report-worker-{number}"))
+        logger.info(f"Report worker pool started ({self.size} workers)")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _worker(self) -> None:
+        while True:
+            if leader.is_leader:
+                try:
+                    job = await _claim_next_job()
+                except Exception as e:
+                    logger.error(f"Report queue polling failed: {str(e)}")
+                    job = None
+                if job is not None:
+                    await _run_job(job.id, job.params, job.started_at)
+                    continue
+            # Новый отчет будит исполнителей; опрос - на случай потерянного сигнала
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.REPORT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+report_pool = ReportWorkerPool(settings.REPORT_WORKERS)
+
+worker_bus.subscribe("reports.submitted", lambda payload: report_pool.notify())
+
+async def requeue_orphaned_reports() -> None:
+    """
+    Возврат в очередь отчетов, которые выполнял прежний leader и не
+    завершил (вызывается при получении лидерства и периодически).
+    Прежний leader может быть еще жив и дописывать отчет, поэтому
+    возвращаются только отчеты, запущенные раньше, чем длится самый
+    долгий запрос (REPORT_STATEMENT_TIMEOUT) плюс запас
+    """
+    cutoff = datetime.utcnow() - timedelta(
+        seconds=settings.REPORT_STATEMENT_TIMEOUT + settings.REPORT_ORPHAN_MARGIN
+    )
+    async with async_session() as db:
+        result = await db.execute(
+            update(ReportJob).where(
+                ReportJob.status == "running",
+                or_(ReportJob.started_at < cutoff, ReportJob.started_at.is_(None))
+            ).values(status="pending")
+        )
+        await db.commit()
+    if result.rowcount:
+        logger.warning(f"Requeued {result.rowcount} interrupted reports")
+        report_pool.notify()
+
+async def delete_old_reports() -> None:
+    """Фоновая задача: удаление старых отчетов"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.REPORT_RETENTION_DAYS)
+    async with async_session() as db:
+        await db.execute(delete(ReportJob).where(ReportJob.created_at < cutoff))
+        await db.commit()
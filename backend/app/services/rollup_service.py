@@ -0,0 +1,176 @@
+# app/services/rollup_service.py
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, func, select, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.logger import logger
+from db.models import Agent, AgentGroupMember, HourlyRollup, Measurement
+from db.session import async_session
+from services.archive_service import PARTIAL_METRICS, merge_partial
+
+# Типы групп агентов: префикс group_key
+GROUP_KINDS = ("location", "tag")
+
+def group_keys(location: Optional[str], tags: Optional[Iterable[str]]) -> List[str]:
+    """Группы, в которые входит агент"""
+    keys = []
+    if location:
+        keys.append(f"location:{location}")
+    for tag in tags or []:
+        keys.append(f"tag:{tag}")
+    return sorted(set(keys))
+
+async def sync_group_membership(db: AsyncSession, agent: Agent) -> None:
+    """Обновление членства агента в группах (без commit)"""
+    await db.execute(delete(AgentGroupMember).where(AgentGroupMember.agent_id == agent.id))
+    keys = group_keys(agent.location, agent.tags)
+    if keys:
+        await db.execute(
+            insert(AgentGroupMember).values(
+                [{"group_key": key, "agent_id": agent.id} for key in keys]
+            )
+        )
+
+async def rebuild_group_membership(db: AsyncSession) -> int:
+    """Пересчет членства всех агентов в группах (после массовой загрузки агентов)"""
+    await db.execute(delete(AgentGroupMember))
+    result = await db.execute(select(Agent.id, Agent.location, Agent.tags))
+    members = [
+        {"group_key": key, "agent_id": agent.id}
+        for agent in result
+        for key in group_keys(agent.location, agent.tags)
+    ]
+    if members:
+        await db.execute(insert(AgentGroupMember), members)
+    await db.commit()
+    return len(members)
+
+def _truncate_hour(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def hourly_partials(rows: Iterable[Dict]) -> List[Dict]:
+    """Частичные агрегаты (agent_id, час) по новым измерениям"""
+    partials: Dict[tuple, Dict] = {}
+    for row in rows:
+        partial = {"measurement_count": 1}
+        for metric in PARTIAL_METRICS:
+            value = row.get(metric)
+            partial[f"{metric}_sum"] = value
+            partial[f"{metric}_count"] = 0 if value is None else 1
+        partial["download_min"] = row.get("download")
+        partial["download_max"] = row.get("download")
+        key = (row["agent_id"], _truncate_hour(row["timestamp"]))
+        merge_partial(partials, key, partial)
+
+    # Порядок ключей одинаков во всех транзакциях - без взаимных блокировок
+    return [
+        {"agent_id": agent_id, "hour": hour, **partial}
+        for (agent_id, hour), partial in sorted(partials.items())
+    ]
+
+async def apply_rollups(db: AsyncSession, rows: List[Dict]) -> List[Dict]:
+    """
+    Инкрементальное обновление часовых агрегатов новыми измерениями
+    (в той же транзакции, что и вставка измерений, без commit).
+    Возвращает обновленные агрегаты (agent_id, hour)
+    """
+    partials = hourly_partials(rows)
+    if not partials:
+        return []
+
+    stmt = insert(HourlyRollup).values(partials)
+    table = HourlyRollup.__table__
+    excluded = stmt.excluded
+
+    def add(column: str):
+        # NULL + x = NULL в SQL, поэтому складываем через coalesce
+        return func.coalesce(table.c[column], 0) + func.coalesce(excluded[column], 0)
+
+    updates = {"measurement_count": table.c.measurement_count + excluded.measurement_count}
+    for metric in PARTIAL_METRICS:
+        updates[f"{metric}_sum"] = add(f"{metric}_sum")
+        updates[f"{metric}_count"] = add(f"{metric}_count")
+    updates["download_min"] = func.least(table.c.download_min, excluded.download_min)
+    updates["download_max"] = func.greatest(table.c.download_max, excluded.download_max)
+
+    result = await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[HourlyRollup.agent_id, HourlyRollup.hour],
+            set_=updates
+        ).returning(*table.columns)
+    )
+    return [dict(row) for row in result.mappings()]
+
+def rollup_event(rollup: Dict, groups: List[str]) -> Dict:
+    """
+    Событие живой ленты об обновленном часовом агрегате агента: частичные
+    суммы (для слияния на клиенте), средние и группы агента, в которые он входит
+    """
+    event = {**rollup, "hour": rollup["hour"].isoformat(), "groups": groups}
+    for metric in PARTIAL_METRICS:
+        count = rollup.get(f"{metric}_count")
+        event[f"avg_{metric}"] = round(rollup[f"{metric}_sum"] / count, 2) if count else None
+    return event
+
+async def rebuild_rollups(
+    db: AsyncSession,
+    since: datetime,
+    until: datetime,
+    agent_id: Optional[str] = None
+) -> None:
+    """
+    Пересчет часовых агрегатов из сырых измерений (заполнение истории,
+    исправление после ручных правок данных). Часы диапазона перезаписываются
+    """
+    hour = func.date_trunc("hour", Measurement.timestamp)
+    columns = [
+        Measurement.agent_id,
+        hour.label("hour"),
+        func.count().label("measurement_count"),
+        func.min(Measurement.download).label("download_min"),
+        func.max(Measurement.download).label("download_max"),
+    ]
+    for metric in PARTIAL_METRICS:
+        column = getattr(Measurement, metric)
+        columns += [
+            func.sum(column).label(f"{metric}_sum"),
+            func.count(column).label(f"{metric}_count"),
+        ]
+    conditions = [Measurement.timestamp >= since, Measurement.timestamp < until]
+    if agent_id:
+        conditions.append(Measurement.agent_id == agent_id)
+
+    # Блокировка агрегатов диапазона: идущие вставки измерений (apply_rollups)
+    # сначала завершатся и попадут в пересчет, новые подождут его commit
+    # и добавятся к пересчитанным значениям, а не будут перезаписаны
+    locked = [HourlyRollup.hour >= _truncate_hour(since), HourlyRollup.hour < until]
+    if agent_id:
+        locked.append(HourlyRollup.agent_id == agent_id)
+    await db.execute(select(HourlyRollup.agent_id).where(and_(*locked)).with_for_update())
+
+    source = select(*columns).where(and_(*conditions)).group_by(Measurement.agent_id, hour)
+    names = [column.name for column in source.selected_columns]
+    stmt = insert(HourlyRollup).from_select(names, source)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[HourlyRollup.agent_id, HourlyRollup.hour],
+            set_={name: stmt.excluded[name] for name in names if name not in ("agent_id", "hour")}
+        )
+    )
+    await db.commit()
+
+async def rebuild_recent_rollups() -> None:
+    """
+    Пересчет агрегатов за последние ROLLUP_REBUILD_HOURS часов (при получении
+    лидерства). При выкатке старые реплики еще пишут измерения без агрегатов
+    после заполнения истории миграцией; новый leader досчитывает эти часы
+    """
+    if settings.ROLLUP_REBUILD_HOURS <= 0:
+        return
+    until = _truncate_hour(datetime.utcnow()) + timedelta(hours=1)
+    since = until - timedelta(hours=settings.ROLLUP_REBUILD_HOURS)
+    async with async_session() as db:
+        await rebuild_rollups(db, since, until)
+    logger.info(f"Rebuilt hourly rollups since {since.isoformat()}")
@@ -1,9 +1,24 @@
 # app/services/stats_service.py
+import asyncio
+import base64
+import json
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-from sqlalchemy import func, select, and_
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
+from sqlalchemy import Float, func, select, and_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.models import Measurement
+from db.models import Measurement, Agent, AgentGroupMember, HourlyRollup
+from services.archive_service import PARTIAL_METRICS, get_archive, merge_partial, reaches_archive
+
+# Метрики, по которым можно сортировать сравнение агентов
+AGENT_SORT_METRICS = (
+    "avg_latency",
+    "avg_download",
+    "avg_upload",
+    "avg_packet_loss",
+    "avg_jitter",
+    "measurement_count",
+)
 
 async def calculate_stats(
     db: AsyncSession,
@@ -32,23 +47,27 @@ class StatsService:
         end_time = datetime.utcnow()
         start_time = self._calculate_start_time(end_time, time_range)
 
-        result = await self.db.execute(
-            select(
-                func.avg(Measurement.latency).label("avg_latency"),
-                func.avg(Measurement.download).label("avg_download"),
-                func.avg(Measurement.upload).label("avg_upload"),
-                func.avg(Measurement.packet_loss).label("avg_packet_loss"),
-                func.count().label("measurement_count")
-            ).where(
-                and_(
-                    Measurement.agent_id == agent_id,
-                    Measurement.timestamp >= start_time,
-                    Measurement.timestamp <= end_time
+        if reaches_archive(start_time):
+            partials = await self._partials(start_time, end_time, agent_id)
+            stats = self._averages(partials.get(agent_id, {}))
+        else:
+            result = await self.db.execute(
+                select(
+                    func.avg(Measurement.latency).label("avg_latency"),
+                    func.avg(Measurement.download).label("avg_download"),
+                    func.avg(Measurement.upload).label("avg_upload"),
+                    func.avg(Measurement.packet_loss).label("avg_packet_loss"),
+                    func.count().label("measurement_count")
+                ).where(
+                    and_(
+                        Measurement.agent_id == agent_id,
+                        Measurement.timestamp >= start_time,
+                        Measurement.timestamp <= end_time
+                    )
                 )
             )
-        )
+            stats = result.first()
 
-        stats = result.first()
         return {
             "agent_id": agent_id,
             "time_range": time_range,
@@ -69,22 +88,30 @@ class StatsService:
         end_time = datetime.utcnow()
         start_time = self._calculate_start_time(end_time, time_range)
 
-        # Основные метрики
-        result = await self.db.execute(
-            select(
-                func.count(func.distinct(Measurement.agent_id)).label("active_agents"),
-                func.avg(Measurement.latency).label("avg_latency"),
-                func.max(Measurement.download).label("max_download"),
-                func.min(Measurement.download).label("min_download")
-            ).where(
-                and_(
-                    Measurement.timestamp >= start_time,
-                    Measurement.timestamp <= end_time
+        if reaches_archive(start_time):
+            partials = await self._partials(start_time, end_time)
+            total: Dict[str, Dict] = {}
+            for partial in partials.values():
+                merge_partial(total, "all", partial)
+            stats = self._averages(total.get("all", {}))
+            stats.active_agents = len(partials)
+        else:
+            # Основные метрики
+            result = await self.db.execute(
+                select(
+                    func.count(func.distinct(Measurement.agent_id)).label("active_agents"),
+                    func.avg(Measurement.latency).label("avg_latency"),
+                    func.max(Measurement.download).label("max_download"),
+                    func.min(Measurement.download).label("min_download")
+                ).where(
+                    and_(
+                        Measurement.timestamp >= start_time,
+                        Measurement.timestamp <= end_time
+                    )
                 )
             )
-        )
+            stats = result.first()
 
-        stats = result.first()
         return {
             "time_range": time_range,
             "active_agents": stats.active_agents or 0,
@@ -95,6 +122,318 @@ class StatsService:
             "end_time": end_time.isoformat()
         }
 
+    async def get_agents_stats(
+        self,
+        time_range: str = "24h",
+        sort_by: str = "avg_latency",
+        order: str = "desc",
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Сравнение агентов: агрегаты по всем агентам одним запросом
+        (GROUP BY agent_id + JOIN agents), с сортировкой по метрике,
+        выборкой top-K и постраничной навигацией по ключу (keyset).
+        Конец периода первой страницы передается в курсоре, чтобы окно
+        агрегации не сдвигалось между страницами
+        """
+        if sort_by not in AGENT_SORT_METRICS:
+            raise ValueError(f"sort_by must be one of {AGENT_SORT_METRICS}")
+
+        after = None
+        end_time = None
+        if cursor:
+            last_value, last_agent_id, end_time = self._decode_cursor(cursor)
+            after = (last_value, last_agent_id)
+        end_time = end_time or datetime.utcnow()
+        start_time = self._calculate_start_time(end_time, time_range)
+
+        if reaches_archive(start_time):
+            rows, has_more = await self._agents_from_partials(
+                start_time, end_time, sort_by, order, limit, after
+            )
+        else:
+            rows, has_more = await self._agents_from_db(
+                start_time, end_time, sort_by, order, limit, after
+            )
+
+        agents = []
+        for row in rows:
+            agents.append({
+                "agent_id": row.agent_id,
+                "name": row.name,
+                "location": row.location,
+                "avg_latency": round(row.avg_latency or 0, 2),
+                "avg_download": round(row.avg_download or 0, 2),
+                "avg_upload": round(row.avg_upload or 0, 2),
+                "avg_packet_loss": round(row.avg_packet_loss or 0, 2),
+                "avg_jitter": round(row.avg_jitter or 0, 2),
+                "measurement_count": row.measurement_count or 0,
+                "last_measurement": (
+                    row.last_measurement.isoformat() if row.last_measurement else None
+                )
+            })
+
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = self._encode_cursor(getattr(last, sort_by) or 0, last.agent_id, end_time)
+
+        return {
+            "time_range": time_range,
+            "sort_by": sort_by,
+            "order": order,
+            "agents": agents,
+            "next_cursor": next_cursor,
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat()
+        }
+
+    async def get_groups_stats(
+        self,
+        kind: str = "location",
+        time_range: str = "24h",
+        group: Optional[str] = None
+    ) -> Dict:
+        """
+        Агрегаты по группам агентов (город, офис, тег) одним запросом:
+        часовые rollup'ы JOIN членство в группах. Границы периода
+        округляются до часа
+        """
+        end_time = datetime.utcnow()
+        start_time = self._calculate_start_time(end_time, time_range)
+        start_hour = start_time.replace(minute=0, second=0, microsecond=0)
+
+        def avg(metric: str):
+            total = func.sum(getattr(HourlyRollup, f"{metric}_sum"))
+            count = func.sum(getattr(HourlyRollup, f"{metric}_count"))
+            return total / func.nullif(count, 0, type_=Float)
+
+        prefix = f"{kind}:"
+        conditions = [HourlyRollup.hour >= start_hour, HourlyRollup.hour <= end_time]
+        if group is not None:
+            conditions.append(AgentGroupMember.group_key == prefix + group)
+        else:
+            conditions.append(AgentGroupMember.group_key.startswith(prefix))
+
+        result = await self.db.execute(
+            select(
+                AgentGroupMember.group_key,
+                func.count(func.distinct(HourlyRollup.agent_id)).label("active_agents"),
+                func.sum(HourlyRollup.measurement_count).label("measurement_count"),
+                *[avg(metric).label(f"avg_{metric}") for metric in PARTIAL_METRICS],
+                func.min(HourlyRollup.download_min).label("min_download"),
+                func.max(HourlyRollup.download_max).label("max_download")
+            ).select_from(
+                HourlyRollup
+            ).join(
+                AgentGroupMember, AgentGroupMember.agent_id == HourlyRollup.agent_id
+            ).where(
+                and_(*conditions)
+            ).group_by(
+                AgentGroupMember.group_key
+            ).order_by(
+                AgentGroupMember.group_key
+            )
+        )
+
+        groups = []
+        for row in result:
+            groups.append({
+                "group": row.group_key[len(prefix):],
+                "active_agents": row.active_agents,
+                "measurement_count": row.measurement_count or 0,
+                **{
+                    f"avg_{metric}": round(getattr(row, f"avg_{metric}") or 0, 2)
+                    for metric in PARTIAL_METRICS
+                },
+                "min_download": round(row.min_download or 0, 2),
+                "max_download": round(row.max_download or 0, 2)
+            })
+
+        return {
+            "kind": kind,
+            "time_range": time_range,
+            "groups": groups,
+            "start_time": start_hour.isoformat(),
+            "end_time": end_time.isoformat()
+        }
+
+    async def _agents_from_db(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        sort_by: str,
+        order: str,
+        limit: int,
+        after: Optional[Tuple]
+    ):
+        """Страница сравнения агентов целиком в SQL (период в горячем окне)"""
+        per_agent = (
+            select(
+                Measurement.agent_id.label("agent_id"),
+                func.avg(Measurement.latency).label("avg_latency"),
+                func.avg(Measurement.download).label("avg_download"),
+                func.avg(Measurement.upload).label("avg_upload"),
+                func.avg(Measurement.packet_loss).label("avg_packet_loss"),
+                func.avg(Measurement.jitter).label("avg_jitter"),
+                func.count().label("measurement_count"),
+                func.max(Measurement.timestamp).label("last_measurement")
+            ).where(
+                and_(
+                    Measurement.timestamp >= start_time,
+                    Measurement.timestamp <= end_time
+                )
+            ).group_by(Measurement.agent_id)
+        ).subquery()
+
+        # NULL (все пробы неудачны) сортируем как 0, чтобы ключ был однозначным
+        sort_key = func.coalesce(per_agent.c[sort_by], 0)
+        key = tuple_(sort_key, per_agent.c.agent_id)
+
+        query = select(
+            per_agent,
+            Agent.name,
+            Agent.location
+        ).select_from(
+            per_agent.outerjoin(Agent, Agent.id == per_agent.c.agent_id)
+        )
+
+        if after:
+            if order == "desc":
+                query = query.where(key < tuple_(*after))
+            else:
+                query = query.where(key > tuple_(*after))
+
+        if order == "desc":
+            query = query.order_by(sort_key.desc(), per_agent.c.agent_id.desc())
+        else:
+            query = query.order_by(sort_key.asc(), per_agent.c.agent_id.asc())
+
+        # Берем на одну строку больше, чтобы понять, есть ли следующая страница
+        result = await self.db.execute(query.limit(limit + 1))
+        rows = result.all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, has_more
+
+    async def _agents_from_partials(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        sort_by: str,
+        order: str,
+        limit: int,
+        after: Optional[Tuple]
+    ):
+        """
+        Страница сравнения агентов, когда период захватывает архив:
+        агрегаты БД и Parquet сливаются, сортировка и keyset - в памяти
+        (по одной строке на агента)
+        """
+        partials = await self._partials(start_time, end_time)
+        rows = []
+        for agent_id, partial in partials.items():
+            row = self._averages(partial)
+            row.agent_id = agent_id
+            rows.append(row)
+
+        def sort_key(row):
+            return (getattr(row, sort_by) or 0, row.agent_id)
+
+        if after:
+            if order == "desc":
+                rows = [row for row in rows if sort_key(row) < after]
+            else:
+                rows = [row for row in rows if sort_key(row) > after]
+        rows.sort(key=sort_key, reverse=(order == "desc"))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        if rows:
+            result = await self.db.execute(
+                select(Agent.id, Agent.name, Agent.location).where(
+                    Agent.id.in_([row.agent_id for row in rows])
+                )
+            )
+            agents = {agent.id: agent for agent in result}
+            for row in rows:
+                agent = agents.get(row.agent_id)
+                row.name = agent.name if agent else None
+                row.location = agent.location if agent else None
+        return rows, has_more
+
+    async def _partials(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        agent_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        Частичные агрегаты (sum/count/min/max) по агентам из БД и архива.
+        Архивированные строки удалены из БД, поэтому части не пересекаются
+        """
+        columns = [
+            Measurement.agent_id,
+            func.count().label("timestamp_count"),
+            func.max(Measurement.timestamp).label("timestamp_max"),
+            func.min(Measurement.download).label("download_min"),
+            func.max(Measurement.download).label("download_max"),
+        ]
+        for metric in PARTIAL_METRICS:
+            column = getattr(Measurement, metric)
+            columns += [
+                func.sum(column).label(f"{metric}_sum"),
+                func.count(column).label(f"{metric}_count"),
+            ]
+        conditions = [Measurement.timestamp >= start_time, Measurement.timestamp <= end_time]
+        if agent_id:
+            conditions.append(Measurement.agent_id == agent_id)
+
+        result = await self.db.execute(
+            select(*columns).where(and_(*conditions)).group_by(Measurement.agent_id)
+        )
+        partials: Dict[str, Dict] = {}
+        for row in result.mappings():
+            merge_partial(partials, row["agent_id"], dict(row))
+
+        # Чтение Parquet блокирующее - в отдельном потоке
+        archived = await asyncio.to_thread(get_archive().aggregate, start_time, end_time, agent_id)
+        for archived_agent_id, partial in archived.items():
+            merge_partial(partials, archived_agent_id, partial)
+        return partials
+
+    @staticmethod
+    def _averages(partial: Dict) -> SimpleNamespace:
+        """Итоговые показатели из частичных агрегатов (поля как у строк SQL-запросов)"""
+        values = {}
+        for metric in PARTIAL_METRICS:
+            count = partial.get(f"{metric}_count")
+            values[f"avg_{metric}"] = partial[f"{metric}_sum"] / count if count else None
+        return SimpleNamespace(
+            **values,
+            measurement_count=partial.get("timestamp_count", 0),
+            last_measurement=partial.get("timestamp_max"),
+            max_download=partial.get("download_max"),
+            min_download=partial.get("download_min")
+        )
+
+    @staticmethod
+    def _encode_cursor(value, agent_id: str, end_time: datetime) -> str:
+        """Кодирование ключа последней строки страницы и конца периода"""
+        raw = json.dumps([value, agent_id, end_time.isoformat()]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        """Декодирование курсора страницы (курсоры без конца периода - как раньше)"""
+        try:
+            value, agent_id, *rest = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            end_time = datetime.fromisoformat(rest[0]) if rest else None
+        except Exception:
+            raise ValueError("Invalid cursor")
+        return value, agent_id, end_time
+
     def _calculate_start_time(self, end_time: datetime, time_range: str) -> datetime:
         """Вычисление начального времени для диапазона"""
         ranges = {
@@ -104,3 +443,21 @@ class StatsService:
             "30d": timedelta(days=30)
         }
         return end_time - ranges.get(time_range, timedelta(days=1))
+
+async def warm_stats_cache(db: AsyncSession) -> int:
+    """
+    Заполнение кэша ответов статистики запросами дашборда по умолчанию
+    (ключи - как в api/v1/endpoints/statistics.py); заодно на соединениях
+    пула подготавливаются эти запросы. Возвращает число прогретых ответов
+    """
+    from core.serialization import cached_json, stats_cache
+
+    service = StatsService(db)
+    defaults = (
+        (("stats", None, "24h"), lambda: calculate_stats(db, None, "24h")),
+        (("agents", "24h", "avg_latency", "desc", 50, None), lambda: service.get_agents_stats("24h")),
+        (("groups", "location", "24h", None), lambda: service.get_groups_stats("location", "24h")),
+    )
+    for key, producer in defaults:
+        await cached_json(stats_cache, key, producer)
+    return len(defaults)
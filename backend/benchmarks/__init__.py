@@ -0,0 +1,8 @@
+# backend/benchmarks/__init__.py
+import sys
+from pathlib import Path
+
+# Модули приложения импортируются так же, как в самом backend (db.*, services.*)
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
@@ -0,0 +1,78 @@
+# backend/benchmarks/fleet.py
+"""
+Синтетический парк агентов: отправка MeasurementCreate с заданной частотой
+"""
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.report import LatencyRecorder
+from benchmarks.seed import AgentProfile, bench_api_key
+
+def measurement_payload(profile: AgentProfile) -> Dict:
+    """Payload в формате агента (agent/utils/sender.py)"""
+    payload = profile.measurement(datetime.utcnow())
+    payload["id"] = str(payload["id"])
+    payload["timestamp"] = payload["timestamp"].isoformat()
+    payload["metainfo"] = {
+        "test_server": "https://httpbin.org",
+        "test_timestamp": time.time(),
+        "download_time": round(random.uniform(0.5, 3), 2),
+        "upload_time": round(random.uniform(0.5, 3), 2),
+        "dns_resolution_time": round(random.uniform(5, 40), 2),
+        "samples_summary": {
+            "latency": {"count": 10, "ok": 10, "p50": payload["latency"], "p95": payload["latency"] * 1.3},
+        },
+    }
+    return payload
+
+async def run_fleet(
+    base_url: str,
+    agents: int,
+    rate: float,
+    duration: float,
+    concurrency: int = 200,
+    seed: int = 42
+) -> LatencyRecorder:
+    """
+    Отправка измерений от agents агентов с суммарной частотой rate запросов/сек
+    в течение duration секунд (open-loop: расписание не зависит от ответов)
+    """
+    rng = random.Random(seed)
+    profiles: List[AgentProfile] = [AgentProfile(i, rng) for i in range(agents)]
+    recorder = LatencyRecorder("ingest")
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def send(index: int) -> None:
+            profile = profiles[index % agents]
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/api/v1/measurements/",
+                        json=measurement_payload(profile),
+                        headers={"X-API-KEY": bench_api_key(index % agents)}
+                    )
+                    recorder.add(time.perf_counter() - started, response.status_code < 400)
+                except httpx.HTTPError:
+                    recorder.add(time.perf_counter() - started, ok=False)
+
+        loop = asyncio.get_running_loop()
+        recorder.started_at = loop.time()
+        total = int(rate * duration)
+        tasks = []
+        for index in range(total):
+            delay = recorder.started_at + index / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(index)))
+        await asyncio.gather(*tasks)
+        recorder.finished_at = loop.time()
+
+    return recorder
@@ -0,0 +1,87 @@
+# backend/benchmarks/report.py
+import json
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional
+
+class LatencyRecorder:
+    """Сбор длительностей операций и ошибок для одного сценария"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []   # секунды
+        self.db_times: List[float] = []    # секунды
+        self.errors = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def add(self, seconds: float, ok: bool = True) -> None:
+        if ok:
+            self.latencies.append(seconds)
+        else:
+            self.errors += 1
+
+    def add_db_time(self, seconds: float) -> None:
+        self.db_times.append(seconds)
+
+    def summary(self) -> Dict:
+        duration = (self.finished_at or 0) - (self.started_at or 0)
+        total = len(self.latencies) + self.errors
+        result = {
+            "scenario": self.name,
+            "requests": total,
+            "errors": self.errors,
+            "duration_s": round(duration, 2),
+            "throughput_rps": round(total / duration, 1) if duration > 0 else 0,
+        }
+        result.update(_percentiles("latency", self.latencies))
+        result.update(_percentiles("db_time", self.db_times))
+        return result
+
+def _percentiles(prefix: str, values: List[float]) -> Dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p99 = cuts[49], cuts[98]
+    else:
+        p50 = p99 = ordered[0]
+    return {
+        f"{prefix}_p50_ms": round(p50 * 1000, 2),
+        f"{prefix}_p99_ms": round(p99 * 1000, 2),
+        f"{prefix}_max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+def check_thresholds(results: List[Dict], thresholds_path: Path) -> List[str]:
+    """
+    Сравнение результатов с порогами регрессии
+
+    Формат файла: {"<scenario>": {"latency_p99_ms": {"max": 250}, ...}}
+    """
+    if not thresholds_path.exists():
+        return []
+    with open(thresholds_path, "r") as f:
+        thresholds = json.load(f)
+
+    failures = []
+    for result in results:
+        for metric, bounds in thresholds.get(result["scenario"], {}).items():
+            value = result.get(metric)
+            if value is None:
+                continue
+            if "max" in bounds and value > bounds["max"]:
+                failures.append(f"{result['scenario']}: {metric}={value} > {bounds['max']}")
+            if "min" in bounds and value < bounds["min"]:
+                failures.append(f"{result['scenario']}: {metric}={value} < {bounds['min']}")
+    return failures
+
+def format_table(results: List[Dict]) -> str:
+    columns = [
+        "scenario", "requests", "errors", "throughput_rps",
+        "latency_p50_ms", "latency_p99_ms", "db_time_p50_ms", "db_time_p99_ms",
+    ]
+    lines = ["  ".join(f"{c:>16}" for c in columns)]
+    for result in results:
+        lines.append("  ".join(f"{str(result.get(c, '-')):>16}" for c in columns))
+    return "\n".join(lines)
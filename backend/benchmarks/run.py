@@ -0,0 +1,160 @@
+# backend/benchmarks/run.py
+"""
+Нагрузочные сценарии для backend
+
+    python -m benchmarks.seed --agents 500 --months 3
+    python -m benchmarks.run --base-url http://localhost:8000 --scenario all
+
+Сценарии:
+- ingest: синтетический парк агентов отправляет измерения
+- stats: /stats для всех диапазонов (глобально и по агенту), /stats/agents,
+  /stats/groups
+- advanced: /stats/advanced для всех диапазонов
+
+Для stats/advanced дополнительно измеряется время самих запросов к БД
+(вызов StatsService напрямую, без HTTP). Результат сравнивается с
+порогами из thresholds.json; при регрессии код возврата 1.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks import APP_DIR  # noqa: F401  (настройка sys.path)
+from benchmarks.fleet import run_fleet
+from benchmarks.report import LatencyRecorder, check_thresholds, format_table
+from benchmarks.seed import bench_agent_id
+
+TIME_RANGES = ["1h", "24h", "7d", "30d"]
+DEFAULT_THRESHOLDS = Path(__file__).with_name("thresholds.json")
+
+async def _repeat_http(
+    client: httpx.AsyncClient,
+    recorder: LatencyRecorder,
+    path: str,
+    params: Dict,
+    iterations: int,
+    concurrency: int
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                recorder.add(time.perf_counter() - started, response.status_code < 400)
+            except httpx.HTTPError:
+                recorder.add(time.perf_counter() - started, ok=False)
+
+    await asyncio.gather(*(one() for _ in range(iterations)))
+
+async def _repeat_db(
+    recorder: LatencyRecorder,
+    call: Callable[..., Awaitable],
+    iterations: int
+) -> None:
+    from db.session import async_session
+    from services.stats_service import StatsService
+
+    for _ in range(iterations):
+        async with async_session() as db:
+            started = time.perf_counter()
+            await call(StatsService(db))
+            recorder.add_db_time(time.perf_counter() - started)
+
+async def run_stats_scenarios(args, advanced: bool) -> List[LatencyRecorder]:
+    recorders = []
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+        for time_range in TIME_RANGES:
+            if advanced:
+                cases = [(
+                    f"advanced_{time_range}",
+                    "/api/v1/stats/advanced",
+                    {"time_range": time_range},
+                    lambda s, tr=time_range: s.get_global_stats(tr),
+                )]
+            else:
+                agent_id = bench_agent_id(0)
+                cases = [
+                    (
+                        f"stats_global_{time_range}",
+                        "/api/v1/stats/",
+                        {"time_range": time_range},
+                        lambda s, tr=time_range: s.get_global_stats(tr),
+                    ),
+                    (
+                        f"stats_agent_{time_range}",
+                        "/api/v1/stats/",
+                        {"time_range": time_range, "agent_id": agent_id},
+                        lambda s, tr=time_range: s.get_agent_stats(agent_id, tr),
+                    ),
+                    (
+                        f"stats_agents_{time_range}",
+                        "/api/v1/stats/agents",
+                        {"time_range": time_range},
+                        lambda s, tr=time_range: s.get_agents_stats(tr),
+                    ),
+                    (
+                        f"stats_groups_{time_range}",
+                        "/api/v1/stats/groups",
+                        {"time_range": time_range, "kind": "location"},
+                        lambda s, tr=time_range: s.get_groups_stats("location", tr),
+                    ),
+                ]
+
+            for name, path, params, db_call in cases:
+                recorder = LatencyRecorder(name)
+                recorder.started_at = time.perf_counter()
+                await _repeat_http(
+                    client, recorder, path, params, args.iterations, args.concurrency
+                )
+                recorder.finished_at = time.perf_counter()
+                if not args.skip_db_time:
+                    await _repeat_db(recorder, db_call, args.db_iterations)
+                recorders.append(recorder)
+    return recorders
+
+async def main(args) -> int:
+    recorders: List[LatencyRecorder] = []
+    scenarios = ["ingest", "stats", "advanced"] if args.scenario == "all" else [args.scenario]
+
+    if "ingest" in scenarios:
+        recorders.append(await run_fleet(
+            args.base_url, args.agents, args.rate, args.duration, args.concurrency
+        ))
+    if "stats" in scenarios:
+        recorders.extend(await run_stats_scenarios(args, advanced=False))
+    if "advanced" in scenarios:
+        recorders.extend(await run_stats_scenarios(args, advanced=True))
+
+    results = [recorder.summary() for recorder in recorders]
+    print(format_table(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = check_thresholds(results, Path(args.thresholds))
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IQMS backend benchmarks")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", choices=["all", "ingest", "stats", "advanced"], default="all")
+    parser.add_argument("--agents", type=int, default=100, help="Размер синтетического парка")
+    parser.add_argument("--rate", type=float, default=100, help="Суммарная частота ingest, запросов/сек")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность ingest, сек")
+    parser.add_argument("--iterations", type=int, default=50, help="Запросов на каждый stats-сценарий")
+    parser.add_argument("--db-iterations", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--skip-db-time", action="store_true")
+    parser.add_argument("--thresholds", default=str(DEFAULT_THRESHOLDS))
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    sys.exit(asyncio.run(main(parser.parse_args())))
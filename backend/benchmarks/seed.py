@@ -0,0 +1,125 @@
+# backend/benchmarks/seed.py
+"""
+Загрузка синтетической истории измерений в PostgreSQL
+
+    python -m benchmarks.seed --agents 200 --months 3 --interval 300
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from benchmarks import APP_DIR  # noqa: F401  (настройка sys.path)
+from sqlalchemy import delete, insert
+from core.ids import uuid7
+from db.models import Agent, Measurement
+from db.session import async_session
+from db.init_db import create_db_tables
+from services.rollup_service import rebuild_group_membership, rebuild_rollups
+
+LOCATIONS = ["Moscow", "Saint Petersburg", "Novosibirsk", "Kazan", "Yekaterinburg"]
+
+def bench_agent_id(index: int) -> str:
+    return f"bench-agent-{index:05d}"
+
+def bench_api_key(index: int) -> str:
+    return f"bench-key-{index:05d}"
+
+class AgentProfile:
+    """Базовые характеристики канала синтетического агента"""
+
+    def __init__(self, index: int, rng: random.Random):
+        self.agent_id = bench_agent_id(index)
+        self.latency = rng.uniform(5, 80)
+        self.download = rng.choice([50, 100, 300, 500])
+        self.upload = self.download * rng.uniform(0.3, 1.0)
+        self.loss = rng.uniform(0, 0.5)
+        self.rng = rng
+
+    def measurement(self, timestamp: datetime) -> Dict:
+        rng = self.rng
+        # Редкие эпизоды деградации, чтобы данные не были идеально стационарными
+        degraded = rng.random() < 0.01
+        factor = rng.uniform(2, 6) if degraded else 1.0
+        return {
+            "id": uuid7(int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1000)),
+            "timestamp": timestamp,
+            "agent_id": self.agent_id,
+            "latency": max(0.1, rng.gauss(self.latency * factor, self.latency * 0.15)),
+            "download": max(0.0, rng.gauss(self.download / factor, self.download * 0.1)),
+            "upload": max(0.0, rng.gauss(self.upload / factor, self.upload * 0.1)),
+            "packet_loss": min(100.0, max(0.0, rng.gauss(self.loss * factor, 0.2))),
+            "jitter": abs(rng.gauss(self.latency * 0.1 * factor, 1.0)),
+            "metainfo": {"test_server": "https://httpbin.org"},
+        }
+
+async def seed_agents(count: int) -> None:
+    async with async_session() as db:
+        await db.execute(delete(Agent).where(Agent.id.like("bench-agent-%")))
+        await db.execute(insert(Agent), [
+            {
+                "id": bench_agent_id(i),
+                "name": f"Bench agent {i}",
+                "location": LOCATIONS[i % len(LOCATIONS)],
+                "tags": [f"isp-{i % 3}"],
+                "api_key": bench_api_key(i),
+                "is_active": True,
+                "test_interval": 300,
+            }
+            for i in range(count)
+        ])
+        await db.commit()
+        await rebuild_group_membership(db)
+
+async def seed_measurements(
+    agents: int,
+    months: int,
+    interval: int,
+    batch_size: int = 5000,
+    seed: int = 42
+) -> int:
+    rng = random.Random(seed)
+    profiles = [AgentProfile(i, rng) for i in range(agents)]
+    end = datetime.utcnow()
+    start = end - timedelta(days=30 * months)
+
+    batch: List[Dict] = []
+    total = 0
+    async with async_session() as db:
+        timestamp = start
+        while timestamp < end:
+            for profile in profiles:
+                batch.append(profile.measurement(timestamp))
+                if len(batch) >= batch_size:
+                    await db.execute(insert(Measurement), batch)
+                    await db.commit()
+                    total += len(batch)
+                    batch = []
+            timestamp += timedelta(seconds=interval)
+        if batch:
+            await db.execute(insert(Measurement), batch)
+            await db.commit()
+            total += len(batch)
+        # Часовые агрегаты для /stats/groups (при приеме через API - инкрементально)
+        await rebuild_rollups(db, start, end + timedelta(hours=1))
+    return total
+
+async def main(args) -> None:
+    await create_db_tables()
+    await seed_agents(args.agents)
+    if args.months <= 0:
+        return
+    started = time.perf_counter()
+    total = await seed_measurements(args.agents, args.months, args.interval, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {total} measurements in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed benchmark data")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--months", type=int, default=1)
+    parser.add_argument("--interval", type=int, default=300, help="Интервал измерений, сек")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+# backend/benchmarks/serialization_bench.py
+"""
+Сравнение путей сериализации списка измерений (без БД и HTTP)
+
+    cd backend
+    SECRET_KEY=bench python -m benchmarks.serialization_bench --rows 10000
+
+Пути:
+- orm: ORM-объекты Measurement -> MeasurementOut.model_validate -> jsonable_encoder
+  -> json.dumps (то, что делал эндпоинт с response_model и JSONResponse)
+- rows: кортежи колонок -> TypeAdapter(List[MeasurementOut]) -> dump_json
+  (MeasurementService.list_page)
+- orjson: словари строк -> orjson (MeasurementService.export_ndjson)
+
+Строки выборки эмулируются namedtuple с теми же полями, что и Row
+SQLAlchemy (доступ по атрибутам); стоимость гидратации ORM учитывается
+созданием объектов Measurement внутри замера.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from benchmarks import APP_DIR  # noqa: F401  (настройка sys.path)
+from fastapi.encoders import jsonable_encoder
+
+from core.serialization import dumps
+from db.models import Measurement
+from db.schemas import MeasurementOut
+from services.measurement_service import encode_measurements
+
+FIELDS = tuple(MeasurementOut.model_fields)
+MeasurementRow = namedtuple("MeasurementRow", FIELDS)
+
+def make_rows(count: int) -> List[MeasurementRow]:
+    now = datetime.utcnow()
+    return [
+        MeasurementRow(
+            latency=round(random.uniform(5, 80), 2),
+            download=round(random.uniform(10, 500), 2),
+            upload=round(random.uniform(5, 100), 2),
+            packet_loss=round(random.uniform(0, 2), 2),
+            jitter=round(random.uniform(0, 10), 2),
+            agent_id=f"agent-{i % 50}",
+            metainfo={"test_server": "https://speed.example.com", "dns_resolution_time": 12.5},
+            id=str(uuid.uuid4()),
+            timestamp=now - timedelta(seconds=i * 300),
+        )
+        for i in range(count)
+    ]
+
+def orm_path(rows: List[MeasurementRow]) -> bytes:
+    objects = [Measurement(**row._asdict()) for row in rows]
+    models = [MeasurementOut.model_validate(obj) for obj in objects]
+    return json.dumps(jsonable_encoder(models)).encode()
+
+def rows_path(rows: List[MeasurementRow]) -> bytes:
+    return encode_measurements(rows)
+
+def orjson_path(rows: List[MeasurementRow]) -> bytes:
+    return dumps([row._asdict() for row in rows])
+
+PATHS: Dict[str, Callable[[List[MeasurementRow]], bytes]] = {
+    "orm": orm_path,
+    "rows": rows_path,
+    "orjson": orjson_path,
+}
+
+def measure(func: Callable, rows: List[MeasurementRow], repeat: int) -> Dict:
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(func(rows))
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        "median_ms": round(median * 1000, 2),
+        "min_ms": round(min(timings) * 1000, 2),
+        "rows_per_s": round(len(rows) / median),
+        "bytes": size,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measurement serialization benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    results = {name: measure(func, rows, args.repeat) for name, func in PATHS.items()}
+    baseline = results["orm"]["median_ms"]
+    for result in results.values():
+        result["speedup"] = round(baseline / result["median_ms"], 1) if result["median_ms"] else None
+
+    print(f"{'path':<8} {'median ms':>10} {'min ms':>10} {'rows/s':>10} {'speedup':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<8} {result['median_ms']:>10} {result['min_ms']:>10} "
+            f"{result['rows_per_s']:>10} {result['speedup']:>8}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
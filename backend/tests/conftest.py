@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+
+# Настройки без .env: обязательный SECRET_KEY и лог только в консоль
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("LOG_FILE", "")
@@ -0,0 +1,72 @@
+# tests/test_admission.py
+import pytest
+from fastapi import HTTPException
+from core import admission
+from core.admission import RateLimiter, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission, "time", clock)
+    return clock
+
+def test_bucket_allows_burst_then_waits(clock):
+    bucket = TokenBucket(rate=0.5, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Токенов нет: следующий появится через 1 / rate секунд
+    assert bucket.take() == pytest.approx(2.0)
+
+def test_bucket_refills_with_time(clock):
+    bucket = TokenBucket(rate=0.5, burst=3)
+    for _ in range(3):
+        bucket.take()
+    clock.now += 1.0
+    assert bucket.take() == pytest.approx(1.0)
+    clock.now += 1.0
+    assert bucket.take() == 0.0
+
+def test_bucket_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=1.0, burst=2)
+    clock.now += 3600
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, pytest.approx(1.0)]
+
+def test_bucket_cost(clock):
+    bucket = TokenBucket(rate=1.0, burst=4)
+    assert bucket.take(cost=3) == 0.0
+    assert bucket.take(cost=3) == pytest.approx(2.0)
+
+def test_limiter_rejects_with_retry_after(clock):
+    limiter = RateLimiter(rate=0.4, burst=1)
+    limiter.check("agent")
+    with pytest.raises(HTTPException) as error:
+        limiter.check("agent")
+    assert error.value.status_code == 429
+    # 2.5 с округляются вверх: повтор раньше срока снова получит 429
+    assert error.value.headers["Retry-After"] == "3"
+    assert limiter.rejected == 1
+
+def test_limiter_keys_are_independent(clock):
+    limiter = RateLimiter(rate=0.1, burst=1)
+    limiter.check("a")
+    limiter.check("b")
+    with pytest.raises(HTTPException):
+        limiter.check("a")
+
+def test_limiter_evicts_least_recently_used(clock):
+    limiter = RateLimiter(rate=0.1, burst=1, max_keys=2)
+    limiter.check("a")
+    limiter.check("b")
+    with pytest.raises(HTTPException):
+        limiter.check("a")   # обращение к "a" делает "b" самым старым
+    limiter.check("c")
+    assert list(limiter._buckets) == ["a", "c"]
+    # Вытесненный ключ начинает с полного bucket'а
+    limiter.check("b")
+    assert list(limiter._buckets) == ["c", "b"]
@@ -0,0 +1,54 @@
+# tests/test_agent_config_service.py
+import asyncio
+import pytest
+from fastapi import HTTPException
+from core.config import settings
+from services.agent_config_service import AgentConfigStore, etag_matches, validate_scope
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches(None, '"b"')
+    assert not etag_matches('"a"', '"b"')
+
+def test_wait_times_out():
+    store = AgentConfigStore()
+    assert asyncio.run(store.wait_changed(0.01)) is False
+    assert store.waiters == 0
+
+def test_too_many_waiters_is_retry_later(monkeypatch):
+    monkeypatch.setattr(settings, "AGENT_CONFIG_MAX_WAITERS", 1)
+    store = AgentConfigStore()
+    store.waiters = 1
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(store.wait_changed(10))
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == str(settings.AGENT_CONFIG_BUSY_RETRY_AFTER)
+
+def test_validate_scope_normalizes_values():
+    values = validate_scope("location:msk", {
+        "test_interval": "600",
+        "targets": [{"name": "crm", "host": "crm.example.com", "probes": ["http", "tcp"]}],
+    })
+    assert values == {
+        "test_interval": 600,
+        "targets": [{"name": "crm", "host": "crm.example.com", "probes": ["http", "tcp"]}],
+    }
+
+def test_validate_scope_unknown_key_is_bad_request():
+    with pytest.raises(HTTPException) as error:
+        validate_scope("global", {"api_key": "secret"})
+    assert error.value.status_code == 400
+
+@pytest.mark.parametrize("values", [
+    {"test_interval": "5m"},
+    {"test_interval": 10},
+    {"test_interval": None},
+    {"log_level": "VERBOSE"},
+    {"targets": [{"name": "crm"}]},
+    {"targets": [{"name": "crm", "host": "crm.example.com", "probes": ["icmp"]}]},
+])
+def test_validate_scope_bad_value_is_unprocessable(values):
+    with pytest.raises(HTTPException) as error:
+        validate_scope("global", values)
+    assert error.value.status_code == 422
@@ -0,0 +1,38 @@
+# tests/test_agent_service.py
+import json
+import pytest
+from services import agent_service
+from services.agent_service import record_agent_metrics
+from services.liveness_service import LivenessTracker
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = LivenessTracker()
+    monkeypatch.setattr(agent_service, "liveness_tracker", tracker)
+    return tracker
+
+def test_valid_metrics_are_queued_for_flush(tracker):
+    raw = json.dumps({"cpu_pct": 12.5, "rss_mb": 40, "sockets": 3, "probe_ms": {"dns": 12}, "extra": "x"})
+    record_agent_metrics("a", raw)
+    metrics, _ = tracker._resources["a"]
+    assert metrics == {"cpu_pct": 12.5, "rss_mb": 40.0, "sockets": 3, "probe_ms": {"dns": 12.0}}
+
+@pytest.mark.parametrize("raw", [
+    None,
+    "",
+    "not json",
+    "[1, 2]",
+    '{"cpu_pct": "high"}',
+    '{"cpu_pct": -1}',
+    '{"cpu_pct": NaN}',
+    '{"probe_ms": {"dns": "slow"}}',
+    json.dumps({"cpu_pct": 1, "pad": "x" * 5000}),
+])
+def test_invalid_metrics_are_ignored(tracker, raw):
+    record_agent_metrics("a", raw)
+    assert tracker._resources == {}
+
+def test_latest_summary_wins(tracker):
+    record_agent_metrics("a", '{"cpu_pct": 1}')
+    record_agent_metrics("a", '{"cpu_pct": 2}')
+    assert tracker._resources["a"][0] == {"cpu_pct": 2.0}
@@ -0,0 +1,112 @@
+# tests/test_anomaly_service.py
+import asyncio
+import pytest
+from core.config import settings
+from services.anomaly_service import CHECKPOINT_CHUNK, AnomalyDetector, MetricDetector
+
+PARAMS = {"alpha": 0.1, "k": 0.5, "h": 5.0, "warmup": 20, "min_std": 1.0}
+
+def feed(detector, values):
+    return [detector.update(value, **PARAMS) for value in values]
+
+def stable(count, base=50.0):
+    # Небольшой детерминированный шум вокруг base
+    return [base + (i % 5 - 2) * 0.5 for i in range(count)]
+
+def test_first_value_becomes_baseline():
+    detector = MetricDetector()
+    detector.update(42.0, **PARAMS)
+    assert detector.mean == 42.0
+    assert detector.count == 1
+
+def test_no_alarm_during_warmup():
+    detector = MetricDetector()
+    alarms = feed(detector, [10.0] * 5 + [1000.0] * 14)
+    assert alarms == [None] * 19
+    assert detector.cusum_pos == 0.0
+
+def test_stable_series_does_not_alarm():
+    assert not any(feed(MetricDetector(), stable(500)))
+
+def test_step_up_alarms_with_old_baseline():
+    detector = MetricDetector()
+    feed(detector, stable(100))
+    alarms = [alarm for alarm in feed(detector, [80.0] * 10) if alarm]
+    assert alarms
+    direction, baseline, deviation = alarms[0]
+    assert direction == "up"
+    assert baseline == pytest.approx(50.0, abs=1.0)
+    assert deviation > 0
+
+def test_step_down_alarms():
+    detector = MetricDetector()
+    feed(detector, stable(100))
+    alarms = [alarm for alarm in feed(detector, [20.0] * 10) if alarm]
+    assert alarms[0][0] == "down"
+
+def test_alarm_resets_cusum():
+    detector = MetricDetector()
+    feed(detector, stable(100))
+    for value in [80.0] * 10:
+        if detector.update(value, **PARAMS):
+            break
+    assert detector.cusum_pos == 0.0
+    assert detector.cusum_neg == 0.0
+
+def test_single_outlier_below_threshold():
+    detector = MetricDetector()
+    feed(detector, stable(100))
+    # h = 5σ: один выброс на 4σ не накапливается до порога
+    assert detector.update(54.0, **PARAMS) is None
+
+def test_min_std_bounds_constant_series():
+    detector = MetricDetector()
+    feed(detector, [0.0] * 50)
+    # Дисперсия 0, но σ не меньше min_std: сдвиг на 1 не срабатывает сразу
+    assert detector.update(1.0, **PARAMS) is None
+    assert detector.cusum_pos == pytest.approx(0.5)
+
+def test_state_round_trip():
+    detector = MetricDetector()
+    feed(detector, stable(30))
+    restored = MetricDetector(detector.to_state())
+    assert restored.to_state() == detector.to_state()
+
+def test_detector_reports_only_bad_direction():
+    anomaly = AnomalyDetector()
+    for value in stable(100, base=100.0):
+        anomaly.observe({"agent_id": "a", "download": value})
+    # Рост скорости - не деградация
+    events = [e for value in [200.0] * 10 for e in anomaly.observe({"agent_id": "a", "download": value})]
+    assert events == []
+    events = [e for value in [10.0] * 10 for e in anomaly.observe({"agent_id": "a", "download": value})]
+    assert events and events[0]["metric"] == "download"
+
+def test_pending_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "ANOMALY_PENDING_LIMIT", 3)
+    anomaly = AnomalyDetector()
+    anomaly._pending = [{"n": i} for i in range(5)]
+    anomaly._trim_pending()
+    assert anomaly._pending == [{"n": 2}, {"n": 3}, {"n": 4}]
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+        self.committed = False
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.committed = True
+
+def test_checkpoint_is_chunked():
+    anomaly = AnomalyDetector()
+    total = CHECKPOINT_CHUNK * 2 + 1
+    for i in range(total):
+        anomaly.observe({"agent_id": f"agent-{i}", "latency": 10.0})
+    db = FakeSession()
+    asyncio.run(anomaly.checkpoint(db))
+    assert len(db.statements) == 3
+    assert db.committed
+    assert not anomaly._dirty
@@ -0,0 +1,44 @@
+# tests/test_broadcast_service.py
+import json
+from datetime import datetime
+from core import events
+from services.broadcast_service import BroadcastHub
+from services.rollup_service import rollup_event
+
+ROLLUP = {
+    "agent_id": "a1",
+    "hour": datetime(2024, 5, 1, 10),
+    "measurement_count": 4,
+    "latency_sum": 100.0, "latency_count": 4,
+    "download_sum": 200.0, "download_count": 2,
+    "download_min": 90.0, "download_max": 110.0,
+    "upload_sum": None, "upload_count": 0,
+    "packet_loss_sum": 0.0, "packet_loss_count": 4,
+    "jitter_sum": 6.0, "jitter_count": 4,
+}
+
+def parse(message: bytes):
+    event, data = message.decode().strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+def test_rollup_event_has_averages_and_groups():
+    event = rollup_event(ROLLUP, ["location:Moscow", "tag:office"])
+    assert event["hour"] == "2024-05-01T10:00:00"
+    assert event["groups"] == ["location:Moscow", "tag:office"]
+    assert (event["avg_latency"], event["avg_download"], event["avg_upload"]) == (25.0, 100.0, None)
+    # Частичные суммы остаются: клиент сливает агрегаты нескольких агентов
+    assert event["latency_sum"] == 100.0 and event["measurement_count"] == 4
+
+def test_rollup_event_reaches_stream_subscribers(monkeypatch):
+    hub = BroadcastHub()
+    monkeypatch.setattr(events, "_handlers", {})
+    events.on("rollup", lambda r: hub.publish("rollup", r, r["agent_id"]))
+    subscriber = hub.subscribe(["a1"])
+    other = hub.subscribe(["a2"])
+
+    events.emit("rollup", rollup_event(ROLLUP, ["location:Moscow"]))
+
+    event, data = parse(subscriber.queue.get_nowait())
+    assert event == "rollup"
+    assert (data["agent_id"], data["hour"], data["groups"]) == ("a1", "2024-05-01T10:00:00", ["location:Moscow"])
+    assert other.queue.empty()
@@ -0,0 +1,15 @@
+# tests/test_coordination.py
+from core.coordination import ClusterBus
+
+def make_bus() -> ClusterBus:
+    bus = ClusterBus("test", "host-a")
+    bus._task = object()   # отправка включена, без соединения с БД
+    return bus
+
+def test_oversized_message_is_counted():
+    bus = make_bus()
+    bus.publish("event", {"data": "x" * 10000})
+    bus.publish("event", {"data": "ok"})
+    stats = bus.stats()
+    assert stats["queued"] == 1
+    assert stats["dropped"] == {"oversized:event": 1}
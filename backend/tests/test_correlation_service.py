@@ -0,0 +1,76 @@
+# tests/test_correlation_service.py
+from datetime import datetime, timezone
+from core.config import settings
+from services.correlation_service import CorrelationIndex, degradation_reason, measurement_groups
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+def measurement(agent_id: str, at: float) -> dict:
+    return {
+        "agent_id": agent_id,
+        "timestamp": datetime.fromtimestamp(at, timezone.utc).replace(tzinfo=None).isoformat(),
+        "location": "office",
+        "latency": 20.0,
+        "packet_loss": 0.0,
+    }
+
+def fill(index: CorrelationIndex, count: int = 4) -> None:
+    for i in range(count):
+        index.observe(measurement(f"a{i}", NOW), now=NOW)
+
+def test_silent_agents_open_incident():
+    index = CorrelationIndex()
+    incidents = []
+    index.add_listener(incidents.append)
+    fill(index)
+    index.sweep(now=NOW + 1000)
+    assert incidents and incidents[0]["group"] == "location:office"
+    assert incidents[0]["reasons"] == {"silent": 4}
+
+def test_recent_last_seen_is_not_silence():
+    # Измерения не дошли до leader'а, но агенты присылали их другим репликам
+    last_seen = {f"a{i}": NOW + 900 for i in range(4)}
+    index = CorrelationIndex(last_seen.get)
+    incidents = []
+    index.add_listener(incidents.append)
+    fill(index)
+    index.sweep(now=NOW + 1000)
+    assert incidents == []
+    assert index.group_state("location:office", NOW + 1000) == (4, {})
+
+def test_old_last_seen_does_not_hide_silence():
+    last_seen = {f"a{i}": NOW - 600 for i in range(4)}
+    index = CorrelationIndex(last_seen.get)
+    fill(index)
+    total, degraded = index.group_state("location:office", NOW + 1000)
+    assert total == 4 and set(degraded.values()) == {"silent"}
+
+def test_measurement_groups_from_event():
+    event = {
+        **measurement("a1", NOW),
+        "external_ip": "203.0.113.7",
+        "test_server": "https://speed.example.com/upload",
+    }
+    assert measurement_groups(event) == [
+        "location:office", "prefix:203.0.113.0/24", "server:speed.example.com"
+    ]
+
+def test_targets_only_is_not_failure():
+    event = {**measurement("a1", NOW), "latency": None}
+    assert degradation_reason(event) == "failure"
+    assert degradation_reason({**event, "targets_only": True}) is None
+
+def test_incident_event_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "CORRELATION_INCIDENT_SAMPLE", 2)
+    index = CorrelationIndex()
+    incidents = []
+    index.add_listener(incidents.append)
+    fill(index, count=50)
+    index.sweep(now=NOW + 1000)
+    (incident,) = incidents
+    assert "affected_agents" not in incident
+    assert incident["affected_count"] == 50
+    assert incident["affected_sample"] == ["a0", "a1"]
+    # Полный список - для записи в БД
+    (unsaved,) = index._unsaved.values()
+    assert len(unsaved["affected_agents"]) == 50
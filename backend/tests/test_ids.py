@@ -0,0 +1,50 @@
+# tests/test_ids.py
+import uuid
+import pytest
+from core import ids
+from core.ids import uuid7
+
+def timestamp_of(value: uuid.UUID) -> int:
+    return value.int >> 80
+
+@pytest.fixture
+def frozen_clock(monkeypatch):
+    """Часы, стоящие на одной миллисекунде (или идущие назад)"""
+    clock = {"ns": 1_700_000_000_123_000_000}
+    monkeypatch.setattr(ids.time, "time_ns", lambda: clock["ns"])
+    monkeypatch.setattr(ids, "_last_ms", 0)
+    monkeypatch.setattr(ids, "_counter", 0)
+    return clock
+
+def test_version_and_variant():
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+def test_timestamp_is_embedded(frozen_clock):
+    assert timestamp_of(uuid7()) == 1_700_000_000_123
+
+def test_explicit_timestamp():
+    value = uuid7(timestamp_ms=1_600_000_000_000)
+    assert timestamp_of(value) == 1_600_000_000_000
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+def test_monotonic_within_millisecond(frozen_clock):
+    values = [uuid7() for _ in range(10000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    # Счетчик исчерпан - следующие ID в заимствованных миллисекундах
+    assert timestamp_of(values[-1]) > timestamp_of(values[0])
+    assert all(value.version == 7 and value.variant == uuid.RFC_4122 for value in values)
+
+def test_monotonic_when_clock_goes_back(frozen_clock):
+    first = uuid7()
+    frozen_clock["ns"] -= 5_000_000
+    second = uuid7()
+    assert second > first
+
+def test_ordered_by_time(frozen_clock):
+    first = uuid7()
+    frozen_clock["ns"] += 1_000_000
+    assert uuid7() > first
@@ -0,0 +1,19 @@
+# tests/test_liveness_service.py
+from datetime import datetime, timedelta
+from services import liveness_service
+from services.liveness_service import LivenessTracker
+
+def test_heartbeats_to_other_replicas_are_throttled(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        liveness_service.worker_bus, "publish",
+        lambda topic, payload, local=False: published.append(local)
+    )
+    tracker = LivenessTracker()
+    start = datetime(2026, 3, 1, 12, 0)
+    for seconds in (0, 10, 20, 40):
+        tracker.heartbeat("a1", seen_at=start + timedelta(seconds=seconds))
+    tracker.heartbeat("a2", seen_at=start + timedelta(seconds=20))
+    # Своему хосту - каждый heartbeat, репликам - не чаще LIVENESS_FLUSH_INTERVAL
+    assert published == [False, True, True, False, False]
+    assert tracker.last_seen("a1") == start + timedelta(seconds=40)
@@ -0,0 +1,33 @@
+# tests/test_measurement_service.py
+import json
+from datetime import datetime
+from uuid import UUID
+from core.config import settings
+from services.measurement_service import measurement_event
+
+ROW = {
+    "id": UUID("01929b5e-7c1a-7d3e-8f2a-3b4c5d6e7f80"),
+    "timestamp": datetime(2026, 3, 1, 12, 0),
+    "agent_id": "a1",
+    "latency": 20.0, "download": 90.0, "upload": 30.0, "packet_loss": 0.0, "jitter": 2.0,
+}
+
+def test_measurement_event_keeps_correlation_fields():
+    metainfo = {"external_ip": "203.0.113.7", "test_server": "https://speed.example.com/up"}
+    event = measurement_event({**ROW, "metainfo": metainfo}, "office")
+    assert (event["agent_id"], event["location"], event["latency"]) == ("a1", "office", 20.0)
+    assert (event["external_ip"], event["test_server"]) == ("203.0.113.7", "https://speed.example.com/up")
+    assert event["targets_only"] is False
+    assert "metainfo" not in event
+
+def test_measurement_event_fits_cluster_bus():
+    # Сотня целей и трассировка в metainfo не попадают в событие
+    metainfo = {
+        "targets": [{"target": f"target-{i}", "probe": "http", "rtt_avg": 12.5} for i in range(100)],
+        "test_server": "https://" + "x" * 10000,
+        "targets_only": True,
+    }
+    event = measurement_event({**ROW, "metainfo": metainfo}, "office")
+    assert event["targets_only"] is True
+    assert len(json.dumps({"topic": "event", "payload": {"event": "measurement", "data": event}})) < 1000
+    assert len(json.dumps(event)) < settings.CLUSTER_BUS_MAX_PAYLOAD
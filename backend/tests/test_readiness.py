@@ -0,0 +1,58 @@
+# tests/test_readiness.py
+import pytest
+from core import readiness as readiness_module
+from core.config import settings
+from core.readiness import Readiness
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(readiness_module, "time", clock)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 3)
+    monkeypatch.setattr(settings, "READINESS_REPORT_INTERVAL", 2.0)
+    return clock
+
+def test_host_ready_waits_for_all_workers(clock):
+    readiness = Readiness()
+    readiness.warmed = True
+    assert not readiness.host_ready
+    readiness.on_peer_state({"pid": 1, "ready": True})
+    readiness.on_peer_state({"pid": 2, "ready": False})
+    assert readiness.ready_workers() == 2
+    assert not readiness.host_ready
+    readiness.on_peer_state({"pid": 2, "ready": True})
+    assert readiness.host_ready
+
+def test_cold_worker_is_not_ready(clock):
+    readiness = Readiness()
+    readiness.on_peer_state({"pid": 1, "ready": True})
+    readiness.on_peer_state({"pid": 2, "ready": True})
+    assert not readiness.host_ready
+
+def test_silent_worker_is_forgotten(clock):
+    readiness = Readiness()
+    readiness.warmed = True
+    readiness.on_peer_state({"pid": 1, "ready": True})
+    readiness.on_peer_state({"pid": 2, "ready": True})
+    assert readiness.host_ready
+    clock.now += 5
+    readiness.on_peer_state({"pid": 1, "ready": True})
+    clock.now += 2
+    # pid 2 не отвечал дольше трех интервалов
+    assert readiness.ready_workers() == 2
+    assert not readiness.host_ready
+
+def test_shutting_down_is_not_ready(clock):
+    readiness = Readiness()
+    readiness.warmed = True
+    readiness.on_peer_state({"pid": 1, "ready": True})
+    readiness.on_peer_state({"pid": 2, "ready": True})
+    readiness.stop()
+    assert not readiness.host_ready
@@ -0,0 +1,121 @@
+# tests/test_rollup_service.py
+import asyncio
+import random
+import statistics
+from datetime import datetime, timedelta
+import pytest
+from services.archive_service import PARTIAL_METRICS, merge_partial
+from core.config import settings
+from services import rollup_service
+from services.rollup_service import group_keys, hourly_partials, rebuild_recent_rollups
+from services.stats_service import StatsService
+
+START = datetime(2026, 3, 1, 10, 0)
+
+def make_rows(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = {
+            "agent_id": rng.choice(["a", "b", "c"]),
+            "timestamp": START + timedelta(minutes=rng.randrange(0, 180)),
+        }
+        for metric in PARTIAL_METRICS:
+            # Часть проб неудачна - NULL не должен влиять на среднее
+            row[metric] = None if rng.random() < 0.2 else round(rng.uniform(0, 100), 3)
+        rows.append(row)
+    return rows
+
+def direct_means(rows, agent_id=None):
+    selected = [row for row in rows if agent_id is None or row["agent_id"] == agent_id]
+    means = {}
+    for metric in PARTIAL_METRICS:
+        values = [row[metric] for row in selected if row[metric] is not None]
+        means[metric] = statistics.mean(values) if values else None
+    return means
+
+def merge(partials, key_of):
+    merged = {}
+    for partial in partials:
+        merge_partial(merged, key_of(partial), {
+            k: v for k, v in partial.items() if k not in ("agent_id", "hour")
+        })
+    return merged
+
+def test_hourly_partials_keys_and_counts():
+    rows = make_rows(300)
+    partials = hourly_partials(rows)
+    keys = [(p["agent_id"], p["hour"]) for p in partials]
+    assert keys == sorted(keys)
+    assert all(p["hour"].minute == 0 and p["hour"].second == 0 for p in partials)
+    assert sum(p["measurement_count"] for p in partials) == len(rows)
+
+def test_merged_hourly_averages_match_direct_mean():
+    rows = make_rows(500)
+    merged = merge(hourly_partials(rows), lambda p: p["agent_id"])
+    for agent_id in ("a", "b", "c"):
+        averages = StatsService._averages(merged[agent_id])
+        expected = direct_means(rows, agent_id)
+        for metric in PARTIAL_METRICS:
+            assert getattr(averages, f"avg_{metric}") == pytest.approx(expected[metric])
+
+def test_incremental_batches_match_single_batch():
+    # Инкрементальные rollup'ы (пачки ingest) сливаются в тот же результат
+    rows = make_rows(400, seed=7)
+    whole = merge(hourly_partials(rows), lambda p: (p["agent_id"], p["hour"]))
+    batches = [hourly_partials(rows[i:i + 37]) for i in range(0, len(rows), 37)]
+    incremental = merge([p for batch in batches for p in batch], lambda p: (p["agent_id"], p["hour"]))
+    assert incremental.keys() == whole.keys()
+    for key, partial in whole.items():
+        for name, value in partial.items():
+            assert incremental[key][name] == pytest.approx(value)
+
+def test_global_average_over_agents_matches_direct_mean():
+    rows = make_rows(300, seed=3)
+    total = merge(hourly_partials(rows), lambda p: "all")
+    averages = StatsService._averages(total["all"])
+    expected = direct_means(rows)
+    for metric in PARTIAL_METRICS:
+        assert getattr(averages, f"avg_{metric}") == pytest.approx(expected[metric])
+    downloads = [row["download"] for row in rows if row["download"] is not None]
+    assert averages.min_download == min(downloads)
+    assert averages.max_download == max(downloads)
+    assert total["all"]["measurement_count"] == len(rows)
+
+def test_all_null_metric_has_no_average():
+    rows = [
+        {"agent_id": "a", "timestamp": START, **{metric: None for metric in PARTIAL_METRICS}}
+        for _ in range(3)
+    ]
+    (partial,) = hourly_partials(rows)
+    assert partial["latency_count"] == 0
+    assert StatsService._averages(partial).avg_latency is None
+
+def test_group_keys():
+    assert group_keys("Moscow", ["office", "lte", "office"]) == [
+        "location:Moscow", "tag:lte", "tag:office"
+    ]
+    assert group_keys(None, None) == []
+
+def test_rebuild_recent_rollups_covers_current_hour(monkeypatch):
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    calls = []
+
+    async def fake_rebuild(db, since, until, agent_id=None):
+        calls.append((since, until))
+
+    monkeypatch.setattr(rollup_service, "async_session", FakeSession)
+    monkeypatch.setattr(rollup_service, "rebuild_rollups", fake_rebuild)
+    monkeypatch.setattr(settings, "ROLLUP_REBUILD_HOURS", 2)
+    before = datetime.utcnow()
+    asyncio.run(rebuild_recent_rollups())
+
+    ((since, until),) = calls
+    assert until - since == timedelta(hours=2)
+    assert since.minute == 0 and since < before < until